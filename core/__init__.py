@@ -1,8 +1,19 @@
 # core/__init__.py
 
-from .parsing import fetch_items
-from .scoring import score_items, rank_items
-from .generation import draft_posts
+# Submodules are imported on first use, not here: importing `core` (which every
+# CLI command does) must not drag in feedparser, openai or lxml.
+_LAZY = {
+    "fetch_items": "core.parsing",
+    "score_items": "core.scoring",
+    "rank_items": "core.ranking",
+    "draft_posts": "core.generation",
+}
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        return getattr(importlib.import_module(_LAZY[name]), name)
+    raise AttributeError(f"module 'core' has no attribute {name!r}")
 
 
 __all__ = []
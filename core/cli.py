@@ -1,20 +1,20 @@
 # voice_agent.py
 import argparse
-import os
 import textwrap
+import time
 from datetime import datetime
 from pathlib import Path
-from dotenv import load_dotenv
-
-from core.io_utils import run_dir_for_today, save_json, read_json, write_text, append_text
-from core.parsing import fetch_items
-from core.scoring import score_items, rank_items
-from core.generation import draft_posts
-from core.seen_cache import filter_new_items
-from core.emailer import send_email
-from core.usage_guard import BudgetGuard
+
+# Only light modules at import time. Anything that pulls in feedparser, requests,
+# openai, sqlite3, smtplib or imaplib is imported inside the command that needs it,
+# so `list` and `review-poll` don't pay for the whole pipeline on every start.
+from core.io_utils import (
+    run_dir_for_today, save_json, read_json, write_text, append_text,
+    append_ndjson, iter_ndjson, iter_batches, mark_ndjson_done, artifact_format, read_items, items_exist,
+)
+from core.ranking import rank_items
 from core.review import build_review, load_index_map, parse_selection_line
-from core.imap_poll import find_latest_selection
+from core.config import getenv
 
 
 # ---------- helpers ----------
@@ -94,37 +94,285 @@ def parse_selection(selection: str | None, total_items: int, default_top_n: int)
 # ---------- commands ----------
 
 def cmd_fetch(args):
-    feeds_file = os.getenv("FEEDS_FILE", "feeds.txt")
+    from core.parsing import fetch_items_with_report, merge_items
+    from core.feed_cache import summarize as summarize_feed_cache
+    from core.seen_cache import filter_new_items
+    from core.item_store import record_items
+
+    feeds_file = getenv("FEEDS_FILE", "feeds.txt")
     feeds = load_feeds_list(feeds_file)
-    items = fetch_items(feeds)
-    outdir = run_dir_for_today(os.getenv("OUTPUT_DIR", "output"))
-    raw_path = outdir / "raw_items.json"
-    save_json(items, raw_path)
-    print(f"Fetched {len(items)} items → {raw_path}")
+    outdir = run_dir_for_today(getenv("OUTPUT_DIR", "output"))
+    started = time.monotonic()
+    if artifact_format() == "ndjson":
+        report, count, raw_path = _fetch_ndjson(args, feeds, outdir)
+        elapsed = time.monotonic() - started
+    else:
+        items, report = fetch_items_with_report(feeds, use_cache=False if args.refresh else None)
+        elapsed = time.monotonic() - started
+        raw_path = outdir / "raw_items.json"
+
+        fetched = len(items)
+        if not args.ignore_cache:
+            items = filter_new_items(items)
+            print(f"[Seen] {len(items)} new / {fetched - len(items)} already seen")
+            # Later runs on the same day add to today's raw items rather than replacing them
+            if raw_path.exists():
+                items = merge_items(read_json(raw_path) + items)
+        save_json(items, raw_path)
+        record_items(items)
+        count = len(items)
+    save_json(report, outdir / "fetch_report.json")
+
+    failed = [r for r in report if not r["ok"]]
+    for r in failed:
+        print(f"[WARN] Feed failed after {r['elapsed_s']:.1f}s: {r['url']} ({r['error']})")
+    slowest = max((r["elapsed_s"] for r in report), default=0.0)
+    print(f"[Fetch] {len(report) - len(failed)} ok / {len(failed)} failed in {elapsed:.1f}s (slowest feed {slowest:.1f}s)")
+    c = summarize_feed_cache(report)
+    if c["hits"] or c["misses"]:
+        print(f"[Cache] feeds: {c['hits']} hit ({c['not_modified']} not modified, {c['unchanged']} unchanged) / {c['misses']} miss")
+    print(f"Fetched {count} items → {raw_path}")
+
+def _fetch_ndjson(args, feeds: list[str], outdir: Path) -> tuple[list[dict], int, Path]:
+    """Append each feed's new items to raw_items.ndjson as soon as that feed finishes."""
+    from core.parsing import iter_feed_results
+    from core.seen_cache import filter_new_items, item_key
+    from core.item_store import record_items
+
+    raw_path = outdir / "raw_items.ndjson"
+    if args.ignore_cache and raw_path.exists():
+        raw_path.unlink()  # same as the JSON path: --ignore-cache replaces today's items
+    written = {item_key(it) for it in iter_ndjson(raw_path)}  # keys only, not the items
+
+    order = {u: i for i, u in enumerate(feeds)}
+    report: list[dict] = []
+    count = seen = 0
+    try:
+        for result, items in iter_feed_results(feeds, use_cache=False if args.refresh else None):
+            report.append(result)
+            fresh = []
+            for it in sorted(items, key=lambda x: x["published_ts"], reverse=True):
+                key = item_key(it)
+                if key not in written:
+                    written.add(key)
+                    fresh.append(it)
+            if not args.ignore_cache:
+                kept = filter_new_items(fresh)
+                seen += len(fresh) - len(kept)
+                fresh = kept
+            count += append_ndjson(fresh, raw_path)
+            record_items(fresh)
+    finally:
+        mark_ndjson_done(raw_path)  # lets `score --follow` finish even if fetch died
+    if not args.ignore_cache:
+        print(f"[Seen] {count} new / {seen} already seen")
+    report.sort(key=lambda r: order.get(r["url"], 0))
+    return report, count, raw_path
 
 def cmd_score(args):
-    outdir = run_dir_for_today(os.getenv("OUTPUT_DIR", "output"))
+    from core.scoring import ScoringIncompleteError, save_unscored, score_items
+    from core.clustering import cluster_items
+    from core.prefilter import prefilter_items
+    from core.item_store import record_scores
+
+    outdir = run_dir_for_today(getenv("OUTPUT_DIR", "output"))
+    if args.follow or artifact_format() == "ndjson":
+        _score_ndjson(args, outdir)
+        _budget_echo()
+        return
     raw_path = outdir / "raw_items.json"
     items = read_json(raw_path)
-    strategy = load_strategy(os.getenv("STRATEGY_FILE", "strategy.md"))
-    model = args.model_scoring or os.getenv("MODEL_SCORING", "gpt-4o-mini")
-    scored = score_items(items, strategy, model=model)
+    if not args.no_cluster:
+        before = len(items)
+        items = cluster_items(items)
+        print(f"[Cluster] {before} items → {len(items)} stories ({before - len(items)} near-duplicates folded)")
+    strategy = load_strategy(getenv("STRATEGY_FILE", "strategy.md"))
+    model = args.model_scoring or getenv("MODEL_SCORING", "gpt-4o-mini")
     scored_path = outdir / "scored_items.json"
+
+    incremental = args.incremental or getenv("SCORE_INCREMENTAL", "false").lower() in ("1", "true", "yes")
+    previous: list[dict] = []
+    if incremental and scored_path.exists():
+        previous = read_json(scored_path)
+        done = {it.get("link") for it in previous if it.get("link")}
+        items = [it for it in items if it["link"] not in done]
+        print(f"[Incremental] {len(previous)} already scored today; {len(items)} new item(s) to score")
+
+    # After the incremental cut, so PREFILTER_TOP_K slots only go to items that will be scored
+    if not args.no_prefilter:
+        items, pruned = prefilter_items(items, strategy)
+        if pruned:
+            save_json(pruned, outdir / "prefiltered_out.json")
+            print(f"[Prefilter] kept {len(items)} / {len(items) + len(pruned)} (pruned {len(pruned)} off-topic)")
+
+    unscored: list[dict] = []
+    try:
+        fresh = score_items(items, strategy, model=model, batch_size=args.batch_size,
+                            concurrency=args.concurrency, use_cache=not args.no_cache) if items else []
+    except ScoringIncompleteError as e:
+        fresh, unscored = e.scored, e.unscored
+    scored = previous + fresh
     save_json(scored, scored_path)
-    print(f"Scored {len(scored)} items → {scored_path}")
+    record_scores(fresh)
+    save_unscored(outdir, unscored)
+    if incremental:
+        print(f"Scored {len(fresh)} new items ({len(scored)} total) → {scored_path}")
+    else:
+        print(f"Scored {len(scored)} items → {scored_path}")
+    _budget_echo()
 
+def _budget_echo():
     # Optional budget echo
     try:
+        from core.usage_guard import BudgetGuard
         g = BudgetGuard()
         print(f"[Budget] Spent today: ${g.spent:.4f} / ${g.max_daily:.2f}")
     except Exception:
         pass
 
+def _score_ndjson(args, outdir: Path):
+    """
+    Streaming score: read raw_items.ndjson batch by batch (tailing it with --follow
+    while fetch is still writing) and append each batch's scores to
+    scored_items.ndjson. Only one batch of items is held at a time, but the set of
+    links already scored and the clusterer (one representative and its shingles
+    per story) grow with the number of distinct stories in the day.
+    """
+    from core.scoring import ScoringIncompleteError, save_unscored, score_items
+    from core.clustering import Clusterer
+    from core.prefilter import prefilter_items
+    from core.item_store import record_scores
+
+    raw_path = outdir / "raw_items.ndjson"
+    scored_path = outdir / "scored_items.ndjson"
+    strategy = load_strategy(getenv("STRATEGY_FILE", "strategy.md"))
+    model = args.model_scoring or getenv("MODEL_SCORING", "gpt-4o-mini")
+
+    incremental = args.incremental or getenv("SCORE_INCREMENTAL", "false").lower() in ("1", "true", "yes")
+    if not incremental and scored_path.exists():
+        scored_path.unlink()
+    done = {it.get("link") for it in iter_ndjson(scored_path) if it.get("link")}
+
+    clusterer = None if args.no_cluster else Clusterer()
+    # One stream batch fills every concurrent scoring request once
+    batch_size = (args.batch_size or int(getenv("SCORING_BATCH_SIZE", "15"))) * \
+                 (args.concurrency or int(getenv("SCORING_CONCURRENCY", "4")))
+    timeout = float(getenv("FOLLOW_TIMEOUT_S", "900"))
+
+    def candidates():
+        for it in iter_ndjson(raw_path, follow=args.follow, timeout=timeout):
+            if it.get("link") in done:
+                continue
+            if clusterer is not None and clusterer.add(it) is not None:
+                continue  # folded into a story we already have
+            yield clusterer.representatives[-1] if clusterer is not None else it
+
+    total = pruned_n = 0
+    unscored: list[dict] = []
+    for batch in iter_batches(candidates(), batch_size):
+        if not args.no_prefilter:
+            batch, pruned = prefilter_items(batch, strategy, use_top_k=False)
+            pruned_n += append_ndjson(pruned, outdir / "prefiltered_out.ndjson")
+        if not batch:
+            continue
+        try:
+            scored = score_items(batch, strategy, model=model, batch_size=args.batch_size,
+                                 concurrency=args.concurrency, use_cache=not args.no_cache)
+        except ScoringIncompleteError as e:
+            scored = e.scored
+            unscored += e.unscored
+        total += append_ndjson(scored, scored_path)
+        record_scores(scored)
+        print(f"[Stream] scored {len(scored)} (total {total})")
+    mark_ndjson_done(scored_path)
+    save_unscored(outdir, unscored)
+    if pruned_n:
+        print(f"[Prefilter] pruned {pruned_n} off-topic item(s)")
+    print(f"Scored {total} new items ({len(done) + total} total) → {scored_path}")
+
+def _fmt_ts(ts: float | None) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M") if ts else "n/a"
+
+def cmd_cache(args):
+    from core.scoring import score_cache
+    from core.generation import generation_cache
+    from core.seen_cache import stats as seen_cache_stats, prune_expired as prune_seen_cache
+
+    caches = [("Score cache", score_cache()), ("Generation cache", generation_cache())]
+    if args.action == "prune":
+        for _, cache in caches:
+            dropped = cache.prune()
+            cache.save()
+            print(f"Pruned {dropped} expired/overflow entries from {cache.path}")
+        print(f"Pruned {prune_seen_cache()} expired links from the seen-links cache")
+        return
+    for label, cache in caches:
+        st = cache.stats()
+        print(f"{label}: {st['path']}")
+        print(f"  entries:  {st['entries']} ({st['bytes'] / 1024:.1f} KiB)")
+        print(f"  oldest:   {_fmt_ts(st['oldest_ts'])}")
+        print(f"  newest:   {_fmt_ts(st['newest_ts'])}")
+        print(f"  lookups:  {st['hits']} hit / {st['misses']} miss ({st['hit_rate']:.0%} hit rate)")
+
+    from core.item_store import enabled as item_store_enabled, stats as item_store_stats
+    if item_store_enabled():
+        st = item_store_stats()
+        print(f"Item store: {st['path']}")
+        print(f"  items:    {st['items']} ({st['scored']} scored), {st['first_day'] or 'n/a'} – {st['last_day'] or 'n/a'}")
+
+    seen = seen_cache_stats()
+    print(f"Seen links: {seen['path']}")
+    print(f"  links:    {seen['count']}")
+    print(f"  oldest:   {_fmt_ts(seen['oldest_ts'])}")
+    print(f"  newest:   {_fmt_ts(seen['newest_ts'])}")
+    for link, ts in seen["recent"]:
+        print(f"    {_fmt_ts(ts)}  {link}")
+
+def cmd_usage(args):
+    from core.usage_guard import BudgetGuard, usage_summary
+
+    g = BudgetGuard()
+    print(f"Usage ledger: {g.path}")
+    print(f"  today:    ${g.spent:.4f} / ${g.max_daily:.2f} (all agents)")
+    g.close()
+    summary = usage_summary(args.month)
+    print(f"  {summary['month']}:  ${summary['total']:.4f}")
+    for agent, calls, cost in summary["by_agent"]:
+        print(f"    {agent:<20} {calls:>6} calls  ${cost:.4f}")
+    if args.daily:
+        for day, agent, calls, cost in summary["by_day"]:
+            print(f"    {day}  {agent:<20} {calls:>6} calls  ${cost:.4f}")
+
+def _window(args) -> dict:
+    """--since/--until as absolute days ({} when neither was given)."""
+    from core.item_store import parse_day
+
+    since, until = getattr(args, "since", None), getattr(args, "until", None)
+    return {k: parse_day(v) for k, v in (("since", since), ("until", until)) if v}
+
+def _ranked_items(args, outdir: Path) -> list[dict]:
+    """Today's scored items, or with --since/--until every scored item in that range (from the item store)."""
+    window = _window(args)
+    if window:
+        from core.item_store import query_items
+        return rank_items(query_items(**window))
+    if not items_exist(outdir, "scored_items"):
+        return []
+    return rank_items(read_items(outdir, "scored_items"))
+
+def _scored_by_link(args, outdir: Path, links: list[str]) -> list[dict]:
+    """Scored items for these links, in the order given (no re-ranking); from the item store with --since/--until."""
+    if _window(args):
+        from core.item_store import get_items
+        return [it for it in get_items(links) if it.get("total") is not None]
+    if not items_exist(outdir, "scored_items"):
+        return []
+    by_link = {it.get("link"): it for it in read_items(outdir, "scored_items")}
+    return [by_link[u] for u in links if u in by_link]
+
 def cmd_list(args):
-    outdir = run_dir_for_today(os.getenv("OUTPUT_DIR", "output"))
-    scored_path = outdir / "scored_items.json"
-    scored = read_json(scored_path)
-    ranked = rank_items(scored)
+    outdir = run_dir_for_today(getenv("OUTPUT_DIR", "output"))
+    ranked = _ranked_items(args, outdir)
     if not ranked:
         print("No scored items. Run: python voice_agent.py score")
         return
@@ -134,45 +382,74 @@ def cmd_list(args):
         why = it.get("why_relevant", "")
         if len(why) > 160:
             why = why[:157] + "..."
-        print(f"{i}) {title}  [total={total}]")
+        day = f"{it['run_date']}  " if _window(args) and it.get("run_date") else ""
+        print(f"{i}) {day}{title}  [total={total}]")
         if why:
             print(f"    why: {why}")
 
-def cmd_generate(args):
-    outdir = run_dir_for_today(os.getenv("OUTPUT_DIR", "output"))
-    scored_path = outdir / "scored_items.json"
-    scored = read_json(scored_path)
-    ranked = rank_items(scored)
-    if not ranked:
-        print("No scored items. Run: python voice_agent.py score")
-        return
-
-    top_n = args.top_n or int(os.getenv("TOP_N", "3"))
-    picks = parse_selection(args.selection, len(ranked), top_n)
-    if not picks:
-        print("No valid selection. Try `python voice_agent.py list` first.")
-        return
+def cmd_search(args):
+    from core.item_store import search
 
-    chosen_scored = [ranked[i-1] for i in picks]
-    strategy = load_strategy(os.getenv("STRATEGY_FILE", "strategy.md"))
-    model = args.model_generation or os.getenv("MODEL_GENERATION", "gpt-4o-mini")
-    ideas_md = draft_posts(chosen_scored, strategy, model=model, angle_hint=args.angle)
+    t0 = time.perf_counter()
+    hits = search(args.query, since=args.since, until=args.until, limit=args.limit)
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    for it in hits:
+        total = it.get("total")
+        print(f"{it.get('run_date', '')}  [{'-' if total is None else total:>2}] {(it.get('title') or '')[:110]}")
+        print(f"    {it.get('link', '')}" + (f"  ({it['feed']})" if it.get("feed") else ""))
+    print(f"{len(hits)} match(es) in {elapsed_ms:.0f} ms")
 
+def cmd_generate(args):
+    from core.generation import draft_posts
+    from core.emailer import queue_email
+
+    outdir = run_dir_for_today(getenv("OUTPUT_DIR", "output"))
+    links = getattr(args, "links", None)
+    if links:
+        # review-poll already turned the reply's numbers into the emailed items' links
+        picks = parse_selection_line(args.selection)
+        chosen_scored = _scored_by_link(args, outdir, links)
+        if not chosen_scored:
+            print("None of the picked items are in the scored items.")
+            return
+    else:
+        ranked = _ranked_items(args, outdir)
+        if not ranked:
+            print("No scored items. Run: python voice_agent.py score")
+            return
+
+        top_n = args.top_n or int(getenv("TOP_N", "3"))
+        picks = parse_selection(args.selection, len(ranked), top_n)
+        if not picks:
+            print("No valid selection. Try `python voice_agent.py list` first.")
+            return
+
+        chosen_scored = [ranked[i-1] for i in picks]
+    strategy = load_strategy(getenv("STRATEGY_FILE", "strategy.md"))
+    model = args.model_generation or getenv("MODEL_GENERATION", "gpt-4o-mini")
+    use_cache = not getattr(args, "no_cache", False)
 
     # Build digest from raw items (only for chosen links)
-    raw_items = read_json(outdir / "raw_items.json")
-    chosen_links = {c["link"] for c in chosen_scored}
-    filtered = [it for it in raw_items if it["link"] in chosen_links]
-    digest = to_markdown_digest(filtered, ideas_md)
+    if _window(args):
+        filtered = chosen_scored  # stored items carry their raw fields; they may come from other days
+    else:
+        raw_items = read_items(outdir, "raw_items")
+        chosen_links = {c["link"] for c in chosen_scored}
+        filtered = [it for it in raw_items if it["link"] in chosen_links]
 
     # Write daily MD (append if exists)
-    prefix = os.getenv("MARKDOWN_PREFIX", "voice_agent_")
-    md_path = Path(os.getenv("OUTPUT_DIR", "output")) / f"{prefix}{datetime.now().strftime('%Y-%m-%d')}.md"
-    if md_path.exists():
-        append_text("\n---\n\n", md_path)
-        append_text(digest, md_path)
+    prefix = getenv("MARKDOWN_PREFIX", "voice_agent_")
+    md_path = Path(getenv("OUTPUT_DIR", "output")) / f"{prefix}{datetime.now().strftime('%Y-%m-%d')}.md"
+    if getattr(args, "stream", False):
+        digest = _stream_digest(chosen_scored, filtered, strategy, model, args.angle, use_cache, md_path)
     else:
-        write_text(digest, md_path)
+        ideas_md = draft_posts(chosen_scored, strategy, model=model, angle_hint=args.angle, use_cache=use_cache)
+        digest = to_markdown_digest(filtered, ideas_md)
+        if md_path.exists():
+            append_text("\n---\n\n", md_path)
+            append_text(digest, md_path)
+        else:
+            write_text(digest, md_path)
 
     print(f"Wrote Markdown digest for picks {picks} → {md_path}")
     #
@@ -181,53 +458,130 @@ def cmd_generate(args):
         # Send the digest inline as plain text
         body = digest  # plain text; Markdown characters are fine in text/plain
         try:
-            send_email(subject, body)  # no attachments
-            print("Emailed digest (inline) to configured recipients.")
+            queue_email(subject, body)  # no attachments
+            print("Queued digest email (inline) for configured recipients.")
         except Exception:
-            print("[EMAIL] Failed to send inline digest; see traceback above.")
+            print("[EMAIL] Failed to queue inline digest; see traceback above.")
             raise
 
 
     # Optional budget echo
     try:
-        from usage_guard import BudgetGuard
+        from core.usage_guard import BudgetGuard
         g = BudgetGuard()
         print(f"[Budget] Spent today: ${g.spent:.4f} / ${g.max_daily:.2f}")
     except Exception:
         pass
 
 
+def _stream_digest(chosen: list[dict], filtered: list[dict], strategy: str, model: str,
+                   angle: str | None, use_cache: bool, md_path: Path) -> str:
+    """Print drafts as tokens arrive and append each finished section to the daily Markdown."""
+    from core.generation import stream_posts
+
+    digest = to_markdown_digest(filtered, None) + "\n## Suggested LinkedIn Angles & Drafts\n\n"
+    if md_path.exists():
+        append_text("\n---\n\n", md_path)
+        append_text(digest, md_path)
+    else:
+        write_text(digest, md_path)
+
+    def echo(text: str):
+        print(text, end="", flush=True)
+
+    for section in stream_posts(chosen, strategy, model=model, angle_hint=angle,
+                                on_delta=echo, use_cache=use_cache):
+        print("\n")
+        append_text(section + "\n\n", md_path)
+        digest += section + "\n\n"
+    return digest
+
 def cmd_review_email(args):
-    outdir = run_dir_for_today(os.getenv("OUTPUT_DIR", "output"))
-    scored_path = outdir / "scored_items.json"
-    if not Path(scored_path).exists():
+    outdir = run_dir_for_today(getenv("OUTPUT_DIR", "output"))
+    window = _window(args)
+    if not window and not items_exist(outdir, "scored_items"):
         print("No scored_items.json for today. Run: fetch → score first.")
         return
-    scored = read_json(outdir / "scored_items.json")
-    ranked = rank_items(scored)
+    ranked = _ranked_items(args, outdir)
     if not ranked:
         print("No scored items for today. Run: python pipeline.py <agent> score")
         return
 
-    min_total = args.min_total or int(os.getenv("MIN_TOTAL", "10"))
+    _send_review(ranked, outdir, args.max_items, args.min_total, window)
+
+def _send_review(ranked: list[dict], outdir: Path, max_items: int | None, min_total: int | None,
+                 window: dict | None = None):
+    from core.emailer import queue_email
+
+    min_total = min_total or int(getenv("MIN_TOTAL", "10"))
 
     body, index_map = build_review(
         ranked,
-        max_items=args.max_items,
+        max_items=max_items,
         min_total=min_total
     )
+    if window:
+        # review-poll looks the picked links up in the item store rather than in today's files
+        index_map.update(window)
+        save_json(index_map, outdir / "index_map.json")
     subject = f"[content_pipeline] Review - {datetime.now().strftime('%Y-%m-%d')} (run {index_map['run_id']})"
 
     try:
-        send_email(subject, body)
-        print(f"Sent review email for {len(index_map['items'])} items. See: {outdir/'scored_review.txt'}")
+        queue_email(subject, body)
+        print(f"Queued review email for {len(index_map['items'])} items. See: {outdir/'scored_review.txt'}")
     except Exception:
-        print("[EMAIL] Failed to send review email; see traceback above.")
+        print("[EMAIL] Failed to queue review email; see traceback above.")
         raise
 
+def cmd_run(args):
+    from core.streaming import run_pipelined
+
+    feeds = load_feeds_list(getenv("FEEDS_FILE", "feeds.txt"))
+    strategy = load_strategy(getenv("STRATEGY_FILE", "strategy.md"))
+    outdir = run_dir_for_today(getenv("OUTPUT_DIR", "output"))
+    result = run_pipelined(
+        feeds,
+        strategy,
+        outdir,
+        model=args.model_scoring or getenv("MODEL_SCORING", "gpt-4o-mini"),
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        use_seen_cache=not args.ignore_cache,
+        use_feed_cache=False if args.refresh else None,
+        use_score_cache=not args.no_cache,
+        cluster=not args.no_cluster,
+        prefilter=not args.no_prefilter,
+    )
+
+    report, t = result["report"], result["timings"]
+    failed = [r for r in report if not r["ok"]]
+    for r in failed:
+        print(f"[WARN] Feed failed after {r['elapsed_s']:.1f}s: {r['url']} ({r['error']})")
+    print(f"[Fetch] {len(report) - len(failed)} ok / {len(failed)} failed; {result['raw_count']} new item(s)")
+    if result["pruned"]:
+        print(f"[Prefilter] pruned {result['pruned']} off-topic item(s)")
+    print(f"[Pipeline] first item {t.get('first_item', 0):.1f}s, first score {t.get('first_scored', 0):.1f}s, "
+          f"fetch done {t['fetch_done']:.1f}s, score done {t['score_done']:.1f}s")
+    # Run back to back, the stages would take at least fetch time + model time
+    print(f"[Pipeline] wall {t['total']:.1f}s vs {t['fetch_done'] + t['score_s']:.1f}s sequential "
+          f"(fetch {t['fetch_done']:.1f}s + scoring {t['score_s']:.1f}s)")
+
+    ranked = rank_items(result["scored"])
+    if not ranked:
+        print("No new items scored; no review email sent.")
+    elif args.no_email:
+        body, index_map = build_review(ranked, max_items=args.max_items,
+                                       min_total=args.min_total or int(getenv("MIN_TOTAL", "10")))
+        print(f"Review for {len(index_map['items'])} items written to {outdir/'scored_review.txt'} (not emailed)")
+    else:
+        _send_review(ranked, outdir, args.max_items, args.min_total)
+    _budget_echo()
+
 def cmd_review_poll(args):
+    from core.imap_poll import find_latest_selection
+
     # Idempotence marker
-    outdir = run_dir_for_today(os.getenv("OUTPUT_DIR", "output"))
+    outdir = run_dir_for_today(getenv("OUTPUT_DIR", "output"))
     marker = outdir / "review_processed.json"
 
     if args.reset and marker.exists():
@@ -239,7 +593,11 @@ def cmd_review_poll(args):
         return
 
     # Load map built by review-email
-    index_map = load_index_map()
+    try:
+        index_map = load_index_map()
+    except FileNotFoundError:
+        print("No review email sent today yet (index_map.json missing). Run review-email first.")
+        return
     run_id = index_map.get("run_id") or ""
     sel_line, uid, frm = find_latest_selection(run_id)
     if not sel_line:
@@ -251,14 +609,24 @@ def cmd_review_poll(args):
         print(f"Reply found (from {frm}) but no valid selection in line: {sel_line!r}")
         return
 
+    # The numbers refer to the emailed list; items scored since (intraday) may have moved the ranking
+    urls = {e.get("i"): e.get("url") for e in index_map.get("items", [])}
+    links = [urls[i] for i in picks if urls.get(i)]
+    if not links:
+        print(f"Reply from {frm} picks {picks}, but none of them were in the review email.")
+        return
+
     # Reuse the existing generate flow programmatically
     # Construct argparse-style namespace for cmd_generate
     gen_args = argparse.Namespace(
         selection=",".join(str(i) for i in picks),
+        links=links,
         top_n=None,
         model_generation=None,
         angle=args.angle,
         email=args.email_on_generate,
+        since=index_map.get("since"),
+        until=index_map.get("until"),
     )
     print(f"Reply from {frm} → selection {picks}. Triggering generate...")
     cmd_generate(gen_args)
@@ -277,9 +645,32 @@ def cmd_review_poll(args):
     )
     print(f"Marked processed → {marker}")
 
+def cmd_review_watch(args):
+    from core.imap_watch import watch
+
+    poll_args = argparse.Namespace(force=False, reset=False, angle=args.angle,
+                                   email_on_generate=args.email_on_generate)
+
+    def on_new_mail():
+        cmd_review_poll(poll_args)  # the processed marker makes repeat triggers harmless
+
+    print("[Watch] waiting for review replies (Ctrl-C to stop)")
+    try:
+        watch(on_new_mail)
+    except KeyboardInterrupt:
+        print("[Watch] stopped")
+
+def cmd_mail_flush(args):
+    from core.emailer import flush, spool_dir
+
+    sent, rejected, left = flush(include_failed=args.failed, timeout=args.timeout)
+    print(f"Mail spool {spool_dir()}: sent {sent}, rejected {rejected}, still queued {left}")
+    if rejected:
+        print(f"  rejected messages are in {spool_dir() / 'failed'} (retry with --failed)")
+
 # ---------- CLI ----------
 
-def main():
+def main(argv: list[str] | None = None):
     parser = argparse.ArgumentParser(
         description=textwrap.dedent("""
             Voice Agent – Workflow & Parameters
@@ -290,6 +681,7 @@ def main():
                 2. score     – Send parsed items + strategy to GPT for scoring/ranking.
                 3. list      – Show ranked items with numeric IDs.
                 4. generate  – Generate LinkedIn-style posts for selected items.
+                (`run` does 1–2 plus review-email in one pipelined pass.)
 
             Examples:
                 python pipeline.py <agent> fetch
@@ -309,9 +701,80 @@ def main():
                     - "all"    → all items
                     - "1,3"    → items #1 and #3
                     - "2"      → item #2
+                • Offline / dry runs (LLM_BACKEND in .env):
+                    - synthetic: canned scores and drafts after LLM_SYNTH_LATENCY_S; no key or network.
+                    - record: real calls, replies saved to output/cache/llm_recordings/;
+                      replay: serve those replies only.
+                    - Offline backends use their own cache keys and usage ledger (usage_<backend>.sqlite3).
+                • Reply detection:
+                    - `review-poll` checks the mailbox once (cron-friendly). It only reads mail newer than
+                      the last poll (output/cache/imap_state.json): headers first, then just the text part of
+                      replies from REVIEW_ALLOWED_FROM.
+                    - `review-watch` holds one IMAP IDLE connection and runs review-poll within
+                      seconds of a reply; reconnects on its own. IMAP_SSL=false for plain-text test servers.
+                • Item store (output/items.sqlite3):
+                    - fetch, score and `run` also write every item to one SQLite store, indexed by link, feed,
+                      day and score, with a full-text index; older runs/ are imported the first time.
+                    - `search "voice coaching" --since 90d` finds items across all days.
+                    - `list`, `generate` and `review-email` take --since/--until (YYYY-MM-DD, today, 7d) to rank
+                      every scored item in that range instead of today's; review-poll keeps the same range.
+                    - ITEM_STORE=false turns it off.
+                • Outbound mail:
+                    - review-email, `run` and `generate --email` queue the message in output/mail_spool/ and
+                      return; a background sender delivers it over one reused SMTP connection, retrying
+                      with backoff. The process waits only MAIL_EXIT_WAIT_S (5) at exit.
+                    - Anything left over goes out with the next email or `mail-flush`.
                 • Budget guard:
                     - Set MAX_DAILY_COST_USD in .env to cap daily spend.
-                    - We track usage per day in output/usage/.
+                    - Every call is appended to output/usage/usage.sqlite3 (shared by all agents, with
+                      running per-day/per-agent totals); see `usage [--month YYYY-MM] [--daily]`.
+                    - Each call's cost is estimated before it is sent (tiktoken if installed, else
+                      a character estimate); calls that would overrun the day's budget are split or refused.
+                    - Scoring requests are packed up to SCORING_PROMPT_TOKENS (6000), trimming long summaries.
+                • Score cache:
+                    - Scores are cached by item content + strategy + model + rubric version;
+                      re-running `score` only pays for new items. `score --no-cache` forces a re-score.
+                    - SCORE_CACHE_TTL_DAYS (7), SCORE_CACHE_MAX_ENTRIES (20000); see `cache stats`.
+                • Generation:
+                    - Each selected item is drafted by its own request (GENERATION_CONCURRENCY in flight, default 4).
+                    - Drafts are cached by item + strategy + angle + model, so `generate 1,3` after `generate 1`
+                      only pays for #3. `generate --no-cache` re-drafts; GENERATION_CACHE_TTL_DAYS (30).
+                    - `generate --stream` prints tokens as they arrive (offline: OPENAI_BASE_URL at
+                      scripts/fake_openai.py).
+                • Incremental scoring:
+                    - `score --incremental` merges today's scored_items.json with scores for new links only,
+                      so a short-interval "fetch + score" cron only pays for what arrived since the last tick.
+                • Seen-links cache:
+                    - `fetch` keeps only links not seen before (output/cache/seen_links.sqlite3)
+                      and adds them to today's raw_items.json. `--ignore-cache` saves everything.
+                    - SEEN_CACHE_TTL_DAYS (90): links older than this count as new again.
+                • Near-duplicates:
+                    - `score` folds syndicated copies of one story (MinHash over title + summary) into a
+                      single item; the other sources are kept under "alternates".
+                    - DEDUPE_THRESHOLD (0.6 Jaccard; 0 disables) or `score --no-cluster`.
+                • Local pre-filter (per agent .env; off unless set):
+                    - PREFILTER_MIN_SCORE drops items whose match against strategy.md is below it (about 1
+                      per strategy term an item mentions, more for terms strategy.md repeats).
+                    - PREFILTER_TOP_K sends only the K best matches to the model.
+                    - Pruned items are listed in runs/<date>/prefiltered_out.json.
+                • Streaming artifacts (ARTIFACT_FORMAT=ndjson in .env):
+                    - fetch appends each feed's items to raw_items.ndjson as it finishes;
+                      score appends to scored_items.ndjson one batch at a time (memory still grows
+                      with the day's distinct stories: seen links and the near-duplicate clusterer).
+                    - `score --follow` starts scoring while fetch is still running and stops when a
+                      fetch that ends after it started is done (or after FOLLOW_TIMEOUT_S idle seconds,
+                      default 900); use plain `score` once fetch has already finished.
+                    - list / generate / review-email read either format.
+                • Pipelined run (`run`):
+                    - One command for fetch → score → review-email. Feeds go to the scorer as they finish
+                      and scoring rounds overlap the remaining downloads (bounded queues of
+                      PIPELINE_QUEUE_SIZE, default 8). A partial round is scored after PIPELINE_FLUSH_S (2) idle seconds.
+                    - PREFILTER_TOP_K is not applied (it needs the whole day); PREFILTER_MIN_SCORE is.
+                • Fetch tuning (.env):
+                    - FETCH_WORKERS (16), FETCH_PER_HOST (8), FETCH_TIMEOUT seconds (20).
+                    - Per-feed results/errors are written to runs/<date>/fetch_report.json.
+                    - Unchanged feeds (HTTP 304 / same body hash) are served from output/cache/feeds/;
+                      set FEED_CACHE=false or pass --refresh to always re-download.
         """),
         formatter_class=argparse.RawTextHelpFormatter
     )
@@ -320,34 +783,94 @@ def main():
 
     p_fetch = sub.add_parser("fetch", help="Fetch and store RSS/Atom feed items")
     p_fetch.add_argument("--ignore-cache", action="store_true",
-                     help="Do not use seen-links cache; fetch/save all items (may cause duplicates).")
+                     help="Do not use seen-links cache; fetch/save all items and replace today's raw_items.json.")
+    p_fetch.add_argument("--refresh", action="store_true",
+                     help="Ignore stored ETag/Last-Modified validators and re-download every feed.")
     p_fetch.set_defaults(func=cmd_fetch)
 
     p_score = sub.add_parser("score", help="Score parsed items using GPT")
     p_score.add_argument("--model-scoring", help="OpenAI model for scoring (default: from .env MODEL_SCORING)")
+    p_score.add_argument("--batch-size", type=int,
+                         help="Items per scoring request (default: SCORING_BATCH_SIZE or 15)")
+    p_score.add_argument("--concurrency", type=int,
+                         help="Scoring requests in flight at once (default: SCORING_CONCURRENCY or 4)")
+    p_score.add_argument("--incremental", action="store_true",
+                         help="Keep today's scored_items.json and only score links not in it yet (or SCORE_INCREMENTAL=true)")
+    p_score.add_argument("--no-cluster", action="store_true",
+                         help="Score near-duplicate stories separately instead of folding them together")
+    p_score.add_argument("--no-prefilter", action="store_true",
+                         help="Send every item to the model, ignoring PREFILTER_TOP_K / PREFILTER_MIN_SCORE")
+    p_score.add_argument("--follow", action="store_true",
+                         help="Score raw_items.ndjson batch by batch while fetch is still writing it")
+    p_score.add_argument("--no-cache", action="store_true",
+                         help="Re-score every item instead of reusing cached scores (results are still cached)")
     p_score.set_defaults(func=cmd_score)
 
+    p_cache = sub.add_parser("cache", help="Inspect or prune the score, generation and seen-links caches")
+    p_cache.add_argument("action", choices=["stats", "prune"],
+                         help="stats: entries, age and hit rate; prune: apply TTL/size eviction now")
+    p_cache.set_defaults(func=cmd_cache)
+
+    p_usage = sub.add_parser("usage", help="Show model spend today and per agent for a month")
+    p_usage.add_argument("--month", help="YYYY-MM (default: this month)")
+    p_usage.add_argument("--daily", action="store_true", help="Also list spend per day and agent")
+    p_usage.set_defaults(func=cmd_usage)
+
     p_list = sub.add_parser("list", help="List ranked items with IDs")
+    p_list.add_argument("--since", help="Rank items scored on or after this day (YYYY-MM-DD, today, or e.g. 7d)")
+    p_list.add_argument("--until", help="Rank items scored on or before this day")
     p_list.set_defaults(func=cmd_list)
 
+    p_search = sub.add_parser("search", help="Full-text search over every fetched/scored item in the item store")
+    p_search.add_argument("query", help="Words that must all appear in the title, summary or why_relevant")
+    p_search.add_argument("--since", help="Only items from this day on (YYYY-MM-DD, today, or e.g. 90d)")
+    p_search.add_argument("--until", help="Only items up to this day")
+    p_search.add_argument("--limit", type=int, default=20, help="Show at most this many matches (default: 20)")
+    p_search.set_defaults(func=cmd_search)
+
     p_gen = sub.add_parser("generate", help="Generate LinkedIn posts from scored items")
     p_gen.add_argument("selection", nargs="?", default=None,
                        help="Selection: e.g. '1', '1,3', or 'all'. Omit to use --top-n / TOP_N.")
     p_gen.add_argument("--top-n", type=int, help="Number of top items when no selection is given (default: TOP_N)")
     p_gen.add_argument("--model-generation", help="OpenAI model for generation (default: from .env MODEL_GENERATION)")
     p_gen.add_argument("--angle", help="Angle hint applied to all selected items (e.g. 'focus on voice coaching takeaways').")
+    p_gen.add_argument("--stream", action="store_true",
+                       help="Print drafts as they are written and append each item to the Markdown when done")
+    p_gen.add_argument("--no-cache", action="store_true",
+                       help="Re-draft every selected item instead of reusing cached drafts (results are still cached)")
+    p_gen.add_argument("--since", help="Select from items scored on or after this day (same numbering as `list --since`)")
+    p_gen.add_argument("--until", help="Select from items scored on or before this day")
     p_gen.add_argument(
         "--email",
         action="store_true",
         help="Email the digest inline as plain text to EMAIL_TO after generating."
     )
     p_rev_email = sub.add_parser("review-email", help="Email a numbered plain-text list of today's scored items")
-    p_rev_email.add_argument("--max-items", type=int, default=int(os.getenv("REVIEW_MAX_ITEMS", "30")),
+    p_rev_email.add_argument("--max-items", type=int, default=int(getenv("REVIEW_MAX_ITEMS", "30")),
                              help="Limit the number of items listed (default: 30)")
     p_rev_email.add_argument("--min-total", type=int, help="Only include items with total score >= this (default: MIN_TOTAL or 10)")
+    p_rev_email.add_argument("--since", help="Review items scored on or after this day instead of today's (e.g. 7d)")
+    p_rev_email.add_argument("--until", help="Review items scored on or before this day")
 
     p_rev_email.set_defaults(func=cmd_review_email)
 
+    p_run = sub.add_parser("run", help="fetch → score → review-email as one overlapped in-process pipeline")
+    p_run.add_argument("--model-scoring", help="OpenAI model for scoring (default: from .env MODEL_SCORING)")
+    p_run.add_argument("--batch-size", type=int,
+                       help="Items per scoring request (default: SCORING_BATCH_SIZE or 15)")
+    p_run.add_argument("--concurrency", type=int,
+                       help="Scoring requests in flight at once (default: SCORING_CONCURRENCY or 4)")
+    p_run.add_argument("--ignore-cache", action="store_true", help="Do not use the seen-links cache")
+    p_run.add_argument("--refresh", action="store_true", help="Re-download every feed (ignore ETag/Last-Modified)")
+    p_run.add_argument("--no-cluster", action="store_true", help="Do not fold near-duplicate stories")
+    p_run.add_argument("--no-prefilter", action="store_true", help="Skip the PREFILTER_MIN_SCORE check")
+    p_run.add_argument("--no-cache", action="store_true", help="Re-score every item instead of reusing cached scores")
+    p_run.add_argument("--max-items", type=int, default=int(getenv("REVIEW_MAX_ITEMS", "30")),
+                       help="Limit the number of items in the review (default: 30)")
+    p_run.add_argument("--min-total", type=int, help="Only review items with total score >= this (default: MIN_TOTAL or 10)")
+    p_run.add_argument("--no-email", action="store_true", help="Write the review files but do not email them")
+    p_run.set_defaults(func=cmd_run)
+
     p_rev_poll = sub.add_parser("review-poll", help="Poll mailbox for a reply and trigger generate")
     p_rev_poll.add_argument("--force", action="store_true",
                             help="Ignore processed marker and run anyway")
@@ -358,11 +881,24 @@ def main():
                             help="If set, pass --email to generate after a valid reply")
     p_rev_poll.set_defaults(func=cmd_review_poll)
 
+    p_rev_watch = sub.add_parser("review-watch",
+                                 help="Keep an IMAP IDLE connection open and run review-poll as soon as mail arrives")
+    p_rev_watch.add_argument("--angle", help="Angle hint applied when generating from a reply")
+    p_rev_watch.add_argument("--email-on-generate", action="store_true",
+                             help="If set, pass --email to generate after a valid reply")
+    p_rev_watch.set_defaults(func=cmd_review_watch)
+
+    p_mail = sub.add_parser("mail-flush", help="Send everything waiting in the outbound mail spool now")
+    p_mail.add_argument("--failed", action="store_true",
+                        help="Also retry messages the server rejected (mail_spool/failed/)")
+    p_mail.add_argument("--timeout", type=float, help="Give up after this many seconds (default: MAIL_DRAIN_TIMEOUT_S or 60)")
+    p_mail.set_defaults(func=cmd_mail_flush)
+
 
 
     p_gen.set_defaults(func=cmd_generate)
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     args.func(args)
 
 if __name__ == "__main__":
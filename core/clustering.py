@@ -0,0 +1,124 @@
+# core/clustering.py
+"""
+Near-duplicate story clustering (MinHash + LSH banding).
+
+Google Alerts often returns one syndicated story under several URLs. Each item
+is reduced to word 3-gram shingles of its title and the start of its summary;
+MinHash signatures are bucketed by band so only likely matches are compared
+(the band size is derived from DEDUPE_THRESHOLD so near-duplicates at the
+threshold are almost always compared), and candidates are confirmed with an
+exact Jaccard check. The first item of a
+cluster (newest, given fetch's ordering) is kept as the representative and the
+rest are attached to it under "alternates".
+"""
+import hashlib
+import random
+import re
+from core.config import getenv
+
+_MERSENNE = (1 << 61) - 1
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def _tokens(item: dict, summary_words: int = 40) -> list[str]:
+    title = _WORD_RE.findall((item.get("title") or "").lower())
+    summary = _WORD_RE.findall((item.get("summary") or "").lower())[:summary_words]
+    return title + summary
+
+def shingles(item: dict, k: int = 3) -> set[str]:
+    toks = _tokens(item)
+    if len(toks) < k:
+        return {" ".join(toks)} if toks else set()
+    return {" ".join(toks[i:i + k]) for i in range(len(toks) - k + 1)}
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def lsh_params(threshold: float, num_perm: int, recall: float = 0.95) -> tuple[int, int]:
+    """
+    (bands, rows) for the longest bands that still make a pair at exactly
+    `threshold` Jaccard a candidate with probability >= recall, i.e.
+    1 - (1 - t**rows) ** bands >= recall. Longer bands mean fewer false candidates.
+    """
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+class Clusterer:
+    """Incremental clusterer: feed items one at a time with add()."""
+
+    def __init__(self, threshold: float | None = None, num_perm: int = 32, bands: int | None = None):
+        self.threshold = _env_float("DEDUPE_THRESHOLD", 0.6) if threshold is None else threshold
+        if bands:
+            self.bands, self.rows = bands, num_perm // bands
+        else:
+            # 0.6 → 16 bands × 2 rows (0.999 of threshold-level pairs compared; 8 × 4 managed 0.67)
+            self.bands, self.rows = lsh_params(min(max(self.threshold, 0.01), 1.0), num_perm)
+        rng = random.Random(1)  # fixed seed: signatures are stable across runs
+        self._perms = [(rng.randrange(1, _MERSENNE), rng.randrange(0, _MERSENNE)) for _ in range(num_perm)]
+        self._buckets: dict[tuple, list[int]] = {}
+        self._shingles: list[set[str]] = []
+        self.representatives: list[dict] = []
+
+    def _signature(self, sh: set[str]) -> list[int]:
+        hashed = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in sh]
+        return [min((a * h + b) % _MERSENNE for h in hashed) for a, b in self._perms]
+
+    def _band_keys(self, sig: list[int]) -> list[tuple]:
+        return [(i, tuple(sig[i * self.rows:(i + 1) * self.rows])) for i in range(self.bands)]
+
+    def add(self, item: dict) -> dict | None:
+        """
+        Returns the representative the item was folded into, or None if the item
+        starts a new cluster (it is then available in self.representatives).
+        """
+        sh = shingles(item)
+        if not sh or self.threshold <= 0:
+            self._new_cluster(item, sh)
+            return None
+
+        keys = self._band_keys(self._signature(sh))
+        candidates = {idx for key in keys for idx in self._buckets.get(key, ())}
+        best, best_sim = None, 0.0
+        for idx in sorted(candidates):
+            sim = jaccard(sh, self._shingles[idx])
+            if sim > best_sim:
+                best, best_sim = idx, sim
+        if best is not None and best_sim >= self.threshold:
+            rep = self.representatives[best]
+            rep.setdefault("alternates", []).append({
+                "title": item.get("title", ""),
+                "link": item.get("link", ""),
+                "feed": item.get("feed", ""),
+                "published_ts": item.get("published_ts", 0),
+            })
+            return rep
+
+        idx = self._new_cluster(item, sh)
+        for key in keys:
+            self._buckets.setdefault(key, []).append(idx)
+        return None
+
+    def _new_cluster(self, item: dict, sh: set[str]) -> int:
+        rep = dict(item)
+        if "alternates" in rep:
+            rep["alternates"] = list(rep["alternates"])  # never mutate the caller's item
+        self.representatives.append(rep)
+        self._shingles.append(sh)
+        return len(self.representatives) - 1
+
+def cluster_items(items: list[dict], threshold: float | None = None) -> list[dict]:
+    """Collapse near-duplicates; returns one representative per story, in input order."""
+    c = Clusterer(threshold=threshold)
+    for it in items:
+        c.add(it)
+    return c.representatives
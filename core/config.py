@@ -0,0 +1,88 @@
+# core/config.py
+"""
+Per-agent configuration without touching os.environ.
+
+pipeline.py builds one AgentConfig per agent (its .env + the usual defaults) and
+activates it with use(). Core modules read settings through getenv(), which looks
+at the active agent's config first and then falls back to the process
+environment. The active config lives in a ContextVar, so several agents can run
+side by side in one process; worker pools must hop threads with bind().
+"""
+import contextvars
+import os
+from contextlib import contextmanager
+from pathlib import Path
+
+# Keys that may contain a $MAIN_DIR placeholder
+_MAIN_DIR_KEYS = ("FEEDS_FILE", "STRATEGY_FILE", "OUTPUT_DIR", "SEEN_CACHE_FILE", "MARKDOWN_PREFIX",
+                  "USAGE_LEDGER_FILE", "ITEM_STORE_FILE")
+
+class AgentConfig:
+    def __init__(self, name: str, values: dict[str, str]):
+        self.name = name
+        self.values = values
+
+    @classmethod
+    def from_dir(cls, agent_dir: Path) -> "AgentConfig":
+        """Same precedence as the old load_agent_env: agent .env > process env > defaults."""
+        env_path = agent_dir / ".env"
+        from dotenv import dotenv_values  # only needed when loading an agent
+
+        values = {k: v for k, v in dotenv_values(env_path).items() if v is not None} if env_path.exists() else {}
+
+        def lookup(key: str) -> str | None:
+            return values.get(key, os.environ.get(key))
+
+        # If MAIN_DIR isn't set, use this agent_dir by default
+        main_dir = (lookup("MAIN_DIR") or "").strip() or str(agent_dir)
+        values["MAIN_DIR"] = main_dir
+        for key in _MAIN_DIR_KEYS:
+            val = lookup(key)
+            if val:
+                values[key] = val.replace("$MAIN_DIR", main_dir)
+        # Point core at this agent's config
+        defaults = {
+            "FEEDS_FILE": str(agent_dir / "feeds.txt"),
+            "STRATEGY_FILE": str(agent_dir / "strategy.md"),
+            "OUTPUT_DIR": str(agent_dir / "output"),
+            "MARKDOWN_PREFIX": f"{agent_dir.name}_",
+        }
+        for key, val in defaults.items():
+            if lookup(key) is None:
+                values[key] = val
+        values.setdefault("AGENT_NAME", agent_dir.name)
+        return cls(agent_dir.name, values)
+
+    def get(self, key: str, default: str | None = None) -> str | None:
+        if key in self.values:
+            return self.values[key]
+        return os.environ.get(key, default)
+
+_current: contextvars.ContextVar[AgentConfig | None] = contextvars.ContextVar("agent_config", default=None)
+
+def current() -> AgentConfig | None:
+    return _current.get()
+
+def getenv(key: str, default: str | None = None) -> str | None:
+    """Drop-in for os.getenv that honours the active agent's config."""
+    cfg = _current.get()
+    if cfg is not None:
+        return cfg.get(key, default)
+    return os.getenv(key, default)
+
+@contextmanager
+def use(cfg: AgentConfig):
+    token = _current.set(cfg)
+    try:
+        yield cfg
+    finally:
+        _current.reset(token)
+
+def bind(fn):
+    """Wrap fn so it runs with the caller's active config, e.g. inside a thread pool."""
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run
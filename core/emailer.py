@@ -1,24 +1,64 @@
 # core/emailer.py
-import os, smtplib, mimetypes, ssl, traceback
+"""
+Outbound mail.
+
+queue_email() writes the message to OUTPUT_DIR/mail_spool/ and returns; a
+background sender per spool delivers it over one SMTP connection per account,
+kept open and reused (a NOOP checks it after SMTP_NOOP_AFTER_S idle seconds),
+so several review and digest emails pay for STARTTLS and login once. Transient
+failures are retried with jittered backoff (MAIL_RETRY_BASE_S,
+MAIL_RETRY_MAX_S) up to MAIL_MAX_ATTEMPTS times; the message then stays in the
+spool and is tried again when the next message is queued (the counters start
+over), by `mail-flush`, or by the next process to queue mail. Messages the
+server rejects outright (5xx) move to mail_spool/failed/. At exit the process
+waits only MAIL_EXIT_WAIT_S (5) seconds for the spool to empty, since spooled
+mail outlives it; `mail-flush` waits up to MAIL_DRAIN_TIMEOUT_S (60).
+
+send_email() still sends synchronously, over the same pooled connection.
+"""
+import atexit
+import mimetypes
+import os
+import random
+import smtplib
+import ssl
+import threading
+import time
+import traceback
+import uuid
+from contextlib import nullcontext
+from datetime import datetime
+from email import message_from_bytes, policy
 from email.message import EmailMessage
 from pathlib import Path
+from core.config import bind, current, getenv, use
 
-def send_email(subject: str, body_text: str, attachments: list[str] | None = None) -> None:
-    host = os.getenv("SMTP_HOST")
-    port = int(os.getenv("SMTP_PORT", "587"))
-    user = os.getenv("SMTP_USER")
-    pwd  = os.getenv("SMTP_PASSWORD")
-    use_tls = os.getenv("SMTP_TLS", "true").lower() in ("1","true","yes")
-    use_ssl = os.getenv("SMTP_SSL", "false").lower() in ("1","true","yes")
-    sender = os.getenv("EMAIL_FROM", user or "")
-    recipients = [r.strip() for r in os.getenv("EMAIL_TO","").split(",") if r.strip()]
-
-    if not (host and port and user and pwd and sender and recipients):
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def _settings() -> dict:
+    s = {
+        "host": getenv("SMTP_HOST"),
+        "port": int(getenv("SMTP_PORT", "587")),
+        "user": getenv("SMTP_USER"),
+        "pwd": getenv("SMTP_PASSWORD"),
+        "tls": getenv("SMTP_TLS", "true").lower() in ("1", "true", "yes"),
+        "ssl": getenv("SMTP_SSL", "false").lower() in ("1", "true", "yes"),
+    }
+    s["sender"] = getenv("EMAIL_FROM", s["user"] or "")
+    s["recipients"] = [r.strip() for r in getenv("EMAIL_TO", "").split(",") if r.strip()]
+    if not (s["host"] and s["port"] and s["user"] and s["pwd"] and s["sender"] and s["recipients"]):
         raise RuntimeError("Email not configured: need SMTP_HOST, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, EMAIL_FROM/TO")
+    return s
 
+def build_message(subject: str, body_text: str, attachments: list[str] | None = None) -> EmailMessage:
+    s = _settings()
     msg = EmailMessage()
-    msg["From"] = sender
-    msg["To"] = ", ".join(recipients)
+    msg["From"] = s["sender"]
+    msg["To"] = ", ".join(s["recipients"])
     msg["Subject"] = subject
     msg.set_content(body_text)
 
@@ -29,21 +69,240 @@ def send_email(subject: str, body_text: str, attachments: list[str] | None = Non
         ctype, _ = mimetypes.guess_type(str(p))
         maintype, subtype = (ctype or "application/octet-stream").split("/", 1)
         msg.add_attachment(p.read_bytes(), maintype=maintype, subtype=subtype, filename=p.name)
+    return msg
 
-    try:
-        if use_ssl:
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(host, port, context=context) as s:
-                s.login(user, pwd)
-                s.send_message(msg)
+# ---------- pooled connections ----------
+
+class _Connection:
+    """One authenticated SMTP session, re-opened when the server has dropped it."""
+
+    def __init__(self, settings: dict):
+        self.settings = settings
+        self.smtp: smtplib.SMTP | None = None
+        self.last_used = 0.0
+        self.lock = threading.Lock()
+
+    def _open(self):
+        s = self.settings
+        timeout = _env_float("SMTP_TIMEOUT_S", 30.0)
+        if s["ssl"]:
+            smtp = smtplib.SMTP_SSL(s["host"], s["port"], context=ssl.create_default_context(), timeout=timeout)
         else:
-            with smtplib.SMTP(host, port, timeout=30) as s:
-                if use_tls:
-                    s.starttls(context=ssl.create_default_context())
-                s.login(user, pwd)
-                s.send_message(msg)
+            smtp = smtplib.SMTP(s["host"], s["port"], timeout=timeout)
+            if s["tls"]:
+                smtp.starttls(context=ssl.create_default_context())
+        smtp.login(s["user"], s["pwd"])
+        self.smtp = smtp
+
+    def _alive(self) -> bool:
+        if self.smtp is None:
+            return False
+        if time.monotonic() - self.last_used < _env_float("SMTP_NOOP_AFTER_S", 30.0):
+            return True
+        try:
+            return self.smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, msg):
+        with self.lock:
+            if not self._alive():
+                self.close()
+                self._open()
+            try:
+                self.smtp.send_message(msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # Dropped between the check and the send: nothing was accepted, so once more on a fresh session
+                self.close()
+                self._open()
+                self.smtp.send_message(msg)
+            self.last_used = time.monotonic()
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.smtp = None
+
+_connections: dict[tuple, _Connection] = {}
+_lock = threading.Lock()
+
+def _connection(settings: dict) -> _Connection:
+    key = (settings["host"], settings["port"], settings["user"], settings["ssl"], settings["tls"])
+    with _lock:
+        conn = _connections.get(key)
+        if conn is None:
+            conn = _connections[key] = _Connection(settings)
+        conn.settings = settings  # pick up a changed password
+        return conn
+
+def send_email(subject: str, body_text: str, attachments: list[str] | None = None) -> None:
+    msg = build_message(subject, body_text, attachments)
+    try:
+        _connection(_settings()).send(msg)
     except Exception:
         # Print full traceback so it's obvious why it failed
         print("[EMAIL] Failed to send email. Traceback:")
         traceback.print_exc()
         raise
+
+# ---------- spool + background sender ----------
+
+def spool_dir() -> Path:
+    return Path(getenv("OUTPUT_DIR", "output")) / "mail_spool"
+
+def _permanent(exc: Exception) -> bool:
+    """The server refused this message itself; sending it again won't help."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(exc, "smtp_code", None)
+    return isinstance(exc, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)) and isinstance(code, int) and code >= 500
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+
+class MailQueue:
+    """Background sender for one spool directory (i.e. one agent)."""
+
+    def __init__(self, spool: Path):
+        self.spool = spool
+        self.cond = threading.Condition()
+        self.attempts: dict[str, int] = {}
+        self.sent = 0
+        self.failed = 0
+        self.busy = False
+        self.thread: threading.Thread | None = None
+        self.config = current()  # the agent it belongs to, for the exit drain
+
+    def pending(self) -> list[Path]:
+        max_attempts = int(_env_float("MAIL_MAX_ATTEMPTS", 5))
+        return [p for p in sorted(self.spool.glob("*.eml")) if self.attempts.get(p.name, 0) < max_attempts]
+
+    def kick(self):
+        with self.cond:
+            self.attempts.clear()  # new mail to send: give messages that ran out of attempts another go
+            if self.thread is None or not self.thread.is_alive():
+                # bind(): the sender reads this agent's SMTP settings and tuning
+                self.thread = threading.Thread(target=bind(self._run), name=f"mail-{self.spool.parent.name}",
+                                               daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def _reclaim(self):
+        # Messages claimed by a process that died mid-send go back in the queue
+        for p in self.spool.glob("*.sending-*"):
+            pid = p.name.rsplit("-", 1)[-1]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                p.replace(p.with_name(p.name.split(".sending-")[0]))
+
+    def _run(self):
+        self._reclaim()
+        while True:
+            with self.cond:
+                todo = self.pending()
+                self.busy = bool(todo)
+                self.cond.notify_all()
+                if not todo:
+                    self.cond.wait(timeout=5.0)
+                    continue
+            for path in todo:
+                if not self._send_file(path):
+                    break  # back off before touching the rest of the queue
+
+    def _send_file(self, path: Path) -> bool:
+        claimed = path.with_name(f"{path.name}.sending-{os.getpid()}")
+        try:
+            path.replace(claimed)  # another process may be draining the same spool
+        except FileNotFoundError:
+            return True
+        try:
+            msg = message_from_bytes(claimed.read_bytes(), policy=policy.default)
+            _connection(_settings()).send(msg)
+        except Exception as e:
+            if _permanent(e):
+                failed = self.spool / "failed"
+                failed.mkdir(exist_ok=True)
+                claimed.replace(failed / path.name)
+                self.failed += 1
+                print(f"[EMAIL] {path.name} rejected, moved to {failed}: {e}")
+                return True
+            claimed.replace(path)
+            n = self.attempts[path.name] = self.attempts.get(path.name, 0) + 1
+            base, cap = _env_float("MAIL_RETRY_BASE_S", 2.0), _env_float("MAIL_RETRY_MAX_S", 120.0)
+            delay = random.uniform(0.5, 1.0) * min(cap, base * (2 ** (n - 1)))
+            print(f"[EMAIL] {path.name} attempt {n} failed ({type(e).__name__}: {e}); retrying in {delay:.0f}s")
+            time.sleep(delay)
+            return False
+        claimed.unlink(missing_ok=True)
+        self.attempts.pop(path.name, None)
+        self.sent += 1
+        return True
+
+    def drain(self, timeout: float) -> int:
+        """Wait until nothing sendable is left (or timeout); returns how many messages remain."""
+        if self.thread is None or not self.thread.is_alive():
+            self.kick()
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while (self.busy or self.pending()) and time.monotonic() < deadline:
+                self.cond.wait(timeout=min(0.5, max(deadline - time.monotonic(), 0.01)))
+        return len(list(self.spool.glob("*.eml"))) + len(list(self.spool.glob("*.sending-*")))
+
+_queues: dict[Path, MailQueue] = {}
+
+def mail_queue() -> MailQueue:
+    spool = spool_dir().resolve()
+    with _lock:
+        q = _queues.get(spool)
+        if q is None:
+            spool.mkdir(parents=True, exist_ok=True)
+            q = _queues[spool] = MailQueue(spool)
+        return q
+
+def queue_email(subject: str, body_text: str, attachments: list[str] | None = None) -> Path:
+    """Spool the message and return at once; the background sender delivers it."""
+    msg = build_message(subject, body_text, attachments)  # fails now if SMTP isn't configured
+    q = mail_queue()
+    name = f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}.eml"  # sorts in queue order
+    tmp = q.spool / f".{name}.tmp"
+    tmp.write_bytes(msg.as_bytes())
+    tmp.replace(q.spool / name)  # atomic: the sender never sees half a message
+    q.kick()
+    return q.spool / name
+
+def flush(include_failed: bool = False, timeout: float | None = None) -> tuple[int, int, int]:
+    """Send everything spooled for the active agent now: (sent, rejected, left)."""
+    q = mail_queue()
+    if include_failed:
+        for p in (q.spool / "failed").glob("*.eml"):
+            p.replace(q.spool / p.name)
+    q.kick()
+    sent, failed = q.sent, q.failed
+    left = q.drain(timeout if timeout is not None else _env_float("MAIL_DRAIN_TIMEOUT_S", 60.0))
+    return q.sent - sent, q.failed - failed, left
+
+@atexit.register
+def _drain_at_exit():
+    if not _queues:
+        return
+    started = time.monotonic()
+    for q in list(_queues.values()):
+        if q.thread is None:
+            continue  # nothing was queued from this process
+        # atexit runs outside any config.use(): read each agent's own settings
+        with use(q.config) if q.config is not None else nullcontext():
+            wait = _env_float("MAIL_EXIT_WAIT_S", 5.0)
+            left = q.drain(max(started + wait - time.monotonic(), 0.0))
+        if left:
+            print(f"[EMAIL] {left} message(s) still in {q.spool}; run `mail-flush` to retry")
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
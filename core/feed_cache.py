@@ -0,0 +1,75 @@
+# core/feed_cache.py
+"""
+Per-feed HTTP validator store (ETag / Last-Modified / body hash).
+
+One small JSON file per feed under OUTPUT_DIR/cache/feeds/, keyed by a hash of
+the feed URL. Alongside the validators we keep the items parsed from the last
+full download, so a 304 or an unchanged body can be served without re-parsing.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from core.config import getenv
+
+def _cache_dir() -> Path:
+    return Path(getenv("OUTPUT_DIR", "output")) / "cache" / "feeds"
+
+def _entry_path(url: str) -> Path:
+    return _cache_dir() / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.json"
+
+def enabled() -> bool:
+    return getenv("FEED_CACHE", "true").lower() in ("1", "true", "yes")
+
+def body_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def load_entry(url: str) -> dict | None:
+    p = _entry_path(url)
+    if not p.exists():
+        return None
+    try:
+        entry = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None  # corrupt entry -> treat as a miss
+    return entry if entry.get("url") == url else None
+
+def conditional_headers(entry: dict | None) -> dict[str, str]:
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+def save_entry(url: str, etag: str | None, last_modified: str | None, digest: str, items: list[dict]) -> None:
+    p = _entry_path(url)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    entry = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "sha256": digest,
+        "checked_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "items": items,
+    }
+    try:
+        tmp = p.with_suffix(p.suffix + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(entry, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(p)  # atomic on same filesystem
+    except Exception:
+        pass  # best-effort; a missing entry only costs a full download next time
+
+def summarize(report: list[dict]) -> dict[str, int]:
+    """Hit/miss counters for one fetch run, from the per-feed report."""
+    counts = {"hits": 0, "not_modified": 0, "unchanged": 0, "misses": 0}
+    for r in report:
+        status = r.get("cache")
+        if status in ("not_modified", "unchanged"):
+            counts["hits"] += 1
+            counts[status] += 1
+        elif status == "miss":
+            counts["misses"] += 1
+    return counts
@@ -1,33 +1,53 @@
 import json
-import os
-from openai import OpenAI
-from typing import Optional
-from core.usage_guard import BudgetGuard
+import queue
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from core.result_cache import ResultCache, content_key
+from core.usage_guard import BudgetGuard, BudgetExceededError
+from core.config import bind, getenv
+from core.llm_client import get_client
+from core.llm_backends import offline_tag
+from core.tokens import estimate_messages, estimate_tokens
 
+# Bump whenever the prompt below changes, so cached drafts are not reused
+PROMPT_VERSION = "1"
 
-def _client():
-    key = os.getenv("OPENAI_API_KEY")
-    if not key:
-        raise RuntimeError("Missing OPENAI_API_KEY")
-    return OpenAI(api_key=key)
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(getenv(name, str(default)))
+    except ValueError:
+        return default
 
-def draft_posts(scored_top: list[dict], strategy_text: str, model: Optional[str] = None, angle_hint: Optional[str] | None = None) -> str:
-    env_model = os.getenv("MODEL_GENERATION") or "gpt-4o-mini"
-    model = model or env_model
+def generation_cache() -> ResultCache:
+    default = Path(getenv("OUTPUT_DIR", "output")) / "cache" / "generation_cache.json"
+    return ResultCache(
+        getenv("GENERATION_CACHE_FILE") or default,
+        ttl_days=float(getenv("GENERATION_CACHE_TTL_DAYS", "30")),
+        max_entries=_env_int("GENERATION_CACHE_MAX_ENTRIES", 5000),
+    )
 
-    guard = BudgetGuard()
-    if not guard.can_spend_more():
-        raise RuntimeError(f"Daily cost limit reached (${guard.spent} / ${guard.max_daily}). Aborting generation.")
+def generation_cache_key(item: dict, strategy_text: str, angle_hint: Optional[str], model: str) -> str:
+    tag = offline_tag()  # offline backends never share drafts with real runs
+    return content_key(
+        *([tag] if tag else []),
+        PROMPT_VERSION,
+        model,
+        content_key(strategy_text),
+        angle_hint or "",
+        item["title"],
+        item["link"],
+    )
 
-    brief = [{"title": it["title"], "link": it["link"]} for it in scored_top]
+def _build_prompt(item: dict, strategy_text: str, angle_hint: Optional[str]) -> str:
+    brief = {"title": item["title"], "link": item["link"]}
 
-    hint_block = f"\nAngle hint (apply across items): {angle_hint}\n" if angle_hint else ""
+    hint_block = f"\nAngle hint: {angle_hint}\n" if angle_hint else ""
 
-    user_prompt = f"""
+    return f"""
 Strategy (tone, audience, rules):
 {strategy_text}
 {hint_block}
-For each item, produce:
+For the item below, produce:
 1) One-line angle/headline (<= 90 chars).
 2) A 120–160 word LinkedIn post in Australian English.
    - Concrete “so what” for our audience.
@@ -35,10 +55,10 @@ For each item, produce:
 3) 3–5 relevant hashtags.
 4) A one-line 'Why this matters' note to the author (not for posting).
 
-Items (JSON):
+Item (JSON):
 {json.dumps(brief, ensure_ascii=False)}
 
-Return as Markdown, with sections per item:
+Return as Markdown, in exactly this shape:
 ## {{title}}
 **Angle:** ...
 **Post:** ...
@@ -46,26 +66,234 @@ Return as Markdown, with sections per item:
 **Why this matters (note to me):** ...
 """
 
-    client = _client()
-    resp = client.chat.completions.create(
-        model=model,
-        temperature=0.7,
-        messages=[
-            {"role": "system", "content": "You craft credible, concise LinkedIn content. No emojis."},
-            {"role": "user", "content": user_prompt},
-        ],
-    )
+def _messages(item: dict, strategy_text: str, angle_hint: Optional[str]) -> list[dict]:
+    return [
+        {"role": "system", "content": "You craft credible, concise LinkedIn content. No emojis."},
+        {"role": "user", "content": _build_prompt(item, strategy_text, angle_hint)},
+    ]
+
+def _reserve(guard: BudgetGuard, model: str, messages: list[dict]) -> float:
+    """Hold the call's estimated cost against today's budget, or refuse it."""
+    if not guard.can_spend_more():
+        raise BudgetExceededError(f"Daily cost limit reached (${guard.spent} / ${guard.max_daily}). Aborting generation.")
+    est = guard.estimate_cost(model, estimate_messages(messages, model), _env_int("GENERATION_OUTPUT_TOKENS", 350))
+    if not guard.reserve(est):
+        raise BudgetExceededError(f"Estimated ${est:.4f} for this draft exceeds the ${guard.remaining():.4f} left today")
+    return est
+
+def _draft_one(client, item: dict, strategy_text: str, model: str, angle_hint: Optional[str], guard: BudgetGuard) -> str:
+    messages = _messages(item, strategy_text, angle_hint)
+    est = _reserve(guard, model, messages)
+    try:
+        resp = client.create(
+            model=model,
+            temperature=0.7,
+            messages=messages,
+        )
+    except Exception:
+        guard.release(est)
+        raise
 
     # Record usage cost (SDK object-safe)
     try:
         u = getattr(resp, "usage", None)
         pt = int(getattr(u, "prompt_tokens", 0) or 0)
         ct = int(getattr(u, "completion_tokens", 0) or 0)
-        guard.add_response(model, pt, ct, meta={"stage": "generation", "items": len(scored_top)})
+        guard.add_response(model, pt, ct, meta={"stage": "generation", "items": 1})
+        if not guard.can_spend_more():
+            print(f"[Budget] Daily limit now reached (${guard.spent} / ${guard.max_daily}).")
+    except Exception as e:
+        print(f"[WARN] Could not record usage: {e}")
+    finally:
+        guard.release(est)
+
+    content = (resp.choices[0].message.content or "").strip()
+    if not content:
+        raise RuntimeError("Model returned no content for generation")
+    return content
+
+def draft_posts(
+    scored_top: list[dict],
+    strategy_text: str,
+    model: Optional[str] = None,
+    angle_hint: Optional[str] | None = None,
+    concurrency: Optional[int] = None,
+    use_cache: bool = True,
+) -> str:
+    """
+    Draft one Markdown section per item, with up to `concurrency`
+    (GENERATION_CONCURRENCY) requests in flight, and join them in input order.
+
+    Drafts are cached by item, strategy, angle, model and prompt version, so
+    regenerating a selection only pays for items not drafted before. Items whose
+    request fails are left out with a warning; if every request fails, raises.
+    """
+    env_model = getenv("MODEL_GENERATION") or "gpt-4o-mini"
+    model = model or env_model
+
+    cache = generation_cache()
+    keys = [generation_cache_key(it, strategy_text, angle_hint, model) for it in scored_top]
+    sections: list[Optional[str]] = [cache.get(k) if use_cache else None for k in keys]
+    todo = [i for i, s in enumerate(sections) if s is None]
+    if use_cache and scored_top:
+        print(f"[Cache] generation: {len(scored_top) - len(todo)} hit / {len(todo)} miss")
+
+    if todo:
+        guard = BudgetGuard()
+        if not guard.can_spend_more():
+            raise RuntimeError(f"Daily cost limit reached (${guard.spent} / ${guard.max_daily}). Aborting generation.")
+        concurrency = max(concurrency or _env_int("GENERATION_CONCURRENCY", 4), 1)
+        client = get_client()
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        draft_one = bind(_draft_one)  # workers see the calling agent's config
+        errors: dict[int, Exception] = {}
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(todo)), thread_name_prefix="generate") as pool:
+            futures = [(i, pool.submit(draft_one, client, scored_top[i], strategy_text, model, angle_hint, guard))
+                       for i in todo]
+            for i, fut in futures:
+                try:
+                    sections[i] = fut.result()
+                    cache.put(keys[i], sections[i])
+                except Exception as e:
+                    errors[i] = e
+        for i, e in sorted(errors.items()):
+            print(f"[WARN] Generation for item '{scored_top[i]['title'][:80]}' failed: {e}")
+        if len(errors) == len(scored_top):
+            first = next(iter(errors.values()))
+            raise RuntimeError(f"All generation requests failed: {first}") from first
+
+    cache.save()
+    return "\n\n".join(s for s in sections if s)
+
+_END = object()
+
+def _record_stream_usage(guard: BudgetGuard, model: str, messages: list[dict], parts: list[str], usage) -> None:
+    """Record the final usage chunk's token counts, or an estimate when the stream ended without one."""
+    try:
+        if usage is not None:
+            pt = int(getattr(usage, "prompt_tokens", 0) or 0)
+            ct = int(getattr(usage, "completion_tokens", 0) or 0)
+        else:
+            pt, ct = estimate_messages(messages, model), estimate_tokens("".join(parts), model)
+            print(f"[WARN] Stream ended without a usage chunk; recording estimated {pt}+{ct} tokens")
+        guard.add_response(model, pt, ct, meta={"stage": "generation", "items": 1, "stream": True,
+                                                "estimated": usage is None})
         if not guard.can_spend_more():
             print(f"[Budget] Daily limit now reached (${guard.spent} / ${guard.max_daily}).")
     except Exception as e:
         print(f"[WARN] Could not record usage: {e}")
 
-    content = resp.choices[0].message.content or ""
+def _stream_one(client, item: dict, strategy_text: str, model: str, angle_hint: Optional[str],
+                guard: BudgetGuard, out: queue.Queue) -> str:
+    """Streaming variant of _draft_one: every content delta is also put on `out`."""
+    messages = _messages(item, strategy_text, angle_hint)
+    est = _reserve(guard, model, messages)
+    parts: list[str] = []
+    usage = None
+    try:
+        stream = client.create(
+            model=model,
+            temperature=0.7,
+            messages=messages,
+            stream=True,
+            stream_options={"include_usage": True},  # final chunk carries the token counts
+        )
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            for choice in chunk.choices or ():
+                text = getattr(choice.delta, "content", None)
+                if text:
+                    parts.append(text)
+                    out.put(text)
+    except Exception:
+        if parts:
+            _record_stream_usage(guard, model, messages, parts, usage)  # cut off mid-answer: still billed
+        guard.release(est)
+        raise
+
+    try:
+        _record_stream_usage(guard, model, messages, parts, usage)
+    finally:
+        guard.release(est)
+
+    content = "".join(parts).strip()
+    if not content:
+        raise RuntimeError("Model returned no content for generation")
     return content
+
+def stream_posts(
+    scored_top: list[dict],
+    strategy_text: str,
+    model: Optional[str] = None,
+    angle_hint: Optional[str] | None = None,
+    on_delta: Optional[Callable[[str], None]] = None,
+    concurrency: Optional[int] = None,
+    use_cache: bool = True,
+) -> Iterator[str]:
+    """
+    Like draft_posts, but yields each item's finished section in input order and
+    passes text to `on_delta` as soon as it arrives. Requests still run
+    concurrently; later items' tokens are buffered until the items before them
+    are done, so output is never interleaved. Cached drafts are emitted at once.
+    """
+    env_model = getenv("MODEL_GENERATION") or "gpt-4o-mini"
+    model = model or env_model
+    on_delta = on_delta or (lambda _text: None)
+
+    cache = generation_cache()
+    keys = [generation_cache_key(it, strategy_text, angle_hint, model) for it in scored_top]
+    sections: list[Optional[str]] = [cache.get(k) if use_cache else None for k in keys]
+    todo = [i for i, s in enumerate(sections) if s is None]
+    if use_cache and scored_top:
+        print(f"[Cache] generation: {len(scored_top) - len(todo)} hit / {len(todo)} miss")
+    if not todo:
+        for section in sections:
+            on_delta(section)
+            yield section
+        cache.save()
+        return
+
+    guard = BudgetGuard()
+    if not guard.can_spend_more():
+        raise RuntimeError(f"Daily cost limit reached (${guard.spent} / ${guard.max_daily}). Aborting generation.")
+    concurrency = max(concurrency or _env_int("GENERATION_CONCURRENCY", 4), 1)
+    client = get_client()
+    deltas = {i: queue.Queue() for i in todo}
+
+    def run(i: int) -> str:
+        try:
+            return _stream_one(client, scored_top[i], strategy_text, model, angle_hint, guard, deltas[i])
+        finally:
+            deltas[i].put(_END)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    run = bind(run)  # workers see the calling agent's config
+    failed = 0
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(todo)), thread_name_prefix="generate") as pool:
+        futures = {i: pool.submit(run, i) for i in todo}
+        try:
+            for i, item in enumerate(scored_top):
+                if sections[i] is not None:
+                    on_delta(sections[i])
+                    yield sections[i]
+                    continue
+                while (text := deltas[i].get()) is not _END:
+                    on_delta(text)
+                try:
+                    sections[i] = futures[i].result()
+                except Exception as e:
+                    failed += 1
+                    print(f"\n[WARN] Generation for item '{item['title'][:80]}' failed: {e}")
+                    continue
+                cache.put(keys[i], sections[i])
+                yield sections[i]
+        finally:
+            for fut in futures.values():
+                fut.cancel()  # consumer stopped early: don't start requests nobody will read
+            cache.save()
+    if failed == len(scored_top):
+        raise RuntimeError("All generation requests failed")
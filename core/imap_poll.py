@@ -1,20 +1,41 @@
 # core/imap_poll.py
+"""
+Find the reviewer's reply ("1,3" or similar) to today's review email.
+
+Each poll only looks at messages that arrived since the last one: the highest
+UID examined is kept in OUTPUT_DIR/cache/imap_state.json (together with the
+folder's UIDVALIDITY, which invalidates it). For the new UIDs we fetch just
+the From/Subject headers and BODYSTRUCTURE in one command, drop senders not in
+REVIEW_ALLOWED_FROM, and then download only the text/plain part of the
+remaining messages, newest first. The run token is matched locally, so the
+server never runs a full-text search. A reply found for a run token is
+remembered, so `review-poll --force` still finds it after the mark has moved on.
+
+On the first poll (or after UIDVALIDITY changes) only UIDs from
+UIDNEXT - IMAP_MAX_SCAN upwards are examined.
+"""
 from __future__ import annotations
 
-import imaplib
+import base64
+import email
+import json
 import os
+import quopri
 import re
 from datetime import datetime
-from typing import Optional, Tuple
-
-import email
-from email.message import Message
 from email import policy
 from email.utils import parseaddr
+from pathlib import Path
+from typing import Optional, Tuple
+
+from core.config import getenv
+
+_SELECTION_RE = re.compile(r"[\d,\-\s]+")
+_KEEP_FOUND = 30  # run tokens remembered in the state file
 
 
 def _env(name: str, default: Optional[str] = None) -> Optional[str]:
-    v = os.getenv(name)
+    v = getenv(name)
     return v if v is not None else default
 
 
@@ -23,151 +44,196 @@ def _allowed_senders() -> set[str]:
     return {s.strip().lower() for s in raw.split(",") if s.strip()}
 
 
-def _connect() -> imaplib.IMAP4_SSL:
+def _connect():
+    from imapclient import IMAPClient
+
     host = _env("IMAP_HOST")
     port_str = _env("IMAP_PORT", "993")
     user = _env("IMAP_USER")
     pwd = _env("IMAP_PASSWORD")
-    folder = _env("IMAP_FOLDER", "INBOX") or "INBOX"
 
     if not (host and port_str and user and pwd):
         raise RuntimeError("IMAP not configured: need IMAP_HOST, IMAP_PORT, IMAP_USER, IMAP_PASSWORD")
 
-    port = int(port_str)
-    m = imaplib.IMAP4_SSL(host, port)
-    m.login(user, pwd)
-    typ, _ = m.select(folder)
-    if typ != "OK":
-        raise RuntimeError(f"Could not select folder {folder!r}")
-    return m
+    use_ssl = (_env("IMAP_SSL", "true") or "true").lower() in ("1", "true", "yes")
+    client = IMAPClient(host, port=int(port_str), ssl=use_ssl, timeout=float(_env("IMAP_TIMEOUT_S", "60") or 60))
+    client.login(user, pwd)
+    return client
 
 
-def _extract_raw_bytes(msg_data: list) -> Optional[bytes]:
-    """
-    imaplib.fetch() often returns a list like:
-      [(b'1 (RFC822 {1234}', b'...raw bytes...'), b')']
-    We want the bytes in the tuple's second element.
-    """
-    for part in msg_data:
-        if isinstance(part, tuple):
-            maybe = part[1]
-            if isinstance(maybe, (bytes, bytearray)):
-                return bytes(maybe)
-    return None
+# ---------- high-water mark ----------
+
+def _state_path() -> Path:
+    return Path(_env("OUTPUT_DIR", "output") or "output") / "cache" / "imap_state.json"
+
+
+def _mailbox_id(folder: str) -> str:
+    return f"{_env('IMAP_USER')}@{_env('IMAP_HOST')}/{folder}"
+
+
+def load_state(folder: str) -> dict:
+    p = _state_path()
+    try:
+        state = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        state = {}
+    if state.get("mailbox") != _mailbox_id(folder):
+        state = {"mailbox": _mailbox_id(folder)}  # different account/folder: start over
+    state.setdefault("found", {})
+    return state
+
+
+def save_state(state: dict) -> None:
+    p = _state_path()
+    try:
+        p.parent.mkdir(parents=True, exist_ok=True)
+        found = state.get("found", {})
+        if len(found) > _KEEP_FOUND:
+            state["found"] = dict(list(found.items())[-_KEEP_FOUND:])
+        tmp = p.with_suffix(p.suffix + f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(p)  # atomic on same filesystem
+    except Exception as e:
+        print(f"[WARN] Could not save IMAP state: {e}")
+
+
+# ---------- BODYSTRUCTURE ----------
 
+def _text(v) -> str:
+    if isinstance(v, bytes):
+        return v.decode("ascii", errors="ignore")
+    return str(v or "")
 
-def _get_plain_text(msg: Message) -> str:
+
+def _params(raw) -> dict[str, str]:
+    if not isinstance(raw, (list, tuple)):
+        return {}
+    return {_text(raw[i]).lower(): _text(raw[i + 1]) for i in range(0, len(raw) - 1, 2)}
+
+
+def find_text_part(body, prefix: str = "") -> Optional[tuple[str, str, str]]:
     """
-    Try the modern API first (policy=default): Message.get_content() for text/plain.
-    Fallback to get_payload(decode=True).
+    Walk a BODYSTRUCTURE (as parsed by imapclient) and return
+    (part_number, transfer_encoding, charset) for the first text/plain part,
+    skipping attachments. A single-part message's text is part "1".
     """
-    body_text = ""
-
-    if msg.is_multipart():
-        for part in msg.walk():
-            try:
-                if part.get_content_type() == "text/plain":
-                    # Preferred: get_content() (handles charset)
-                    try:
-                        content = part.get_content()  # type: ignore[attr-defined]
-                        if isinstance(content, str):
-                            return content
-                    except Exception:
-                        pass
-
-                    payload = part.get_payload(decode=True)
-                    if isinstance(payload, (bytes, bytearray)):
-                        charset = part.get_content_charset() or "utf-8"
-                        try:
-                            return payload.decode(charset, errors="ignore")
-                        except Exception:
-                            return payload.decode("utf-8", errors="ignore")
-                    elif isinstance(payload, str):
-                        return payload
-            except Exception:
-                continue
-        return body_text
-
-    # Single-part
+    if body is None:
+        return None
+    if isinstance(body[0], (list, tuple)):  # multipart: (part, part, ..., subtype, ...)
+        # imapclient wraps the children in a list; a raw parse leaves them inline
+        children = body[0] if isinstance(body[0], list) else [p for p in body if isinstance(p, (list, tuple))]
+        for i, child in enumerate(children, 1):
+            found = find_text_part(child, f"{prefix}{i}.")
+            if found:
+                return found
+        return None
+    if _text(body[0]).lower() != "text" or _text(body[1]).lower() != "plain":
+        return None
+    # type, subtype, params, id, description, encoding, size, lines, then extension data: md5, disposition, ...
+    disposition = body[9] if len(body) > 9 else None
+    if isinstance(disposition, (list, tuple)) and disposition and _text(disposition[0]).lower() == "attachment":
+        return None
+    charset = _params(body[2]).get("charset") or "utf-8"
+    return (prefix.rstrip(".") or "1", _text(body[5]).lower() or "7bit", charset)
+
+
+def _fetched(data: dict, prefix: bytes) -> bytes:
+    # Servers echo section names with their own spelling, e.g. "BODY[HEADER.FIELDS (From Subject)]"
+    for key, value in data.items():
+        if isinstance(key, bytes) and key.upper().startswith(prefix) and isinstance(value, (bytes, bytearray)):
+            return bytes(value)
+    return b""
+
+
+def _decode_part(raw: bytes, encoding: str, charset: str) -> str:
+    if encoding == "base64":
+        raw = base64.b64decode(raw, validate=False)
+    elif encoding == "quoted-printable":
+        raw = quopri.decodestring(raw)
     try:
-        content = msg.get_content()  # type: ignore[attr-defined]
-        if isinstance(content, str):
-            return content
-    except Exception:
-        pass
+        return raw.decode(charset, errors="ignore")
+    except LookupError:
+        return raw.decode("utf-8", errors="ignore")
 
-    payload = msg.get_payload(decode=True)
-    if isinstance(payload, (bytes, bytearray)):
-        charset = msg.get_content_charset() or "utf-8"
-        try:
-            return payload.decode(charset, errors="ignore")
-        except Exception:
-            return payload.decode("utf-8", errors="ignore")
-    if isinstance(payload, str):
-        return payload
 
-    return body_text
+def _selection_in(text: str) -> Optional[str]:
+    # First line that looks like a selection
+    for line in text.splitlines():
+        s = line.strip()
+        if s and _SELECTION_RE.fullmatch(s):
+            return s
+    return None
+
+
+# ---------- poll ----------
+
+def _scan_range(client, folder: str, state: dict) -> tuple[int, int]:
+    """(first UID to examine, UIDVALIDITY); resets the mark when UIDVALIDITY changes."""
+    info = client.select_folder(folder, readonly=True)
+    uidvalidity = int(info.get(b"UIDVALIDITY", 0))
+    uidnext = info.get(b"UIDNEXT")
+    if uidnext is None:
+        uidnext = client.folder_status(folder, [b"UIDNEXT"]).get(b"UIDNEXT", 1)
+    uidnext = int(uidnext)
+    if state.get("uidvalidity") == uidvalidity and state.get("last_uid"):
+        return int(state["last_uid"]) + 1, uidvalidity
+    if state.get("uidvalidity") not in (None, uidvalidity):
+        state["found"] = {}  # UIDs from the old validity period mean nothing now
+    max_scan = int(_env("IMAP_MAX_SCAN", "200") or 200)
+    return max(uidnext - max_scan, 1), uidvalidity
 
 
 def find_latest_selection(run_token: str, date_str: Optional[str] = None) -> Tuple[Optional[str], Optional[int], Optional[str]]:
     """
     Returns (selection_line, email_uid, from_addr) or (None, None, None).
 
-    We search by ASCII-safe BODY token "run <run_token>" so Unicode subjects won't break IMAP SEARCH.
+    A reply matches when "run <run_token>" appears in its subject or in its
+    text/plain body (the quoted review email); both are checked locally.
     """
     allowed = _allowed_senders()
-    date_str = date_str or datetime.now().strftime("%Y-%m-%d")
     token = f"run {run_token}"
+    folder = _env("IMAP_FOLDER", "INBOX") or "INBOX"
+    state = load_state(folder)
+    known = state["found"].get(run_token)
+    best: Optional[tuple] = tuple(known) if known else None
 
-    m = _connect()
+    client = _connect()
     try:
-        # Search unseen first, then all, using BODY token
-        for criteria in [f'(UNSEEN BODY "{token}")', f'(BODY "{token}")']:
-            typ, data = m.search(None, criteria)
-            if typ != "OK" or not data or not data[0]:
-                continue
-
-            try:
-                candidates = [int(x) for x in data[0].split()]
-            except Exception:
-                candidates = []
-
-            candidates.sort(reverse=True)  # newest first
-
-            for uid in candidates:
-                typ_f, msg_data = m.fetch(str(uid), "(RFC822)")
-                if typ_f != "OK" or not msg_data:
+        start, uidvalidity = _scan_range(client, folder, state)
+        # "n:*" always matches the highest UID, even when it is below n
+        uids = sorted((u for u in client.search(["UID", f"{start}:*"]) if u >= start), reverse=True)
+        if uids:
+            meta = client.fetch(uids, [b"BODY.PEEK[HEADER.FIELDS (FROM SUBJECT)]", b"BODYSTRUCTURE"])
+            for uid in uids:  # newest first
+                if best and uid <= best[1]:
+                    break
+                data = meta.get(uid) or {}
+                headers = email.message_from_bytes(_fetched(data, b"BODY[HEADER"), policy=policy.default)
+                from_addr = (parseaddr(str(headers.get("From", "")))[1] or "").lower()
+                if allowed and from_addr not in allowed:
                     continue
-
-                raw_bytes = _extract_raw_bytes(msg_data)
-                if raw_bytes is None:
+                subject = str(headers.get("Subject", ""))
+                part = find_text_part(data.get(b"BODYSTRUCTURE"))
+                if part is None:
                     continue
-
-                # Use modern policy for better parsing and get_content()
-                msg = email.message_from_bytes(raw_bytes, policy=policy.default)
-
-                # From header
-                from_header = msg.get("From", "")
-                _, addr = parseaddr(from_header)
-                from_addr = (addr or "").lower()
-                if allowed and from_addr not in allowed:
+                number, encoding, charset = part
+                raw = client.fetch([uid], [f"BODY.PEEK[{number}]".encode()]).get(uid, {})
+                body = _decode_part(_fetched(raw, f"BODY[{number}]".encode()), encoding, charset)
+                if token not in subject and token not in body:
                     continue
-
-                body_text = _get_plain_text(msg)
-
-                # Find first line that looks like a selection
-                for line in body_text.splitlines():
-                    s = line.strip()
-                    if s and re.fullmatch(r"[\d,\-\s]+", s):
-                        return (s, uid, from_addr)
-
-        return (None, None, None)
+                sel = _selection_in(body)
+                if sel:
+                    best = (sel, uid, from_addr)
+                    state["found"][run_token] = list(best)
+                    break
+            state["last_uid"] = max(uids[0], int(state.get("last_uid") or 0))
+        state["uidvalidity"] = uidvalidity
+        state["checked_at"] = datetime.now().isoformat(timespec="seconds")
+        save_state(state)
     finally:
         try:
-            m.close()
-        except Exception:
-            pass
-        try:
-            m.logout()
+            client.logout()
         except Exception:
             pass
+
+    return best if best else (None, None, None)
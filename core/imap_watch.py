@@ -0,0 +1,111 @@
+# core/imap_watch.py
+"""
+Push-based reply detection with IMAP IDLE.
+
+watch() keeps one authenticated connection open on IMAP_FOLDER and sits in
+IDLE; when the server announces new mail (EXISTS / RECENT) it calls
+on_new_mail(), which normally runs review-poll. IDLE is re-issued every
+IMAP_IDLE_RENEW_S seconds (servers drop idlers after ~30 minutes), dropped
+connections are re-opened with jittered backoff, and on_new_mail() also runs
+once after every (re)connect so a reply that arrived while we were away is
+not missed. Servers without IDLE fall back to a NOOP every
+IMAP_NOOP_INTERVAL_S seconds on the same connection.
+"""
+import random
+import socket
+import threading
+import time
+from typing import Callable, Optional
+from core.config import getenv
+
+_NEW_MAIL = (b"EXISTS", b"RECENT")
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def _connect():
+    from imapclient import IMAPClient  # only the watcher needs it
+
+    host = getenv("IMAP_HOST")
+    port = int(getenv("IMAP_PORT", "993") or "993")
+    user = getenv("IMAP_USER")
+    pwd = getenv("IMAP_PASSWORD")
+    folder = getenv("IMAP_FOLDER", "INBOX") or "INBOX"
+    if not (host and user and pwd):
+        raise RuntimeError("IMAP not configured: need IMAP_HOST, IMAP_PORT, IMAP_USER, IMAP_PASSWORD")
+
+    use_ssl = (getenv("IMAP_SSL", "true") or "true").lower() in ("1", "true", "yes")
+    client = IMAPClient(host, port=port, ssl=use_ssl, timeout=_env_float("IMAP_TIMEOUT_S", 60.0))
+    client.login(user, pwd)
+    client.select_folder(folder, readonly=True)
+    return client
+
+def _has_new_mail(responses: list) -> bool:
+    return any(isinstance(r, tuple) and len(r) > 1 and r[1] in _NEW_MAIL for r in responses)
+
+def _close(client):
+    for step in (getattr(client, "idle_done", None), getattr(client, "logout", None)):
+        try:
+            if step:
+                step()
+        except Exception:
+            pass
+
+def _notify(on_new_mail: Callable[[], None]):
+    # A failing review-poll must not look like a dropped connection
+    try:
+        on_new_mail()
+    except Exception:
+        import traceback
+        print("[Watch] handler failed:")
+        traceback.print_exc()
+
+def watch(on_new_mail: Callable[[], None], stop: Optional[threading.Event] = None) -> None:
+    """Block until `stop` is set (or Ctrl-C), calling on_new_mail() whenever mail arrives."""
+    stop = stop or threading.Event()
+    renew_s = _env_float("IMAP_IDLE_RENEW_S", 300.0)
+    noop_s = _env_float("IMAP_NOOP_INTERVAL_S", 60.0)
+    backoff_max = _env_float("IMAP_RECONNECT_MAX_S", 120.0)
+    failures = 0
+
+    while not stop.is_set():
+        client = None
+        try:
+            client = _connect()
+            idle = b"IDLE" in client.capabilities()
+            print(f"[Watch] connected to {getenv('IMAP_HOST')} ({'IDLE' if idle else f'NOOP every {noop_s:.0f}s'})")
+            failures = 0
+            _notify(on_new_mail)  # catch up on anything that arrived while disconnected
+
+            while not stop.is_set():
+                if idle:
+                    client.idle()
+                    deadline = time.monotonic() + renew_s
+                    responses = []
+                    # Short checks so `stop` is honoured promptly
+                    while not stop.is_set() and not responses and time.monotonic() < deadline:
+                        responses = client.idle_check(timeout=min(5.0, renew_s))
+                    # An EXISTS can arrive between the last check and DONE; it comes back here
+                    responses = list(responses) + list(client.idle_done()[1])
+                else:
+                    stop.wait(noop_s)
+                    _, responses = client.noop()
+                if _has_new_mail(responses):
+                    _notify(on_new_mail)
+        except (OSError, socket.timeout, EOFError) as e:
+            failures += 1
+            print(f"[Watch] connection lost: {e}")
+        except Exception as e:
+            # imapclient raises its own error types (IMAPClientError, abort, ...); treat them all as a drop
+            failures += 1
+            print(f"[Watch] {type(e).__name__}: {e}")
+        finally:
+            if client is not None:
+                _close(client)
+        if failures and not stop.is_set():
+            delay = random.uniform(0.5, 1.0) * min(backoff_max, 2 ** min(failures, 10))
+            print(f"[Watch] reconnecting in {delay:.0f}s")
+            stop.wait(delay)
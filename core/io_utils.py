@@ -1,7 +1,9 @@
 import json
 import os
+import time
 from datetime import datetime
 from pathlib import Path
+from typing import Iterable, Iterator
 
 def ensure_dir(path: str | Path):
     Path(path).mkdir(parents=True, exist_ok=True)
@@ -14,8 +16,11 @@ def run_dir_for_today(base: str = "output") -> Path:
 def save_json(obj, path: str | Path):
     p = Path(path)
     ensure_dir(p.parent)
-    with open(p, "w", encoding="utf-8") as f:
+    # Write-then-rename so a crash mid-write never leaves a half-written artifact
+    tmp = p.with_suffix(p.suffix + f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
         json.dump(obj, f, ensure_ascii=False, indent=2)
+    tmp.replace(p)
 
 def read_json(path: str | Path):
     with open(path, "r", encoding="utf-8") as f:
@@ -32,3 +37,104 @@ def append_text(text: str, path: str | Path):
     ensure_dir(p.parent)
     with open(p, "a", encoding="utf-8") as f:
         f.write(text)
+
+# ---------- NDJSON artifacts ----------
+# One JSON object per line, append-only. A crash can at worst leave one partial
+# trailing line, which readers skip. Writers end a run with an {"_eof": true}
+# marker so a follower knows the producer has finished.
+
+EOF_MARKER = {"_eof": True}
+
+def append_ndjson(records: Iterable[dict], path: str | Path) -> int:
+    p = Path(path)
+    ensure_dir(p.parent)
+    n = 0
+    with open(p, "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            n += 1
+        f.flush()
+    return n
+
+def mark_ndjson_done(path: str | Path):
+    append_ndjson([EOF_MARKER], path)
+
+def iter_ndjson(path: str | Path, follow: bool = False, poll_interval: float = 0.5,
+                timeout: float | None = None) -> Iterator[dict]:
+    """
+    Yield records from an NDJSON file. With follow=True, keep tailing the file
+    until the producer's EOF marker is the last thing in it (or `timeout`
+    seconds pass without new data), so a consumer can start before the
+    producer finishes. Markers already in the file when following starts
+    belong to earlier runs and are ignored.
+    """
+    p = Path(path)
+    existed = p.exists()
+    waited = 0.0
+    while follow and not p.exists():
+        if timeout is not None and waited >= timeout:
+            return
+        time.sleep(poll_interval)
+        waited += poll_interval
+    if not p.exists():
+        return
+
+    with open(p, "r", encoding="utf-8") as f:
+        # A file created after we started holds only the run we are waiting for
+        start_size = os.fstat(f.fileno()).st_size if existed else 0
+        pending = ""
+        idle = 0.0
+        while True:
+            line = f.readline()
+            if not line:
+                if not follow:
+                    return  # an unterminated trailing line is a torn write; skip it
+                if timeout is not None and idle >= timeout:
+                    return
+                time.sleep(poll_interval)
+                idle += poll_interval
+                continue
+            idle = 0.0
+            if not line.endswith("\n"):
+                if not follow:
+                    return
+                pending += line  # producer is mid-write; wait for the rest
+                continue
+            line, pending = pending + line, ""
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if rec.get("_eof"):
+                # Stop only on a marker written after we started, with nothing appended after it
+                if follow and f.tell() > start_size and f.tell() >= os.fstat(f.fileno()).st_size:
+                    return
+                continue
+            yield rec
+
+def iter_batches(records: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def artifact_format() -> str:
+    from core.config import getenv
+    fmt = (getenv("ARTIFACT_FORMAT", "json") or "json").lower()
+    return fmt if fmt in ("json", "ndjson") else "json"
+
+def read_items(run_dir: str | Path, name: str) -> list[dict]:
+    """Load runs/<date>/<name>.ndjson if present, else <name>.json."""
+    nd = Path(run_dir) / f"{name}.ndjson"
+    if nd.exists():
+        return list(iter_ndjson(nd))
+    return read_json(Path(run_dir) / f"{name}.json")
+
+def items_exist(run_dir: str | Path, name: str) -> bool:
+    return (Path(run_dir) / f"{name}.ndjson").exists() or (Path(run_dir) / f"{name}.json").exists()
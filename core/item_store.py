@@ -0,0 +1,269 @@
+# core/item_store.py
+"""
+One SQLite store for every item any run has fetched or scored
+(OUTPUT_DIR/items.sqlite3, or ITEM_STORE_FILE), so questions that span days
+don't have to open each runs/<date>/ directory.
+
+fetch upserts the raw fields, score adds total / why_relevant and merges the
+scored fields into the stored item. Rows are keyed by the normalised link (seen_cache.item_key) and
+indexed by run date, feed, score and publish time; title, summary and
+why_relevant are also in an FTS5 index for `search`. The per-day JSON/NDJSON
+files stay the source of truth for a day's run; the store is built alongside
+them (and back-filled from existing runs/ the first time it is opened).
+Set ITEM_STORE=false to skip it.
+"""
+import json
+import re
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable
+from core.config import getenv
+from core.seen_cache import item_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id           INTEGER PRIMARY KEY,
+    link         TEXT NOT NULL UNIQUE,
+    title        TEXT NOT NULL DEFAULT '',
+    summary      TEXT NOT NULL DEFAULT '',
+    feed         TEXT NOT NULL DEFAULT '',
+    published_ts REAL,
+    run_date     TEXT NOT NULL,
+    total        INTEGER,
+    why_relevant TEXT NOT NULL DEFAULT '',
+    updated_at   REAL NOT NULL,
+    data         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS items_run_date ON items(run_date, total);
+CREATE INDEX IF NOT EXISTS items_feed ON items(feed, run_date);
+CREATE INDEX IF NOT EXISTS items_total ON items(total);
+CREATE INDEX IF NOT EXISTS items_published ON items(published_ts);
+"""
+
+# External-content FTS table kept in step by triggers; skipped if SQLite lacks FTS5
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+    title, summary, why_relevant, content='items', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS items_ai AFTER INSERT ON items BEGIN
+    INSERT INTO items_fts(rowid, title, summary, why_relevant)
+    VALUES (new.id, new.title, new.summary, new.why_relevant);
+END;
+CREATE TRIGGER IF NOT EXISTS items_ad AFTER DELETE ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, summary, why_relevant)
+    VALUES ('delete', old.id, old.title, old.summary, old.why_relevant);
+END;
+CREATE TRIGGER IF NOT EXISTS items_au AFTER UPDATE OF title, summary, why_relevant ON items BEGIN
+    INSERT INTO items_fts(items_fts, rowid, title, summary, why_relevant)
+    VALUES ('delete', old.id, old.title, old.summary, old.why_relevant);
+    INSERT INTO items_fts(rowid, title, summary, why_relevant)
+    VALUES (new.id, new.title, new.summary, new.why_relevant);
+END;
+"""
+
+_UPSERT_RAW = """
+INSERT INTO items(link, title, summary, feed, published_ts, run_date, updated_at, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(link) DO UPDATE SET
+    title = excluded.title, summary = excluded.summary, feed = excluded.feed,
+    published_ts = excluded.published_ts, run_date = excluded.run_date, updated_at = excluded.updated_at,
+    data = excluded.data
+WHERE items.total IS NULL
+"""
+
+# Scored records carry only what the model returns (title, link, why_relevant, scores),
+# so the fetched summary / feed / published_ts and the raw JSON fields are kept
+_UPSERT_SCORED = """
+INSERT INTO items(link, title, summary, feed, published_ts, run_date, total, why_relevant, updated_at, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(link) DO UPDATE SET
+    title = excluded.title,
+    summary = COALESCE(NULLIF(excluded.summary, ''), items.summary),
+    feed = COALESCE(NULLIF(excluded.feed, ''), items.feed),
+    published_ts = COALESCE(excluded.published_ts, items.published_ts), run_date = excluded.run_date,
+    total = excluded.total, why_relevant = excluded.why_relevant, updated_at = excluded.updated_at,
+    data = json_patch(items.data, excluded.data)
+"""
+
+def enabled() -> bool:
+    return (getenv("ITEM_STORE", "true") or "true").lower() in ("1", "true", "yes")
+
+def store_path() -> Path:
+    default = Path(getenv("OUTPUT_DIR", "output")) / "items.sqlite3"
+    return Path(getenv("ITEM_STORE_FILE") or default)
+
+def _connect() -> sqlite3.Connection:
+    path = store_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")  # `search` never waits for a running fetch
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    try:
+        conn.executescript(_FTS_SCHEMA)
+    except sqlite3.OperationalError:
+        pass  # no FTS5 in this SQLite build: search falls back to LIKE
+    _backfill(conn, Path(getenv("OUTPUT_DIR", "output")) / "runs")
+    return conn
+
+def _has_fts(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'items_fts'").fetchone() is not None
+
+def _today() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+def _row(it: dict, run_date: str, now: float) -> tuple:
+    return (item_key(it), it.get("title") or "", it.get("summary") or "", it.get("feed") or "",
+            it.get("published_ts"), run_date, now)
+
+def _write(conn: sqlite3.Connection, raw: Iterable[dict], scored: Iterable[dict], run_date: str) -> int:
+    now = time.time()
+    raw_rows = [(*_row(it, run_date, now), json.dumps(it, ensure_ascii=False)) for it in raw]
+    # json_patch() treats null as "delete", so None-valued scored fields are left out
+    scored_rows = [(*_row(it, run_date, now)[:6], int(it.get("total") or 0), it.get("why_relevant") or "",
+                    now, json.dumps({k: v for k, v in it.items() if v is not None}, ensure_ascii=False))
+                   for it in scored]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(_UPSERT_RAW, [r for r in raw_rows if r[0]])
+        conn.executemany(_UPSERT_SCORED, [r for r in scored_rows if r[0]])
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    return len(raw_rows) + len(scored_rows)
+
+def _backfill(conn: sqlite3.Connection, runs: Path) -> None:
+    """One-off import of existing runs/<date>/ artifacts into an empty store."""
+    if not runs.is_dir() or conn.execute("SELECT 1 FROM items LIMIT 1").fetchone():
+        return
+    from core.io_utils import read_items, items_exist
+
+    for day in sorted(p for p in runs.iterdir() if p.is_dir() and re.fullmatch(r"\d{4}-\d{2}-\d{2}", p.name)):
+        try:
+            raw = read_items(day, "raw_items") if items_exist(day, "raw_items") else []
+            scored = read_items(day, "scored_items") if items_exist(day, "scored_items") else []
+            _write(conn, raw, scored, day.name)
+        except (OSError, ValueError) as e:
+            print(f"[WARN] Item store: skipped {day}: {e}")
+
+def _record(raw: list[dict], scored: list[dict], run_date: str | None) -> int:
+    if not enabled() or not (raw or scored):
+        return 0
+    try:
+        conn = _connect()
+        try:
+            return _write(conn, raw, scored, run_date or _today())
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        # The day's files are already written; a store hiccup must not fail the run
+        print(f"[WARN] Item store not updated: {e}")
+        return 0
+
+def record_items(items: list[dict], run_date: str | None = None) -> int:
+    """Upsert fetched items; links that already have a score are left as scored."""
+    return _record(items, [], run_date)
+
+def record_scores(scored: list[dict], run_date: str | None = None) -> int:
+    """Upsert scored items."""
+    return _record([], scored, run_date)
+
+# ---------- queries ----------
+
+def parse_day(value: str | None) -> str | None:
+    """'YYYY-MM-DD', 'today', or 'Nd' (N days ago) → 'YYYY-MM-DD'."""
+    if not value:
+        return None
+    value = value.strip().lower()
+    if value == "today":
+        return _today()
+    m = re.fullmatch(r"(\d+)d", value)
+    if m:
+        return (datetime.now() - timedelta(days=int(m.group(1)))).strftime("%Y-%m-%d")
+    return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+def _range(since: str | None, until: str | None) -> tuple[str, list]:
+    clauses, params = [], []
+    if since:
+        clauses.append("items.run_date >= ?")
+        params.append(parse_day(since))
+    if until:
+        clauses.append("items.run_date <= ?")
+        params.append(parse_day(until))
+    return " AND ".join(clauses), params
+
+def _item(data: str, run_date: str) -> dict:
+    it = json.loads(data)
+    it.setdefault("run_date", run_date)
+    return it
+
+def query_items(since: str | None = None, until: str | None = None, min_total: int | None = None,
+                feed: str | None = None, limit: int | None = None) -> list[dict]:
+    """Scored items whose run date falls in [since, until], best first."""
+    where, params = _range(since, until)
+    clauses = ["total IS NOT NULL"] + ([where] if where else [])
+    if min_total is not None:
+        clauses.append("total >= ?")
+        params.append(min_total)
+    if feed:
+        clauses.append("feed = ?")
+        params.append(feed)
+    sql = f"SELECT data, run_date FROM items WHERE {' AND '.join(clauses)} ORDER BY total DESC, run_date DESC"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    conn = _connect()
+    try:
+        return [_item(data, day) for data, day in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+def get_items(links: list[str]) -> list[dict]:
+    """Stored items for these links, in the order given; unknown links are skipped."""
+    keys = [item_key({"link": u}) for u in links]
+    conn = _connect()
+    try:
+        marks = ",".join("?" * len(keys))
+        rows = conn.execute(f"SELECT link, data, run_date FROM items WHERE link IN ({marks})", keys)
+        found = {link: _item(data, day) for link, data, day in rows}
+    finally:
+        conn.close()
+    return [found[k] for k in keys if k in found]
+
+def _fts_query(text: str) -> str:
+    # Every word must match; quoting keeps '-', ':' etc. from being read as FTS5 syntax
+    return " ".join('"' + w.replace('"', '""') + '"' for w in text.split())
+
+def search(text: str, since: str | None = None, until: str | None = None, limit: int = 20) -> list[dict]:
+    """Items matching all words of `text` in title / summary / why_relevant, best match first."""
+    if not text.strip():
+        return []
+    where, params = _range(since, until)
+    conn = _connect()
+    try:
+        if _has_fts(conn):
+            sql = ("SELECT items.data, items.run_date FROM items_fts JOIN items ON items.id = items_fts.rowid "
+                   f"WHERE items_fts MATCH ? {'AND ' + where if where else ''} "
+                   "ORDER BY bm25(items_fts, 5.0, 1.0, 1.0) LIMIT ?")
+            rows = conn.execute(sql, [_fts_query(text), *params, limit])
+        else:
+            words = text.lower().split()
+            like = " AND ".join("lower(title || ' ' || summary || ' ' || why_relevant) LIKE ?" for _ in words)
+            sql = (f"SELECT data, run_date FROM items WHERE {like} {'AND ' + where if where else ''} "
+                   "ORDER BY run_date DESC LIMIT ?")
+            rows = conn.execute(sql, [*(f"%{w}%" for w in words), *params, limit])
+        return [_item(data, day) for data, day in rows]
+    finally:
+        conn.close()
+
+def stats() -> dict:
+    conn = _connect()
+    try:
+        count, scored, first, last = conn.execute(
+            "SELECT COUNT(*), COUNT(total), MIN(run_date), MAX(run_date) FROM items").fetchone()
+    finally:
+        conn.close()
+    return {"path": str(store_path()), "items": count, "scored": scored, "first_day": first, "last_day": last}
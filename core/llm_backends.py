@@ -0,0 +1,238 @@
+# core/llm_backends.py
+"""
+Offline stand-ins for the OpenAI chat completions API, selected with LLM_BACKEND:
+
+    openai     real API (default)
+    record     real API, and every successful reply is saved to LLM_RECORD_DIR
+    replay     serve saved replies only; no key, no network
+    synthetic  canned but well-formed replies with configurable latency
+
+Every backend exposes chat.completions.create(**kwargs) and returns objects
+shaped like the SDK's (choices[0].message.content, finish_reason, usage; or
+chunks with choices[0].delta.content and a final usage chunk when streaming),
+so scoring, generation and core.llm_client's slots/retries run unchanged.
+Recordings are keyed by model, temperature and messages, not by stream, so a
+reply recorded without streaming can be replayed with --stream and vice versa.
+"""
+import hashlib
+import json
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from types import SimpleNamespace
+from core.config import getenv
+from core.result_cache import content_key
+from core.tokens import estimate_messages, estimate_tokens
+
+BACKENDS = ("openai", "record", "replay", "synthetic")
+
+def backend_name() -> str:
+    name = (getenv("LLM_BACKEND") or "openai").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+    return name
+
+def offline_tag() -> str:
+    """'' for backends that call the real API; otherwise the backend name (keeps fake results out of caches)."""
+    name = backend_name()
+    return "" if name in ("openai", "record") else name
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+# ---------- canned replies ----------
+
+_ITEMS_RE = re.compile(r"^Items:\s*\n(\[.*\])\s*$", re.MULTILINE)
+_ITEM_RE = re.compile(r"^Item \(JSON\):\s*\n(\{.*\})\s*$", re.MULTILINE)
+
+def _seeded(text: str, lo: int, hi: int) -> int:
+    h = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "big")
+    return lo + h % (hi - lo + 1)
+
+def _score_reply(items: list[dict]) -> str:
+    out = []
+    for it in items:
+        link = it.get("link", "")
+        scores = {
+            "relevance": _seeded(link + "r", 0, 5),
+            "locality": _seeded(link + "l", 0, 3),
+            "novelty": _seeded(link + "n", 0, 3),
+            "actionability": _seeded(link + "a", 0, 3),
+            "timeliness": _seeded(link + "t", 0, 2),
+        }
+        out.append({
+            "title": it.get("title", ""),
+            "link": link,
+            "why_relevant": "Synthetic score (offline backend).",
+            "scores": scores,
+            "total": sum(scores.values()),
+        })
+    return json.dumps({"items": out}, ensure_ascii=False)
+
+def _draft_reply(item: dict) -> str:
+    title = item.get("title", "Untitled")
+    return (
+        f"## {title}\n"
+        f"**Angle:** What \"{title[:60]}\" means for leaders in practice\n"
+        "**Post:** This is placeholder copy from an offline backend. It stands in for a "
+        "120–160 word LinkedIn post so the formatting, caching and streaming paths can be "
+        "checked end to end without calling the real API.\n"
+        "**Hashtags:** #Leadership #Voice #Canberra\n"
+        "**Why this matters (note to me):** Synthetic content; do not publish."
+    )
+
+def synthetic_reply(prompt: str) -> str:
+    """Deterministic reply for a scoring ("Items:") or generation ("Item (JSON):") prompt."""
+    m = _ITEMS_RE.search(prompt)
+    if m:
+        try:
+            return _score_reply(json.loads(m.group(1)))
+        except ValueError:
+            pass
+    m = _ITEM_RE.search(prompt)
+    if m:
+        try:
+            return _draft_reply(json.loads(m.group(1)))
+        except ValueError:
+            pass
+    return "OK"
+
+# ---------- SDK-shaped responses ----------
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> SimpleNamespace:
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                           total_tokens=prompt_tokens + completion_tokens)
+
+def _response(content: str, finish_reason: str, usage: SimpleNamespace) -> SimpleNamespace:
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason=finish_reason)],
+                           usage=usage)
+
+def _chunks(content: str, finish_reason: str, usage: SimpleNamespace, include_usage: bool, delay_s: float = 0.0):
+    for piece in re.findall(r"\S+\s*|\s+", content):
+        if delay_s:
+            time.sleep(delay_s)
+        delta = SimpleNamespace(content=piece)
+        yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)], usage=None)
+    done = SimpleNamespace(index=0, delta=SimpleNamespace(content=None), finish_reason=finish_reason)
+    yield SimpleNamespace(choices=[done], usage=None)
+    if include_usage:
+        yield SimpleNamespace(choices=[], usage=usage)
+
+def _reply(kwargs: dict, content: str, finish_reason: str, usage: SimpleNamespace, delay_s: float = 0.0):
+    if kwargs.get("stream"):
+        include = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+        return _chunks(content, finish_reason, usage, include, delay_s)
+    return _response(content, finish_reason, usage)
+
+def request_key(kwargs: dict) -> str:
+    return content_key(kwargs.get("model"), kwargs.get("temperature"), kwargs.get("messages"))
+
+class _Backend(ABC):
+    def __init__(self):
+        # Same attribute path as the SDK client, so LLMClient can wrap either
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    @abstractmethod
+    def create(self, **kwargs):
+        """chat.completions.create(): a response object, or an iterator of chunks with stream=True."""
+
+class SyntheticBackend(_Backend):
+    """
+    Canned replies after LLM_SYNTH_LATENCY_S (± LLM_SYNTH_JITTER_S) seconds; streamed
+    replies arrive at LLM_SYNTH_TOKENS_PER_S (0 = all at once). The jitter is seeded
+    from the request, so a benchmark run is repeatable.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.latency_s = _env_float("LLM_SYNTH_LATENCY_S", 0.3)
+        self.jitter_s = _env_float("LLM_SYNTH_JITTER_S", 0.1)
+        self.tokens_per_s = _env_float("LLM_SYNTH_TOKENS_PER_S", 0.0)
+
+    def create(self, **kwargs):
+        messages = kwargs.get("messages") or []
+        model = kwargs.get("model")
+        content = synthetic_reply("\n".join(m.get("content") or "" for m in messages))
+        usage = _usage(estimate_messages(messages, model), estimate_tokens(content, model))
+        rng = random.Random(request_key(kwargs))
+        time.sleep(max(self.latency_s + rng.uniform(-self.jitter_s, self.jitter_s), 0.0))
+        delay = 1.0 / self.tokens_per_s if self.tokens_per_s > 0 else 0.0
+        return _reply(kwargs, content, "stop", usage, delay)
+
+def _recording_dir() -> Path:
+    default = Path(getenv("OUTPUT_DIR", "output")) / "cache" / "llm_recordings"
+    return Path(getenv("LLM_RECORD_DIR") or default)
+
+class RecordingBackend(_Backend):
+    """Calls the real client and saves each successful reply under LLM_RECORD_DIR."""
+
+    def __init__(self, raw):
+        super().__init__()
+        self.raw = raw
+        self.dir = _recording_dir()
+
+    def create(self, **kwargs):
+        resp = self.raw.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return self._tee(kwargs, resp)
+        choice = resp.choices[0]
+        u = getattr(resp, "usage", None)
+        self._save(kwargs, choice.message.content or "", getattr(choice, "finish_reason", None) or "stop",
+                   int(getattr(u, "prompt_tokens", 0) or 0), int(getattr(u, "completion_tokens", 0) or 0))
+        return resp
+
+    def _tee(self, kwargs: dict, stream):
+        parts, finish, usage = [], "stop", None
+        for chunk in stream:
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+            for choice in chunk.choices or ():
+                if getattr(choice.delta, "content", None):
+                    parts.append(choice.delta.content)
+                finish = getattr(choice, "finish_reason", None) or finish
+            yield chunk
+        self._save(kwargs, "".join(parts), finish,
+                   int(getattr(usage, "prompt_tokens", 0) or 0), int(getattr(usage, "completion_tokens", 0) or 0))
+
+    def _save(self, kwargs: dict, content: str, finish_reason: str, pt: int, ct: int):
+        record = {
+            "request": {k: kwargs.get(k) for k in ("model", "temperature", "messages")},
+            "response": {"content": content, "finish_reason": finish_reason,
+                         "prompt_tokens": pt, "completion_tokens": ct},
+        }
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            path = self.dir / f"{request_key(kwargs)}.json"
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(record, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp.replace(path)
+        except Exception as e:
+            print(f"[WARN] Could not save LLM recording: {e}")
+
+class ReplayMissError(RuntimeError):
+    """No recording matches this request (not retried)."""
+
+class ReplayBackend(_Backend):
+    """Serves replies saved by the record backend, after LLM_REPLAY_LATENCY_S seconds."""
+
+    def __init__(self):
+        super().__init__()
+        self.dir = _recording_dir()
+        self.latency_s = _env_float("LLM_REPLAY_LATENCY_S", 0.0)
+
+    def create(self, **kwargs):
+        path = self.dir / f"{request_key(kwargs)}.json"
+        if not path.exists():
+            raise ReplayMissError(f"No recorded reply for this {kwargs.get('model')} request in {self.dir} "
+                                  "(record one with LLM_BACKEND=record)")
+        r = json.loads(path.read_text(encoding="utf-8"))["response"]
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return _reply(kwargs, r["content"], r.get("finish_reason") or "stop",
+                      _usage(int(r.get("prompt_tokens", 0)), int(r.get("completion_tokens", 0))))
@@ -0,0 +1,195 @@
+# core/llm_client.py
+"""
+One OpenAI client per (API key, base URL) for the whole process.
+
+Scoring and generation both go through get_client().create(...), which wraps
+chat.completions.create (of the real SDK, or of an offline backend picked by
+LLM_BACKEND, see core.llm_backends) with:
+
+- a pooled httpx transport, so TLS connections are reused across calls;
+- a bounded number of requests in flight (LLM_MAX_CONCURRENCY) shared by every
+  thread and agent using the same key, so parallel batches can't stampede the API;
+- retries with jittered exponential backoff on 429, 5xx, timeouts and
+  connection errors (LLM_MAX_RETRIES, LLM_BACKOFF_BASE_S, LLM_BACKOFF_MAX_S),
+  waiting at least as long as the server's Retry-After asks.
+
+The SDK's own retries are switched off so there is exactly one retry policy.
+"""
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from core.config import getenv
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def retry_after_seconds(exc: Exception) -> float | None:
+    """The server's requested wait from Retry-After / retry-after-ms, if any."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(exc: Exception) -> bool:
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        if status == 429:
+            # Out of credit is a 429 too, but waiting won't fix it
+            return getattr(exc, "code", None) != "insufficient_quota"
+        return status >= 500 or status == 408
+    try:
+        import openai
+        return isinstance(exc, (openai.APIConnectionError, openai.APITimeoutError))
+    except (ImportError, AttributeError):
+        return False
+
+def backoff_delay(attempt: int, exc: Exception | None = None) -> float:
+    """Full-jitter exponential backoff, but never shorter than the server's Retry-After."""
+    base = _env_float("LLM_BACKOFF_BASE_S", 0.5)
+    cap = _env_float("LLM_BACKOFF_MAX_S", 30.0)
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    hinted = retry_after_seconds(exc) if exc is not None else None
+    return max(delay, hinted) if hinted is not None else delay
+
+class _SlotStream:
+    """
+    A stream that holds its concurrency slot until it is exhausted, fails,
+    is closed, or is garbage-collected, even if iteration never started.
+    """
+
+    def __init__(self, stream, slots: threading.Semaphore):
+        self._stream = stream
+        self._it = iter(stream)
+        self._slots = slots
+        self._held = True
+        self._lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._it)
+        except BaseException:
+            self.close()  # StopIteration included
+            raise
+
+    def close(self):
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+        try:
+            close = getattr(self._stream, "close", None)
+            if close:
+                close()
+        finally:
+            self._slots.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+class LLMClient:
+    """Thin wrapper around an OpenAI client: shared slots + retry policy."""
+
+    def __init__(self, raw, max_concurrency: int, max_retries: int, slots: threading.Semaphore | None = None):
+        self.raw = raw
+        self.max_retries = max_retries
+        self._slots = slots or threading.BoundedSemaphore(max(max_concurrency, 1))
+
+    def create(self, **kwargs):
+        """
+        Same arguments and return value as chat.completions.create. With
+        stream=True, the request's slot is held until the stream is consumed
+        or closed; retries only happen before the first chunk.
+        """
+        self._slots.acquire()
+        try:
+            resp = self._create_with_retries(kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        if not kwargs.get("stream"):
+            self._slots.release()
+            return resp
+        return _SlotStream(resp, self._slots)
+
+    def _create_with_retries(self, kwargs: dict):
+        attempt = 0
+        while True:
+            try:
+                return self.raw.chat.completions.create(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = backoff_delay(attempt, e)
+                status = getattr(e, "status_code", None) or type(e).__name__
+                print(f"[LLM] {status}; retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+
+_clients: dict[tuple, LLMClient] = {}
+_offline_slots: dict[str, threading.Semaphore] = {}
+_lock = threading.Lock()
+
+def get_client() -> LLMClient:
+    """The shared client for the active LLM_BACKEND (see core.llm_backends)."""
+    from core.llm_backends import backend_name, RecordingBackend, ReplayBackend, SyntheticBackend
+
+    backend = backend_name()
+    max_conc = _env_int("LLM_MAX_CONCURRENCY", 8)
+    if backend in ("synthetic", "replay"):
+        # Built per call (cheap, and picks up the agent's latency/recording settings);
+        # the concurrency limit is still shared process-wide
+        raw = SyntheticBackend() if backend == "synthetic" else ReplayBackend()
+        with _lock:
+            slots = _offline_slots.setdefault(backend, threading.BoundedSemaphore(max(max_conc, 1)))
+        return LLMClient(raw, max_conc, _env_int("LLM_MAX_RETRIES", 5), slots=slots)
+
+    key = getenv("OPENAI_API_KEY")
+    if not key:
+        raise RuntimeError("Missing OPENAI_API_KEY (or set LLM_BACKEND=synthetic / replay to run offline)")
+    # OPENAI_BASE_URL points at a proxy or at scripts/fake_openai.py for offline runs
+    base_url = getenv("OPENAI_BASE_URL") or None
+    with _lock:
+        client = _clients.get((key, base_url))
+        if client is None:
+            # heavy imports; only paid when a model call is made
+            import httpx
+            from openai import OpenAI
+
+            http = httpx.Client(
+                limits=httpx.Limits(max_connections=max_conc, max_keepalive_connections=max_conc),
+                timeout=httpx.Timeout(_env_float("LLM_TIMEOUT_S", 120.0), connect=10.0),
+            )
+            raw = OpenAI(api_key=key, base_url=base_url, http_client=http, max_retries=0)
+            client = LLMClient(raw, max_conc, _env_int("LLM_MAX_RETRIES", 5))
+            _clients[(key, base_url)] = client
+    if backend == "record":
+        return LLMClient(RecordingBackend(client.raw), max_conc, client.max_retries, slots=client._slots)
+    return client
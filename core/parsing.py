@@ -1,19 +1,129 @@
+import html
+import threading
 import time
-import feedparser
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from typing import Iterable, Iterator
 from urllib.parse import urlparse
 
-def clean_html(html: str) -> str:
-    if not html:
+import feedparser
+import requests
+from requests.adapters import HTTPAdapter
+
+from core import feed_cache
+from core.config import bind, getenv
+
+USER_AGENT = "content_pipeline/1.0 (+feedparser)"
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+# ---------- shared HTTP state ----------
+
+_session_lock = threading.Lock()
+_session: requests.Session | None = None
+_host_slots: dict[str, threading.BoundedSemaphore] = {}
+
+def _http() -> requests.Session:
+    """One pooled session per process so repeated fetches reuse connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            s.headers["User-Agent"] = USER_AGENT
+            adapter = HTTPAdapter(pool_maxsize=max(_env_int("FETCH_WORKERS", 16), 1))
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+def _host_slot(url: str, per_host: int) -> threading.BoundedSemaphore:
+    host = urlparse(url).netloc.lower()
+    with _session_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = threading.BoundedSemaphore(max(per_host, 1))
+            _host_slots[host] = slot
+        return slot
+
+# ---------- parsing ----------
+
+_SKIP_TAGS = {"script", "style"}
+
+class _TextExtractor(HTMLParser):
+    """
+    Streaming equivalent of BeautifulSoup(html, "lxml").get_text(" ", strip=True)
+    with script/style removed: one string per text node, comments dropped.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.chunks: list[str] = []
+        self._node: list[str] = []
+        self._skip = 0
+
+    def _flush(self):
+        if self._node:
+            self.chunks.append("".join(self._node))
+            self._node = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in _SKIP_TAGS and self._skip:
+            self._skip -= 1
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._node.append(data)
+
+    def text(self) -> str:
+        self._flush()
+        return " ".join(" ".join(self.chunks).split())
+
+def clean_html(html_text: str) -> str:
+    if not html_text:
         return ""
-    soup = BeautifulSoup(html, "lxml")
-    for tag in soup(["script", "style"]):
-        tag.decompose()
-    text = soup.get_text(" ", strip=True)
-    return " ".join(text.split())
-
-def parse_feed(url: str) -> list[dict]:
-    feed = feedparser.parse(url)
+    if "<" not in html_text:
+        # Fast path: plain text (most Google Alerts summaries after the <b> tags go)
+        if "&" in html_text:
+            html_text = html.unescape(html_text)
+        return " ".join(html_text.split())
+    parser = _TextExtractor()
+    parser.feed(html_text)
+    parser.close()
+    return parser.text()
+
+def items_from_feed(url: str, feed) -> list[dict]:
+    """Flatten a parsed feedparser result into our item dicts."""
     feed_title = getattr(feed.feed, "title", urlparse(url).path)
     items = []
     for e in feed.entries:
@@ -35,10 +145,83 @@ def parse_feed(url: str) -> list[dict]:
         })
     return items
 
-def fetch_items(feed_urls: list[str]) -> list[dict]:
-    all_items = []
-    for u in feed_urls:
-        all_items.extend(parse_feed(u))
+def fetch_feed(url: str, timeout: float | None = None, use_cache: bool = True) -> tuple[list[dict], str]:
+    """
+    Download and parse one feed. Returns (items, cache_status) where cache_status is
+    "not_modified" (HTTP 304), "unchanged" (same body hash), "miss" or "off".
+    Cache hits skip feedparser and HTML cleaning entirely.
+    """
+    timeout = timeout if timeout is not None else _env_float("FETCH_TIMEOUT", 20.0)
+    entry = feed_cache.load_entry(url) if use_cache else None
+    resp = _http().get(url, timeout=timeout, headers=feed_cache.conditional_headers(entry))
+    if resp.status_code == 304 and entry is not None:
+        return entry["items"], "not_modified"
+    resp.raise_for_status()
+
+    etag = resp.headers.get("ETag")
+    last_modified = resp.headers.get("Last-Modified")
+    digest = feed_cache.body_hash(resp.content)
+    if entry is not None and entry.get("sha256") == digest:
+        # Same bytes; refresh validators in case the server only just started sending them
+        if (etag, last_modified) != (entry.get("etag"), entry.get("last_modified")):
+            feed_cache.save_entry(url, etag, last_modified, digest, entry["items"])
+        return entry["items"], "unchanged"
+
+    feed = feedparser.parse(resp.content, response_headers=dict(resp.headers))
+    items = items_from_feed(url, feed)
+    if not use_cache:
+        return items, "off"
+    feed_cache.save_entry(url, etag, last_modified, digest, items)
+    return items, "miss"
+
+def parse_feed(url: str, timeout: float | None = None) -> list[dict]:
+    items, _ = fetch_feed(url, timeout=timeout, use_cache=False)
+    return items
+
+# ---------- concurrent fetch ----------
+
+def _fetch_one(url: str, per_host: int, timeout: float, use_cache: bool) -> tuple[dict, list[dict]]:
+    started = time.monotonic()
+    result = {"url": url, "ok": False, "count": 0, "error": None, "cache": None, "elapsed_s": 0.0}
+    items: list[dict] = []
+    try:
+        with _host_slot(url, per_host):
+            items, result["cache"] = fetch_feed(url, timeout=timeout, use_cache=use_cache)
+        result["ok"] = True
+        result["count"] = len(items)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["elapsed_s"] = round(time.monotonic() - started, 3)
+    return result, items
+
+def iter_feed_results(
+    feed_urls: Iterable[str],
+    max_workers: int | None = None,
+    per_host: int | None = None,
+    timeout: float | None = None,
+    use_cache: bool | None = None,
+) -> Iterator[tuple[dict, list[dict]]]:
+    """
+    Fetch feeds on a bounded thread pool and yield (result, items) as each finishes.
+
+    `result` is the per-feed report entry: url, ok, count, error, cache, elapsed_s.
+    A failing feed never raises; its error is recorded in the report instead.
+    """
+    urls = list(dict.fromkeys(feed_urls))  # keep order, drop repeated URLs
+    if not urls:
+        return
+    max_workers = max_workers or _env_int("FETCH_WORKERS", 16)
+    per_host = per_host or _env_int("FETCH_PER_HOST", 8)
+    timeout = timeout if timeout is not None else _env_float("FETCH_TIMEOUT", 20.0)
+    use_cache = feed_cache.enabled() if use_cache is None else use_cache
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(urls)), thread_name_prefix="fetch") as pool:
+        fetch_one = bind(_fetch_one)  # workers see the calling agent's config
+        futures = [pool.submit(fetch_one, u, per_host, timeout, use_cache) for u in urls]
+        for fut in as_completed(futures):
+            yield fut.result()
+
+def merge_items(all_items: Iterable[dict]) -> list[dict]:
     # De-duplicate by link
     by_key = {}
     for it in all_items:
@@ -50,3 +233,19 @@ def fetch_items(feed_urls: list[str]) -> list[dict]:
     items.sort(key=lambda x: x["published_ts"], reverse=True)
     return items
 
+def fetch_items_with_report(feed_urls: list[str], **kwargs) -> tuple[list[dict], list[dict]]:
+    """Like fetch_items, but also return the per-feed report (in feeds-file order)."""
+    order = {u: i for i, u in enumerate(feed_urls)}
+    report: list[dict] = []
+    per_feed: dict[str, list[dict]] = {}
+    for result, items in iter_feed_results(feed_urls, **kwargs):
+        report.append(result)
+        per_feed[result["url"]] = items
+    report.sort(key=lambda r: order.get(r["url"], 0))
+    # Merge in feeds-file order so ties resolve the same way as a serial fetch
+    all_items = [it for r in report for it in per_feed[r["url"]]]
+    return merge_items(all_items), report
+
+def fetch_items(feed_urls: list[str]) -> list[dict]:
+    items, _ = fetch_items_with_report(feed_urls)
+    return items
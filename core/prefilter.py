@@ -0,0 +1,127 @@
+# core/prefilter.py
+"""
+Cheap, CPU-only pre-ranking of items against the agent's strategy.md.
+
+Each item (title counted twice, plus summary) is scored with BM25 term
+saturation against the terms of the strategy. Terms that only appear under an
+"Exclusions" heading count against the item instead of for it. Items below
+PREFILTER_MIN_SCORE are dropped, and only the best PREFILTER_TOP_K go on to the
+paid model. Both are read from the agent's .env; with neither set the stage is
+a no-op.
+
+The score depends on the item and strategy.md only, never on which other items
+share its batch: there is no per-batch idf, and lengths are normalised against a
+fixed typical item length. On this scale an item of typical length that
+mentions one strategy term once scores about 1.0, and a term the strategy
+repeats weighs more (1 + ln of its count). PREFILTER_MIN_SCORE=1.0 therefore
+means "matches at least one strategy term", and 3.0 roughly "several".
+"""
+import math
+import re
+from collections import Counter
+from core.config import getenv
+
+_WORD_RE = re.compile(r"[a-z][a-z'\-]+")
+_HEADING_RE = re.compile(r"^\s*#+\s*(.*)$")
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from further had has
+have having he her here hers herself him himself his how i if in into is it its itself just let me
+more most my myself no nor not now of off on once only or other our ours ourselves out over own same
+she should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves every must may one two use using via per without within
+""".split())
+
+def _stem(tok: str) -> str:
+    # Deliberately crude: enough to line up "leaders"/"leader", "voices"/"voice"
+    tok = tok.strip("'-")
+    if len(tok) > 4 and tok.endswith("ies"):
+        return tok[:-3] + "y"
+    if len(tok) > 4 and tok.endswith("s") and not tok.endswith("ss"):
+        return tok[:-1]
+    return tok
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in _WORD_RE.findall((text or "").lower()) if t not in STOPWORDS and len(t) > 2]
+
+def strategy_terms(strategy_text: str) -> tuple[Counter, set[str]]:
+    """Split strategy.md into positive term counts and exclusion-only terms."""
+    positive: Counter = Counter()
+    excluded: Counter = Counter()
+    in_exclusions = False
+    for line in strategy_text.splitlines():
+        m = _HEADING_RE.match(line)
+        if m:
+            in_exclusions = "exclu" in m.group(1).lower()
+            continue
+        (excluded if in_exclusions else positive).update(tokenize(line))
+    return positive, set(excluded) - set(positive)
+
+def _doc_tokens(item: dict) -> list[str]:
+    title = tokenize(item.get("title", ""))
+    return title + title + tokenize(item.get("summary", ""))
+
+# Typical _doc_tokens() length of an alert (title twice + snippet), used instead of the batch average
+AVG_DOC_TOKENS = 40
+
+def bm25_scores(items: list[dict], strategy_text: str, k1: float = 1.5, b: float = 0.75) -> list[float]:
+    docs = [Counter(_doc_tokens(it)) for it in items]
+    if not docs:
+        return []
+    positive, negative = strategy_terms(strategy_text)
+
+    def term_score(d: Counter, dl: int, term: str) -> float:
+        tf = d.get(term, 0)
+        if not tf:
+            return 0.0
+        # 1.0 for a single mention in an item of typical length, saturating towards k1 + 1
+        return tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / AVG_DOC_TOKENS))
+
+    scores = []
+    for d in docs:
+        dl = sum(d.values())
+        # Strategy terms repeated often (voice, leadership) weigh more, but with diminishing returns
+        pos = sum((1 + math.log(qf)) * term_score(d, dl, t) for t, qf in positive.items() if t in d)
+        neg = sum(term_score(d, dl, t) for t in negative if t in d)
+        scores.append(pos - 0.5 * neg)
+    return scores
+
+def _env_num(name: str, cast):
+    raw = (getenv(name) or "").strip()
+    if not raw:
+        return None
+    try:
+        return cast(raw)
+    except ValueError:
+        return None
+
+def prefilter_items(
+    items: list[dict],
+    strategy_text: str,
+    top_k: int | None = None,
+    min_score: float | None = None,
+    use_top_k: bool = True,
+) -> tuple[list[dict], list[dict]]:
+    """
+    Returns (kept, pruned). Kept items stay in their original order; pruned items
+    carry their "prefilter_score" so the cut can be audited. Streaming callers that
+    only see one batch at a time pass use_top_k=False (a top-K needs the whole day).
+    """
+    top_k = _env_num("PREFILTER_TOP_K", int) if top_k is None else top_k
+    if not use_top_k:
+        top_k = None
+    min_score = _env_num("PREFILTER_MIN_SCORE", float) if min_score is None else min_score
+    if not items or (top_k is None and min_score is None):
+        return items, []
+
+    scores = bm25_scores(items, strategy_text)
+    order = sorted(range(len(items)), key=lambda i: scores[i], reverse=True)
+    keep = {i for i in order if min_score is None or scores[i] >= min_score}
+    if top_k is not None:
+        keep = set([i for i in order if i in keep][:max(top_k, 0)])
+
+    kept = [it for i, it in enumerate(items) if i in keep]
+    pruned = [{**items[i], "prefilter_score": round(scores[i], 3)} for i in order if i not in keep]
+    return kept, pruned
@@ -0,0 +1,6 @@
+# core/ranking.py
+"""Ordering of scored items; kept apart from core.scoring so `list` and review don't import the model client."""
+
+def rank_items(scored: list[dict]) -> list[dict]:
+    # Sort by total desc; keep stable order otherwise
+    return sorted(scored, key=lambda x: x.get("total", 0), reverse=True)
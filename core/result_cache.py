@@ -0,0 +1,118 @@
+# core/result_cache.py
+"""
+Small persistent key -> result cache for paid model calls.
+
+Stored as one JSON file: {"meta": {...counters}, "entries": {key: {"ts": epoch, "value": ...}}}.
+Keys are content hashes (see content_key), so a changed input is simply a new key.
+Entries older than ttl_days are dropped, and the oldest entries go first once
+max_entries is exceeded.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+def content_key(*parts) -> str:
+    """Stable SHA-256 over JSON-serialisable parts."""
+    blob = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    def __init__(self, path: str | Path, ttl_days: float = 7, max_entries: int = 20000):
+        self.path = Path(path)
+        self.ttl_s = ttl_days * 86400 if ttl_days else 0
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        data = self._read()
+        self.meta = data.get("meta", {})
+        self.entries: dict[str, dict] = data.get("entries", {})
+
+    def _read(self) -> dict:
+        if self.path.exists():
+            try:
+                return json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception:
+                pass  # start fresh if file is corrupt
+        return {}
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return bool(self.ttl_s) and now - entry.get("ts", 0) > self.ttl_s
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or self._expired(entry, time.time()):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["value"]
+
+    def put(self, key: str, value) -> None:
+        with self._lock:
+            self.entries[key] = {"ts": time.time(), "value": value}
+            self._dirty = True
+
+    def prune(self) -> int:
+        """Apply age and size eviction; returns how many entries were dropped."""
+        with self._lock:
+            return self._prune_locked()
+
+    def _prune_locked(self) -> int:
+        now = time.time()
+        before = len(self.entries)
+        kept = {k: e for k, e in self.entries.items() if not self._expired(e, now)}
+        if self.max_entries and len(kept) > self.max_entries:
+            newest = sorted(kept.items(), key=lambda kv: kv[1].get("ts", 0), reverse=True)
+            kept = dict(newest[: self.max_entries])
+        self.entries = kept
+        dropped = before - len(kept)
+        if dropped:
+            self._dirty = True
+        return dropped
+
+    def save(self) -> None:
+        """Merge with whatever another process wrote meanwhile, evict, then write atomically."""
+        with self._lock:
+            if not self._dirty and not (self.hits or self.misses):
+                return
+            on_disk = self._read()
+            for k, e in on_disk.get("entries", {}).items():
+                mine = self.entries.get(k)
+                if mine is None or e.get("ts", 0) > mine.get("ts", 0):
+                    self.entries[k] = e
+            meta = on_disk.get("meta", {})
+            meta["hits"] = int(meta.get("hits", 0)) + self.hits
+            meta["misses"] = int(meta.get("misses", 0)) + self.misses
+            self.meta = meta
+            self.hits = self.misses = 0
+            self._prune_locked()
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = self.path.with_suffix(self.path.suffix + f".{os.getpid()}.tmp")
+                tmp.write_text(json.dumps({"meta": self.meta, "entries": self.entries}, ensure_ascii=False),
+                               encoding="utf-8")
+                tmp.replace(self.path)  # atomic on same filesystem
+                self._dirty = False
+            except Exception as e:
+                print(f"[WARN] Could not save cache {self.path}: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            stamps = [e.get("ts", 0) for e in self.entries.values()]
+            hits = int(self.meta.get("hits", 0)) + self.hits
+            misses = int(self.meta.get("misses", 0)) + self.misses
+            return {
+                "path": str(self.path),
+                "entries": len(self.entries),
+                "bytes": self.path.stat().st_size if self.path.exists() else 0,
+                "oldest_ts": min(stamps) if stamps else None,
+                "newest_ts": max(stamps) if stamps else None,
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
@@ -1,14 +1,14 @@
 # core/review.py
-import os
 import json, re, secrets
 from datetime import datetime
 from pathlib import Path
 from core.io_utils import run_dir_for_today, save_json, write_text
-from core.scoring import rank_items
+from core.ranking import rank_items
+from core.config import getenv
 
 def _base_output() -> str:
     # Always take OUTPUT_DIR from env; fallback to "output"
-    return os.getenv("OUTPUT_DIR", "output")
+    return getenv("OUTPUT_DIR", "output")
 
 def _short_token(n=6) -> str:
     return secrets.token_hex(n // 2)
@@ -44,6 +44,8 @@ def build_review(ranked: list[dict], max_items: int | None = None, min_total: in
         if url:  lines.append(f"    {url}")
         if feed: lines.append(f"    Source: {feed}")
         if why:  lines.append(f"    Why: {why}")
+        alts = it.get("alternates") or []
+        if alts: lines.append(f"    Also covered by {len(alts)} other source(s)")
         index_map["items"].append({"i": i, "id": it.get("id") or it.get("link") or "", "url": url})
         lines.append("")
 
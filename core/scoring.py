@@ -1,40 +1,91 @@
 import json
-import os
-from openai import OpenAI
+from pathlib import Path
 from typing import Optional
-from core.usage_guard import BudgetGuard 
+from core.result_cache import ResultCache, content_key
+from core.tokens import estimate_messages, estimate_tokens, trim_to_tokens
+from core.usage_guard import BudgetGuard, BudgetExceededError
+from core.config import bind, getenv
+from core.llm_client import get_client
+from core.llm_backends import offline_tag
+from core.ranking import rank_items  # noqa: F401  (re-exported for existing imports)
 
-def _client():
-    key = os.getenv("OPENAI_API_KEY")
-    if not key:
-        raise RuntimeError("Missing OPENAI_API_KEY")
-    return OpenAI(api_key=key)
+# Bump whenever the rubric or prompt below changes, so cached scores are not reused
+RUBRIC_VERSION = "1"
 
-def score_items(items: list[dict], strategy_text: str, model: Optional[str] = None) -> list[dict]:
-    env_model = os.getenv("MODEL_SCORING") or "gpt-4o-mini"
-    model = model or env_model
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(getenv(name, str(default)))
+    except ValueError:
+        return default
 
-    # NEW: guard init + pre-check
-    guard = BudgetGuard()
-    if not guard.can_spend_more():
-        raise RuntimeError(f"Daily cost limit reached (${guard.spent} / ${guard.max_daily}). Aborting scoring.")
+def score_cache() -> ResultCache:
+    default = Path(getenv("OUTPUT_DIR", "output")) / "cache" / "score_cache.json"
+    return ResultCache(
+        getenv("SCORE_CACHE_FILE") or default,
+        ttl_days=float(getenv("SCORE_CACHE_TTL_DAYS", "7")),
+        max_entries=_env_int("SCORE_CACHE_MAX_ENTRIES", 20000),
+    )
 
-    brief = []
-    for it in items:
-        brief.append({
-            "title": it["title"],
-            "link": it["link"],
-            "summary": it["summary"][:600],
-            "published_ts": it["published_ts"],
-            "feed": it["feed"],
-        })
-
-    schema_hint = """Return strict JSON only:
+def score_cache_key(item: dict, strategy_text: str, model: str) -> str:
+    # Offline backends get their own keys so fake scores never satisfy a real run
+    tag = offline_tag()
+    return content_key(
+        *([tag] if tag else []),
+        RUBRIC_VERSION,
+        model,
+        content_key(strategy_text),
+        item["title"],
+        item["link"],
+        item["summary"][:600],
+        item["published_ts"],
+        item["feed"],
+    )
+
+class ChunkTruncatedError(ValueError):
+    """The model hit its output-token limit before finishing the chunk's JSON."""
+
+class ChunkOverBudgetError(BudgetExceededError):
+    """The chunk's estimated cost does not fit what is left of today's budget; a smaller one might."""
+
+class ScoringIncompleteError(RuntimeError):
+    """Some items got no score (their chunk kept failing, or the model left them out)."""
+
+    def __init__(self, scored: list[dict], unscored: list[dict]):
+        super().__init__(f"{len(unscored)} item(s) could not be scored")
+        self.scored = scored
+        self.unscored = unscored
+
+def save_unscored(outdir: Path, unscored: list[dict]) -> Path:
+    """Write (or clear) runs/<date>/unscored_items.json; `score --incremental` picks them up again."""
+    from core.io_utils import save_json
+
+    path = Path(outdir) / "unscored_items.json"
+    if unscored:
+        save_json(unscored, path)
+        print(f"[WARN] {len(unscored)} item(s) could not be scored → {path} "
+              "(`score --incremental` retries them)")
+    else:
+        path.unlink(missing_ok=True)
+    return path
+
+SCHEMA_HINT = """Return strict JSON only:
 {"items":[{"title":"...","link":"...","why_relevant":"...",
 "scores":{"relevance":0,"locality":0,"novelty":0,"actionability":0,"timeliness":0},
 "total":0}]}"""
 
-    user_prompt = f"""
+def _brief(it: dict) -> dict:
+    return {
+        "title": it["title"],
+        "link": it["link"],
+        "summary": it["summary"][:600],
+        "published_ts": it["published_ts"],
+        "feed": it["feed"],
+    }
+
+def _build_prompt(items: list[dict], strategy_text: str) -> str:
+    brief = [_brief(it) for it in items]
+
+    return f"""
 Strategy:
 {strategy_text}
 
@@ -49,38 +100,249 @@ Explain briefly 'why_relevant'.
 Items:
 {json.dumps(brief, ensure_ascii=False)}
 
-{schema_hint}
+{SCHEMA_HINT}
 """
 
-    client = _client()
-    resp = client.chat.completions.create(
-        model=model,
-        temperature=0.2,
-        messages=[
-            {"role": "system", "content": "Be precise. Output valid JSON only."},
-            {"role": "user", "content": user_prompt},
-        ],
-    )
+def _item_tokens(it: dict, model: str) -> int:
+    # +1 for the separator between items in the JSON list
+    return estimate_tokens(json.dumps(_brief(it), ensure_ascii=False), model) + 1
+
+def pack_chunks(items: list[dict], strategy_text: str, model: str, max_items: int,
+                prompt_tokens: Optional[int] = None) -> list[list[dict]]:
+    """
+    Greedily pack consecutive items into requests of at most `max_items` items and
+    `prompt_tokens` (SCORING_PROMPT_TOKENS) estimated prompt tokens. An item that
+    would overflow a request has its summary trimmed (down to
+    SCORING_MIN_SUMMARY_TOKENS) to fit before a new request is started; items
+    are copied, never modified in place.
+    """
+    budget = prompt_tokens or _env_int("SCORING_PROMPT_TOKENS", 6000)
+    min_summary = _env_int("SCORING_MIN_SUMMARY_TOKENS", 40)
+    base = estimate_tokens(_build_prompt([], strategy_text), model) + 20  # + system message and framing
+    room = max(budget - base, 1)
+
+    def trimmed(it: dict, fit: int) -> tuple[dict, int] | None:
+        summary = it["summary"][:600]
+        fixed = _item_tokens(it, model) - estimate_tokens(summary, model)
+        keep = fit - fixed
+        if keep < min_summary:
+            return None
+        it = {**it, "summary": trim_to_tokens(summary, keep, model)}
+        return it, _item_tokens(it, model)
+
+    chunks: list[list[dict]] = []
+    cur: list[dict] = []
+    used = 0
+    for it in items:
+        cost = _item_tokens(it, model)
+        if cur and len(cur) < max_items and used + cost > room:
+            fit = trimmed(it, room - used)
+            if fit:
+                it, cost = fit
+        if cur and (len(cur) >= max_items or used + cost > room):
+            chunks.append(cur)
+            cur, used = [], 0
+        if cost > room:
+            # Too big even for a request of its own
+            it, cost = trimmed(it, room) or ({**it, "summary": trim_to_tokens(it["summary"], min_summary, model)}, room)
+        cur.append(it)
+        used += cost
+    if cur:
+        chunks.append(cur)
+    return chunks
 
-    # Record usage cost (SDK object-safe)
+def _expected_output_tokens(chunk: list[dict]) -> int:
+    return 40 + _env_int("SCORING_OUTPUT_TOKENS_PER_ITEM", 90) * len(chunk)
+
+def _score_chunk(client, chunk: list[dict], strategy_text: str, model: str, guard: BudgetGuard) -> list[dict]:
+    if not guard.can_spend_more():
+        raise BudgetExceededError(f"Daily cost limit reached (${guard.spent} / ${guard.max_daily}). Aborting scoring.")
+
+    messages = [
+        {"role": "system", "content": "Be precise. Output valid JSON only."},
+        {"role": "user", "content": _build_prompt(chunk, strategy_text)},
+    ]
+    # Hold the estimated cost against today's budget while the call is in flight
+    est = guard.estimate_cost(model, estimate_messages(messages, model), _expected_output_tokens(chunk))
+    if not guard.reserve(est):
+        msg = f"Estimated ${est:.4f} for {len(chunk)} item(s) exceeds the ${guard.remaining():.4f} left today"
+        raise (ChunkOverBudgetError if len(chunk) > 1 else BudgetExceededError)(msg)
+    try:
+        resp = client.create(
+            model=model,
+            temperature=0.2,
+            messages=messages,
+        )
+    except Exception:
+        guard.release(est)
+        raise
+
+    # Record usage cost (SDK object-safe); every attempt is billed, failed ones included
     try:
         u = getattr(resp, "usage", None)
         pt = int(getattr(u, "prompt_tokens", 0) or 0)
         ct = int(getattr(u, "completion_tokens", 0) or 0)
-        guard.add_response(model, pt, ct, meta={"stage": "scoring", "items": len(items)})
+        guard.add_response(model, pt, ct, meta={"stage": "scoring", "items": len(chunk)})
         if not guard.can_spend_more():
             print(f"[Budget] Daily limit now reached (${guard.spent} / ${guard.max_daily}).")
     except Exception as e:
         print(f"[WARN] Could not record usage: {e}")
+    finally:
+        guard.release(est)
 
-
-    content = resp.choices[0].message.content
+    choice = resp.choices[0]
+    if getattr(choice, "finish_reason", None) == "length":
+        raise ChunkTruncatedError(f"Scoring reply truncated at the output-token limit ({len(chunk)} items)")
+    content = choice.message.content
     if content is None:
         raise RuntimeError("Model returned no content for scoring")
-    raw = content.strip()
-    data = json.loads(raw)  # raise if invalid -> easier debugging
+    data = json.loads(content.strip())  # raise if invalid -> chunk is retried
     return data["items"]
 
-def rank_items(scored: list[dict]) -> list[dict]:
-    # Sort by total desc; keep stable order otherwise
-    return sorted(scored, key=lambda x: x.get("total", 0), reverse=True)
+def score_items(
+    items: list[dict],
+    strategy_text: str,
+    model: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    use_cache: bool = True,
+) -> list[dict]:
+    """
+    Score items in chunks of at most `batch_size` (SCORING_BATCH_SIZE) items and
+    SCORING_PROMPT_TOKENS estimated prompt tokens, with up to `concurrency`
+    (SCORING_CONCURRENCY) requests in flight. Only failed chunks are retried, up to
+    `max_retries` (SCORING_MAX_RETRIES) times; a truncated chunk, or one whose
+    estimated cost no longer fits the day's budget, is split in half first.
+
+    Items already scored with the same content, strategy, model and rubric are served
+    from the score cache; only misses are sent. With use_cache=False everything is
+    re-scored (results are still written back). Results come back in input order.
+
+    Items left out only because the day's budget ran short are dropped with a
+    [Budget] note. If any other item gets no score, ScoringIncompleteError is
+    raised after the cache is saved. It carries the scored results and the
+    unscored items.
+    """
+    env_model = getenv("MODEL_SCORING") or "gpt-4o-mini"
+    model = model or env_model
+
+    cache = score_cache()
+    keys = [score_cache_key(it, strategy_text, model) for it in items]
+    cached = [cache.get(k) if use_cache else None for k in keys]
+    misses = [it for it, hit in zip(items, cached) if hit is None]
+    if use_cache and items:
+        print(f"[Cache] scoring: {len(items) - len(misses)} hit / {len(misses)} miss")
+
+    fresh, skipped = _score_batched(misses, strategy_text, model, batch_size, concurrency, max_retries) \
+        if misses else ([], [])
+    skipped_ids = {id(it) for it in skipped}
+
+    # Stitch cached and fresh results back into input order, matching fresh ones by link
+    # (in order, so items that share a link each get their own result)
+    by_link: dict[str, list[dict]] = {}
+    for r in fresh:
+        by_link.setdefault(r.get("link"), []).append(r)
+    out, unscored = [], []
+    for it, key, hit in zip(items, keys, cached):
+        r = hit
+        if r is None:
+            r = by_link[it["link"]].pop(0) if by_link.get(it["link"]) else None
+            if r is None:
+                if id(it) not in skipped_ids:
+                    unscored.append(it)
+                continue
+            cache.put(key, r)
+        if it.get("alternates"):
+            # Near-duplicate sources folded in by clustering travel with the scored item
+            r = {**r, "alternates": it["alternates"]}
+        out.append(r)
+    out.extend(r for rs in by_link.values() for r in rs)  # model changed the link; keep the result, don't cache it
+    cache.save()
+    if unscored:
+        raise ScoringIncompleteError(out, unscored)
+    return out
+
+def _score_batched(
+    items: list[dict],
+    strategy_text: str,
+    model: str,
+    batch_size: Optional[int],
+    concurrency: Optional[int],
+    max_retries: Optional[int],
+) -> tuple[list[dict], list[dict]]:
+    """(results, items skipped because the budget could not cover them)."""
+    batch_size = max(batch_size or _env_int("SCORING_BATCH_SIZE", 15), 1)
+    concurrency = max(concurrency or _env_int("SCORING_CONCURRENCY", 4), 1)
+    max_retries = _env_int("SCORING_MAX_RETRIES", 2) if max_retries is None else max_retries
+
+    # NEW: guard init + pre-check
+    guard = BudgetGuard()
+    if not guard.can_spend_more():
+        raise BudgetExceededError(f"Daily cost limit reached (${guard.spent} / ${guard.max_daily}). Aborting scoring.")
+    if not items:
+        return [], []
+
+    # (start offset, items) so results can be merged back in input order
+    pending = []
+    start = 0
+    for chunk in pack_chunks(items, strategy_text, model, batch_size):
+        pending.append((start, chunk))
+        start += len(chunk)
+
+    # Refuse up front what cannot be paid for, rather than discovering it call by call
+    affordable, skipped, total_est = [], [], 0.0
+    left = guard.remaining()
+    for start, chunk in pending:
+        est = guard.estimate_cost(model, estimate_tokens(_build_prompt(chunk, strategy_text), model),
+                                  _expected_output_tokens(chunk))
+        if affordable and total_est + est > left:
+            break
+        affordable.append((start, chunk))
+        total_est += est
+    if len(affordable) < len(pending):
+        n = sum(len(c) for _, c in affordable)
+        print(f"[Budget] Scoring all {len(items)} items would exceed the ${left:.4f} left today; "
+              f"scoring the first {n} (est. ${total_est:.4f})")
+        skipped = [it for _, c in pending[len(affordable):] for it in c]
+        pending = affordable
+    results: dict[int, list[dict]] = {}
+    errors: dict[int, Exception] = {}
+    client = get_client()
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    score_chunk = bind(_score_chunk)  # workers see the calling agent's config
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(pending)), thread_name_prefix="score") as pool:
+        for attempt in range(max_retries + 1):
+            futures = [(start, chunk, pool.submit(score_chunk, client, chunk, strategy_text, model, guard))
+                       for start, chunk in pending]
+            failed = []
+            for start, chunk, fut in futures:
+                try:
+                    results[start] = fut.result()
+                    errors.pop(start, None)
+                except (ChunkTruncatedError, ChunkOverBudgetError) as e:
+                    errors[start] = e
+                    if len(chunk) > 1:
+                        half = len(chunk) // 2
+                        failed += [(start, chunk[:half]), (start + half, chunk[half:])]
+                    else:
+                        failed.append((start, chunk))
+                except BudgetExceededError as e:
+                    errors[start] = e  # retrying cannot help
+                except Exception as e:
+                    errors[start] = e
+                    failed.append((start, chunk))
+            pending = failed
+            if not pending:
+                break
+            if attempt < max_retries:
+                print(f"[WARN] Retrying {len(pending)} failed scoring chunk(s) (attempt {attempt + 2}/{max_retries + 1})")
+
+    for start, e in sorted(errors.items()):
+        print(f"[WARN] Scoring chunk at item {start + 1} failed: {e}")
+    if not results:
+        first = next(iter(errors.values()))
+        raise RuntimeError(f"All scoring chunks failed: {first}") from first
+    return [it for start in sorted(results) for it in results[start]], skipped
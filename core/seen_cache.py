@@ -1,48 +1,165 @@
 # seen_cache.py
 import json
-import os
-from datetime import datetime, timezone
+import sqlite3
+import time
+from datetime import datetime
 from pathlib import Path
 from typing import Iterable
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+from core.config import getenv
+
+# SQLite caps bound parameters per statement; stay well under it
+_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    link       TEXT PRIMARY KEY,
+    first_seen REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS seen_first_seen ON seen(first_seen);
+"""
 
 def _cache_path() -> Path:
-    return Path(os.getenv("SEEN_CACHE_FILE", "output/cache/seen_links.json"))
+    default = Path(getenv("OUTPUT_DIR", "output")) / "cache" / "seen_links.sqlite3"
+    p = Path(getenv("SEEN_CACHE_FILE") or default)
+    # Older .env files point at the JSON cache; keep the database next to it
+    return p.with_suffix(".sqlite3") if p.suffix == ".json" else p
 
-def load_seen_links() -> dict[str, str]:
+def _ttl_seconds() -> float:
+    try:
+        return float(getenv("SEEN_CACHE_TTL_DAYS", "90")) * 86400
+    except ValueError:
+        return 90 * 86400
+
+def _connect() -> sqlite3.Connection:
     path = _cache_path()
-    if path.exists():
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # isolation_level=None: we issue BEGIN ourselves so claims are one atomic transaction
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")  # readers never block the other agent's writer
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    _import_legacy_json(conn, path.with_suffix(".json"))
+    return conn
+
+def _import_legacy_json(conn: sqlite3.Connection, legacy: Path) -> None:
+    """One-off migration from the old {link: iso_timestamp} JSON file."""
+    if not legacy.exists() or conn.execute("SELECT 1 FROM seen LIMIT 1").fetchone():
+        return
+    try:
+        old = json.loads(legacy.read_text(encoding="utf-8"))
+    except Exception:
+        return
+    rows = []
+    for link, iso in old.items():
         try:
-            return json.loads(path.read_text(encoding="utf-8"))
+            ts = datetime.fromisoformat(iso).timestamp()
         except Exception:
-            return {}
-    return {}
+            ts = time.time()
+        rows.append((normalise_link(link), ts))
+    conn.execute("BEGIN IMMEDIATE")
+    conn.executemany("INSERT OR IGNORE INTO seen(link, first_seen) VALUES (?, ?)", rows)
+    conn.execute("COMMIT")
 
-def save_seen_links(cache: dict[str, str]) -> None:
-    path = _cache_path()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding="utf-8")
+def normalise_link(link: str) -> str:
+    """
+    Canonical form used as the cache key: Google Alerts redirect wrappers are
+    unwrapped, scheme/host lower-cased, fragments and utm_* parameters dropped.
+    """
+    link = (link or "").strip()
+    if not link:
+        return ""
+    parts = urlsplit(link)
+    if parts.netloc.endswith("google.com") and parts.path == "/url":
+        target = parse_qs(parts.query).get("url")
+        if target:
+            parts = urlsplit(target[0])
+    query = [(k, v) for k, v in parse_qs(parts.query, keep_blank_values=True).items()
+             if not k.lower().startswith("utm_")]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query, doseq=True), ""))
+
+def item_key(it: dict) -> str:
+    link = normalise_link(it.get("link") or "")
+    # if no link, fall back to title+feed as a weak identifier
+    return link or f"{it.get('feed','')}|{it.get('title','')}"
+
+def _present(conn: sqlite3.Connection, keys: list[str], not_before: float) -> set[str]:
+    found: set[str] = set()
+    for i in range(0, len(keys), _BATCH):
+        chunk = keys[i:i + _BATCH]
+        marks = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT link FROM seen WHERE first_seen >= ? AND link IN ({marks})", [not_before, *chunk]
+        )
+        found.update(r[0] for r in rows)
+    return found
+
+def seen_links(links: Iterable[str]) -> set[str]:
+    """Batch membership test; returns the normalised links that are cached and not expired."""
+    keys = list({normalise_link(l) for l in links if l})
+    if not keys:
+        return set()
+    ttl = _ttl_seconds()
+    conn = _connect()
+    try:
+        return _present(conn, keys, time.time() - ttl if ttl else 0)
+    finally:
+        conn.close()
+
+def prune_expired() -> int:
+    ttl = _ttl_seconds()
+    if not ttl:
+        return 0
+    conn = _connect()
+    try:
+        return conn.execute("DELETE FROM seen WHERE first_seen < ?", (time.time() - ttl,)).rowcount
+    finally:
+        conn.close()
+
+def stats(last: int = 5) -> dict:
+    conn = _connect()
+    try:
+        count, oldest, newest = conn.execute("SELECT COUNT(*), MIN(first_seen), MAX(first_seen) FROM seen").fetchone()
+        recent = conn.execute("SELECT link, first_seen FROM seen ORDER BY first_seen DESC LIMIT ?", (last,)).fetchall()
+    finally:
+        conn.close()
+    return {"path": str(_cache_path()), "count": count, "oldest_ts": oldest, "newest_ts": newest, "recent": recent}
 
 def filter_new_items(items: list[dict], ignore_cache: bool = False) -> list[dict]:
     """
     Returns only items with links not in the cache.
     Updates cache with newly seen links (unless ignore_cache=True).
+
+    Lookup and insert run in one IMMEDIATE transaction, so when two agents fetch
+    the same link at once exactly one of them claims it as new.
     """
-    if ignore_cache:
+    if ignore_cache or not items:
         return items
 
-    seen = load_seen_links()
-    now_iso = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    keys = [item_key(it) for it in items]
+    now = time.time()
+    ttl = _ttl_seconds()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if ttl:
+            conn.execute("DELETE FROM seen WHERE first_seen < ?", (now - ttl,))
+        already = _present(conn, list(set(keys)), 0)
 
-    new_items: list[dict] = []
-    for it in items:
-        link = (it.get("link") or "").strip()
-        # if no link, fall back to title+feed as a weak identifier
-        if not link:
-            link = f"{it.get('feed','')}|{it.get('title','')}"
-        if link and link not in seen:
+        new_items: list[dict] = []
+        fresh: dict[str, float] = {}
+        for it, key in zip(items, keys):
+            if key in already or key in fresh:
+                continue
             new_items.append(it)
-            seen[link] = now_iso
-
-    if new_items:
-        save_seen_links(seen)
+            fresh[key] = now
+        conn.executemany("INSERT OR IGNORE INTO seen(link, first_seen) VALUES (?, ?)", fresh.items())
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
     return new_items
@@ -0,0 +1,244 @@
+# core/streaming.py
+"""
+In-process fetch → score → review with overlapping stages.
+
+Three stages joined by bounded queues:
+
+    fetch   (feed worker pool)  --items-->  batcher/scorer  --scored-->  collector
+
+Items from a feed go to the scorer as soon as that feed is parsed. The scorer
+clusters them incrementally, prefilters each batch and sends it to the model
+while later feeds are still downloading, and the caller ranks the results as
+they come in. Because the queues are bounded, a slow scorer throttles fetch
+instead of growing memory, and wall time ends up close to the slowest stage
+rather than the sum of all three.
+"""
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+from core.config import bind, getenv
+from core.io_utils import (append_ndjson, artifact_format, items_exist, mark_ndjson_done, read_items,
+                           read_json, save_json)
+
+_DONE = object()
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(getenv(name, str(default)))
+    except ValueError:
+        return default
+
+class StageError(RuntimeError):
+    """An upstream stage failed; raised in the consumer so the run stops cleanly."""
+
+class _Stage(threading.Thread):
+    """Daemon thread that runs fn with the caller's agent config and records any failure."""
+
+    def __init__(self, name: str, fn):
+        super().__init__(name=name, daemon=True)
+        self._fn = bind(fn)
+        self.error: BaseException | None = None
+
+    def run(self):
+        try:
+            self._fn()
+        except BaseException as e:
+            self.error = e
+
+def _put(q: queue.Queue, value, stop: threading.Event):
+    # Bounded put that still notices when the consumer has given up
+    while not stop.is_set():
+        try:
+            q.put(value, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+def run_pipelined(
+    feeds: list[str],
+    strategy_text: str,
+    outdir: Path,
+    model: str | None = None,
+    batch_size: int | None = None,
+    concurrency: int | None = None,
+    use_seen_cache: bool = True,
+    use_feed_cache: bool | None = None,
+    use_score_cache: bool = True,
+    cluster: bool = True,
+    prefilter: bool = True,
+) -> dict:
+    """
+    Run fetch and score as one overlapped pipeline and write the usual run
+    artifacts (raw_items, fetch_report, scored_items, prefiltered_out) to outdir.
+
+    Returns {"scored", "report", "raw_count", "pruned", "timings"}; timings are
+    seconds since start for first_item / first_scored / fetch_done / score_done,
+    plus score_s (time spent waiting on the model) and total.
+    """
+    from core.parsing import iter_feed_results, merge_items
+    from core.seen_cache import filter_new_items, item_key
+    from core.clustering import Clusterer
+    from core.prefilter import prefilter_items
+    from core.scoring import ScoringIncompleteError, save_unscored, score_items
+
+    depth = max(_env_int("PIPELINE_QUEUE_SIZE", 8), 1)
+    flush_s = _env_float("PIPELINE_FLUSH_S", 2.0)
+    # One scoring round fills every concurrent request once
+    round_size = max(batch_size or _env_int("SCORING_BATCH_SIZE", 15), 1) * \
+                 max(concurrency or _env_int("SCORING_CONCURRENCY", 4), 1)
+    ndjson = artifact_format() == "ndjson"
+    # Like `score --incremental`: keep what earlier runs scored today and skip those links
+    done = {link for it in (read_items(outdir, "scored_items") if items_exist(outdir, "scored_items") else [])
+            for link in [it.get("link"), *(a.get("link") for a in it.get("alternates") or ())]}
+
+    items_q: queue.Queue = queue.Queue(maxsize=depth)        # one entry per feed
+    scored_q: queue.Queue = queue.Queue(maxsize=depth)       # one entry per scoring round
+    stop = threading.Event()
+    started = time.monotonic()
+    timings: dict[str, float] = {"score_s": 0.0}
+    report: list[dict] = []
+    raw: list[dict] = []
+    pruned_all: list[dict] = []
+    unscored_all: list[dict] = []
+
+    def mark(name: str):
+        timings.setdefault(name, round(time.monotonic() - started, 3))
+
+    def fetch_stage():
+        seen_keys: set[str] = set()
+        try:
+            for result, items in iter_feed_results(feeds, use_cache=use_feed_cache):
+                if stop.is_set():
+                    break
+                report.append(result)
+                fresh = []
+                for it in items:
+                    key = item_key(it)
+                    if key not in seen_keys:
+                        seen_keys.add(key)
+                        fresh.append(it)
+                if use_seen_cache:
+                    fresh = filter_new_items(fresh)
+                if fresh:
+                    mark("first_item")
+                    raw.extend(fresh)
+                    if ndjson:
+                        append_ndjson(fresh, outdir / "raw_items.ndjson")
+                    _put(items_q, fresh, stop)
+        finally:
+            mark("fetch_done")
+            _put(items_q, _DONE, stop)
+
+    def score_round(batch: list[dict]):
+        if prefilter:
+            # A top-K cut needs the whole day's items, so only PREFILTER_MIN_SCORE applies here
+            batch, pruned = prefilter_items(batch, strategy_text, use_top_k=False)
+            pruned_all.extend(pruned)
+        if not batch:
+            return
+        t0 = time.monotonic()
+        try:
+            scored = score_items(batch, strategy_text, model=model, batch_size=batch_size,
+                                 concurrency=concurrency, use_cache=use_score_cache)
+        except ScoringIncompleteError as e:
+            scored = e.scored
+            unscored_all.extend(e.unscored)
+        timings["score_s"] += time.monotonic() - t0
+        mark("first_scored")
+        _put(scored_q, scored, stop)
+
+    def score_stage():
+        clusterer = Clusterer() if cluster else None
+        buf: list[dict] = []
+        try:
+            while not stop.is_set():
+                try:
+                    got = items_q.get(timeout=flush_s)
+                except queue.Empty:
+                    got = None  # fetch is slow: don't sit on a partial round
+                if got is _DONE:
+                    break
+                for it in got or ():
+                    if it.get("link") in done:
+                        continue
+                    if clusterer is None:
+                        buf.append(it)
+                    elif clusterer.add(it) is None:
+                        buf.append(clusterer.representatives[-1])
+                while len(buf) >= round_size or (got is None and buf):
+                    batch, buf = buf[:round_size], buf[round_size:]
+                    score_round(batch)
+            if buf and not stop.is_set():
+                score_round(buf)
+        finally:
+            mark("score_done")
+            _put(scored_q, _DONE, stop)
+
+    fetcher = _Stage("pipeline-fetch", fetch_stage)
+    scorer = _Stage("pipeline-score", score_stage)
+    fetcher.start()
+    scorer.start()
+
+    scored_all: list[dict] = []
+    try:
+        for scored in _drain(scored_q):
+            scored_all.extend(scored)
+            if ndjson:
+                append_ndjson(scored, outdir / "scored_items.ndjson")
+            print(f"[Pipeline] scored {len(scored_all)} item(s) so far "
+                  f"({len(raw)} fetched, {len(report)}/{len(feeds)} feeds done)")
+    finally:
+        stop.set()
+        fetcher.join()
+        scorer.join()
+
+    for stage in (fetcher, scorer):
+        if stage.error is not None:
+            raise StageError(f"{stage.name} failed: {stage.error}") from stage.error
+
+    _write_artifacts(outdir, ndjson, raw, report, scored_all, pruned_all, merge_items)
+    save_unscored(outdir, unscored_all)
+    timings["score_s"] = round(timings["score_s"], 3)
+    timings["total"] = round(time.monotonic() - started, 3)
+    return {"scored": scored_all, "report": report, "raw_count": len(raw),
+            "pruned": len(pruned_all), "timings": timings}
+
+def _drain(q: queue.Queue) -> Iterator:
+    while True:
+        got = q.get()
+        if got is _DONE:
+            return
+        yield got
+
+def _write_artifacts(outdir: Path, ndjson: bool, raw, report, scored, pruned, merge_items):
+    from core.item_store import record_items, record_scores
+
+    record_items(raw)
+    record_scores(scored)
+    save_json(report, outdir / "fetch_report.json")
+    if ndjson:
+        mark_ndjson_done(outdir / "raw_items.ndjson")
+        mark_ndjson_done(outdir / "scored_items.ndjson")
+        if pruned:
+            append_ndjson(pruned, outdir / "prefiltered_out.ndjson")
+        return
+    raw_path = outdir / "raw_items.json"
+    # Same as fetch: later runs on the same day add to today's raw items
+    save_json(merge_items(read_json(raw_path) + raw) if raw_path.exists() else merge_items(raw), raw_path)
+    _save_merged(scored, outdir / "scored_items.json")
+    if pruned:
+        _save_merged(pruned, outdir / "prefiltered_out.json")
+
+def _save_merged(items: list[dict], path: Path):
+    """Add this run's items to the day's file; an item seen again replaces its earlier entry."""
+    links = {it.get("link") for it in items}
+    previous = [it for it in read_json(path) if it.get("link") not in links] if path.exists() else []
+    save_json(previous + items, path)
@@ -0,0 +1,65 @@
+# core/tokens.py
+"""
+Token estimates for prompts, before they are sent.
+
+Uses tiktoken when it is installed (exact counts for OpenAI models). Without
+it, falls back to a character-based approximation calibrated on our own
+prompts: English feed text runs at about 4 characters per token, and JSON
+punctuation and URLs push that down, so the default 3.6 (TOKEN_CHARS_PER_TOKEN)
+over-counts slightly. Over-counting is the safe direction for budgeting.
+"""
+import math
+import threading
+from core.config import getenv
+
+_encoders: dict = {}
+_lock = threading.Lock()
+_MISSING = object()
+
+def _encoder(model: str | None):
+    name = model or "gpt-4o-mini"
+    with _lock:
+        enc = _encoders.get(name)
+        if enc is None:
+            try:
+                import tiktoken  # optional
+                try:
+                    enc = tiktoken.encoding_for_model(name)
+                except KeyError:
+                    enc = tiktoken.get_encoding("o200k_base")
+            except Exception:
+                enc = _MISSING  # not installed, or no cached BPE file offline
+            _encoders[name] = enc
+    return None if enc is _MISSING else enc
+
+def _chars_per_token() -> float:
+    try:
+        return max(float(getenv("TOKEN_CHARS_PER_TOKEN", "3.6")), 0.5)
+    except ValueError:
+        return 3.6
+
+def estimate_tokens(text: str, model: str | None = None) -> int:
+    if not text:
+        return 0
+    enc = _encoder(model)
+    if enc is not None:
+        return len(enc.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / _chars_per_token())
+
+def estimate_messages(messages: list[dict], model: str | None = None) -> int:
+    # ~4 tokens of chat framing per message, plus 3 to prime the reply
+    return sum(4 + estimate_tokens(m.get("content") or "", model) for m in messages) + 3
+
+def trim_to_tokens(text: str, max_tokens: int, model: str | None = None) -> str:
+    """Cut text to roughly max_tokens, at a word boundary where possible."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text, model) <= max_tokens:
+        return text
+    enc = _encoder(model)
+    if enc is not None:
+        cut = enc.decode(enc.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        cut = text[: int(max_tokens * _chars_per_token())]
+    head, sep, _ = cut.rpartition(" ")
+    return (head if sep and len(head) > len(cut) // 2 else cut).rstrip() + "…"
@@ -1,8 +1,11 @@
 # usage_guard.py
 import json
 import os
+import sqlite3
+import threading
 from datetime import datetime
 from pathlib import Path
+from core.config import getenv
 
 # Default per-1K token pricing (USD). Override via env if needed.
 PRICING = {
@@ -22,60 +25,199 @@ def _usage_dir(base="output"):
     p.mkdir(parents=True, exist_ok=True)
     return p
 
-def _today_path(base="output"):
-    return _usage_dir(base) / f"usage_{datetime.now().strftime('%Y-%m-%d')}.json"
+def _ledger_path(base="output") -> Path:
+    p = getenv("USAGE_LEDGER_FILE")
+    if p:
+        Path(p).parent.mkdir(parents=True, exist_ok=True)
+        return Path(p)
+    # Offline backends keep their pretend spend apart from the real ledger
+    backend = _offline_backend()
+    if backend:
+        return _usage_dir(base) / f"usage_{backend}.sqlite3"
+    return _usage_dir(base) / "usage.sqlite3"
+
+def _offline_backend() -> str:
+    backend = (getenv("LLM_BACKEND") or "openai").strip().lower()
+    return backend if backend in ("synthetic", "replay") else ""
+
+def _today() -> str:
+    return datetime.now().strftime("%Y-%m-%d")
+
+# calls is the append-only ledger; daily_totals is kept in step by an UPSERT in
+# the same transaction, so reading today's spend never scans the ledger.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id                INTEGER PRIMARY KEY,
+    ts                TEXT NOT NULL,
+    day               TEXT NOT NULL,
+    agent             TEXT NOT NULL,
+    model             TEXT NOT NULL,
+    prompt_tokens     INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd          REAL NOT NULL,
+    meta              TEXT
+);
+CREATE TABLE IF NOT EXISTS daily_totals (
+    day               TEXT NOT NULL,
+    agent             TEXT NOT NULL,
+    calls             INTEGER NOT NULL,
+    prompt_tokens     INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost_usd          REAL NOT NULL,
+    PRIMARY KEY (day, agent)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_TOTAL = """
+INSERT INTO daily_totals(day, agent, calls, prompt_tokens, completion_tokens, cost_usd)
+VALUES (?, ?, 1, ?, ?, ?)
+ON CONFLICT(day, agent) DO UPDATE SET
+    calls = calls + 1,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    cost_usd = cost_usd + excluded.cost_usd
+"""
+
+def _connect(path: Path) -> sqlite3.Connection:
+    # isolation_level=None: we issue BEGIN ourselves; shared by a guard's worker threads
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")  # agents record usage without blocking each other's reads
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    if not _offline_backend():
+        _import_legacy_json(conn, path.parent)
+    return conn
+
+def _import_legacy_json(conn: sqlite3.Connection, usage_dir: Path) -> None:
+    """One-off migration from the old per-day usage_YYYY-MM-DD.json files."""
+    legacy = sorted(usage_dir.glob("usage_*.json"))
+    if not legacy or conn.execute("SELECT 1 FROM calls LIMIT 1").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("SELECT 1 FROM calls LIMIT 1").fetchone():
+            conn.execute("ROLLBACK")  # another process migrated first
+            return
+        for f in legacy:
+            try:
+                entries = json.loads(f.read_text(encoding="utf-8")).get("entries", [])
+            except Exception:
+                continue
+            day = f.stem.removeprefix("usage_")
+            for e in entries:
+                _insert(conn, e.get("ts") or day, day, "(legacy)", e.get("model", ""),
+                        int(e.get("prompt_tokens", 0)), int(e.get("completion_tokens", 0)),
+                        float(e.get("cost_total_usd", 0.0)), e.get("meta") or {})
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+def _insert(conn, ts: str, day: str, agent: str, model: str, pt: int, ct: int, cost: float, meta: dict):
+    conn.execute(
+        "INSERT INTO calls(ts, day, agent, model, prompt_tokens, completion_tokens, cost_usd, meta) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (ts, day, agent, model, pt, ct, cost, json.dumps(meta, ensure_ascii=False)),
+    )
+    conn.execute(_UPSERT_TOTAL, (day, agent, pt, ct, cost))
+
+def usage_summary(month: str | None = None, base_output: str = "output") -> dict:
+    """
+    Spend for one month (YYYY-MM, default this month) from the daily totals:
+    {"month", "total", "by_agent": [(agent, calls, cost)], "by_day": [(day, agent, calls, cost)]}.
+    """
+    month = month or datetime.now().strftime("%Y-%m")
+    conn = _connect(_ledger_path(base_output))
+    try:
+        like = (f"{month}-%",)
+        by_day = conn.execute(
+            "SELECT day, agent, calls, cost_usd FROM daily_totals WHERE day LIKE ? ORDER BY day, agent", like
+        ).fetchall()
+        by_agent = conn.execute(
+            "SELECT agent, SUM(calls), SUM(cost_usd) FROM daily_totals WHERE day LIKE ? "
+            "GROUP BY agent ORDER BY SUM(cost_usd) DESC", like
+        ).fetchall()
+    finally:
+        conn.close()
+    return {"month": month, "total": sum(r[2] for r in by_agent), "by_agent": by_agent, "by_day": by_day}
+
+class BudgetExceededError(RuntimeError):
+    """Raised when a call is refused because the daily budget is used up."""
 
 class BudgetGuard:
+    """
+    Daily spend guard backed by an append-only SQLite ledger shared by every
+    agent (output/usage/usage.sqlite3). Recording a call is one INSERT plus one
+    UPSERT of the (day, agent) running total, in a single transaction, so
+    parallel batches and agents never lose spend. MAX_DAILY_COST_USD caps the
+    day's total across agents, as before.
+    """
+
     def __init__(self, max_daily_usd: float | None = None, base_output: str = "output"):
         self.base_output = base_output
-        self.max_daily = float(os.getenv("MAX_DAILY_COST_USD", "0.50")) if max_daily_usd is None else max_daily_usd
-        self.path = _today_path(base_output)
-        self.state = {"spent_usd": 0.0, "entries": []}
-        if self.path.exists():
-            try:
-                self.state = json.loads(self.path.read_text(encoding="utf-8"))
-            except Exception:
-                pass  # start fresh if file is corrupt
+        self.max_daily = float(getenv("MAX_DAILY_COST_USD", "0.50")) if max_daily_usd is None else max_daily_usd
+        self.agent = getenv("AGENT_NAME") or "default"
+        self.path = _ledger_path(base_output)
+        self._lock = threading.Lock()  # one guard is shared by concurrent scoring batches
+        self._reserved = 0.0  # estimated cost of calls in flight
+        self._conn = _connect(self.path)
 
     @property
     def spent(self) -> float:
-        return float(self.state.get("spent_usd", 0.0))
+        """Today's spend across all agents (a lookup on daily_totals, not a ledger scan)."""
+        with self._lock:
+            return self._spent_locked()
+
+    def _spent_locked(self) -> float:
+        row = self._conn.execute("SELECT COALESCE(SUM(cost_usd), 0) FROM daily_totals WHERE day = ?",
+                                 (_today(),)).fetchone()
+        return round(float(row[0]), 6)
 
     def can_spend_more(self) -> bool:
         return self.spent < self.max_daily
 
+    def estimate_cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        rates = PRICING.get(model) or PRICING["gpt-4o-mini"]
+        return (prompt_tokens / 1000.0) * rates["in"] + (completion_tokens / 1000.0) * rates["out"]
+
+    def remaining(self) -> float:
+        """Budget left today, net of calls that are reserved but not yet recorded."""
+        with self._lock:
+            return self.max_daily - self._spent_locked() - self._reserved
+
+    def reserve(self, cost: float) -> bool:
+        """
+        Claim `cost` of today's budget for a call about to be made. Returns False
+        (and claims nothing) if it would overrun MAX_DAILY_COST_USD; call
+        release() with the same amount once the real usage has been recorded.
+        """
+        with self._lock:
+            if self._spent_locked() + self._reserved + cost > self.max_daily:
+                return False
+            self._reserved += cost
+            return True
+
+    def release(self, cost: float):
+        with self._lock:
+            self._reserved = max(self._reserved - cost, 0.0)
+
     def add_response(self, model: str, prompt_tokens: int, completion_tokens: int, meta: dict | None = None):
         """Record usage & cost from a single API call."""
-        rates = PRICING.get(model)
-        if not rates:
-            # Fallback to 4o-mini rates if unknown model to avoid surprise costs
-            rates = PRICING["gpt-4o-mini"]
-
-        cost_in = (prompt_tokens / 1000.0) * rates["in"]
-        cost_out = (completion_tokens / 1000.0) * rates["out"]
-        total = cost_in + cost_out
-
-        entry = {
-            "ts": datetime.now().isoformat(timespec="seconds"),
-            "model": model,
-            "prompt_tokens": prompt_tokens,
-            "completion_tokens": completion_tokens,
-            "cost_in_usd": round(cost_in, 6),
-            "cost_out_usd": round(cost_out, 6),
-            "cost_total_usd": round(total, 6),
-            "meta": meta or {},
-        }
-        self.state["entries"].append(entry)
-        self.state["spent_usd"] = round(self.spent + total, 6)
-        self._flush()
-
-    # usage_guard.py
-    def _flush(self):
-        try:
-            tmp = self.path.with_suffix(self.path.suffix + ".tmp")
-            tmp.write_text(json.dumps(self.state, indent=2), encoding="utf-8")
-            tmp.replace(self.path)  # atomic on same filesystem
-        except Exception:
-            pass  # best-effort; never break the pipeline on usage logging
-
+        # Unknown models are charged at 4o-mini rates to avoid surprise costs
+        total = self.estimate_cost(model, prompt_tokens, completion_tokens)
+        now = datetime.now()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                _insert(self._conn, now.isoformat(timespec="seconds"), now.strftime("%Y-%m-%d"), self.agent,
+                        model, prompt_tokens, completion_tokens, round(total, 6), meta or {})
+                self._conn.execute("COMMIT")
+            except Exception as e:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                print(f"[WARN] Could not record usage in {self.path}: {e}")  # never break the pipeline
 
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,44 +1,222 @@
 # pipeline.py
-import os, sys
+import argparse, os, sys, threading, time, traceback
+from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
+from core import config
 from core.cli import main as core_main
 
 load_dotenv()
 
-main_dir = os.environ.get("MAIN_DIR", "").strip()
+def available_agents(repo_root: Path) -> list[str]:
+    agents_dir = repo_root / "agents"
+    return sorted(p.name for p in agents_dir.iterdir() if p.is_dir())
 
-def _expand_main_dir_env():
-    """Expand $MAIN_DIR occurrences in a few key env vars after dotenv load."""
-    main_dir = os.environ.get("MAIN_DIR", "").strip()
-    if not main_dir:
-        return
-    for key in ("FEEDS_FILE", "STRATEGY_FILE", "OUTPUT_DIR", "SEEN_CACHE_FILE", "MARKDOWN_PREFIX"):
-        val = os.environ.get(key)
-        if not val:
-            continue
-        os.environ[key] = val.replace("$MAIN_DIR", main_dir)
-
-
-def load_agent_env(agent_dir: Path):
-    env_path = agent_dir / ".env"
-    if env_path.exists():
-        load_dotenv(env_path, override=True)
-    # If MAIN_DIR isn't set, use this agent_dir by default
-    os.environ.setdefault("MAIN_DIR", str(agent_dir))
-    # Expand $MAIN_DIR placeholders (if present)
-    _expand_main_dir_env()
-    # Point core at this agent's config
-    os.environ.setdefault("FEEDS_FILE", str(agent_dir / "feeds.txt"))
-    os.environ.setdefault("STRATEGY_FILE", str(agent_dir / "strategy.md"))
-    os.environ.setdefault("OUTPUT_DIR", str(agent_dir / "output"))
-    # Optional: prefix per agent
-    if "MARKDOWN_PREFIX" not in os.environ:
-        os.environ["MARKDOWN_PREFIX"] = f"{agent_dir.name}_"
+class _AgentPrefixedStream:
+    """stdout wrapper that tags each line with the agent running in the current context."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        cfg = config.current()
+        if cfg is None:
+            return self._stream.write(text)
+        buf = getattr(self._local, "buf", "") + text
+        *lines, self._local.buf = buf.split("\n")
+        if lines:
+            with self._lock:
+                self._stream.write("".join(f"[{cfg.name}] {line}\n" for line in lines))
+        return len(text)
+
+    def flush(self):
+        rest = getattr(self._local, "buf", "")
+        cfg = config.current()
+        if rest and cfg is not None:
+            self._local.buf = ""
+            with self._lock:
+                self._stream.write(f"[{cfg.name}] {rest}\n")
+        self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+def _log(msg: str):
+    print(f"[{datetime.now().strftime('%F %T')}] {msg}", flush=True)
+
+def run_agent_command(agent_dir: Path, argv: list[str], tag: str = "serve") -> bool:
+    """Run one core CLI command for an agent in this process; never raises."""
+    _log(f"{tag}: {agent_dir.name} {' '.join(argv)}")
+    try:
+        with config.use(config.AgentConfig.from_dir(agent_dir)):
+            core_main(argv)
+        return True
+    except SystemExit as e:
+        return not e.code
+    except Exception:
+        _log(f"{tag}: {agent_dir.name} {argv[0]} failed")
+        traceback.print_exc()
+        return False
+
+def run_agents_parallel(agent_dirs: list[Path], steps: list[list[str]], max_parallel: int,
+                        tag: str = "all") -> list[dict]:
+    """
+    Run `steps` (each a core CLI argv) for every agent, agents side by side on a
+    bounded pool. Within one agent, steps run in order and stop at the first failure.
+    Returns one timing row per agent.
+    """
+    def run_one(agent_dir: Path) -> dict:
+        started = time.monotonic()
+        ok = True
+        for argv in steps:
+            ok = run_agent_command(agent_dir, argv, tag=tag)
+            if not ok:
+                break
+        return {"agent": agent_dir.name, "ok": ok, "elapsed_s": time.monotonic() - started}
+
+    if not agent_dirs:
+        return []
+    from concurrent.futures import ThreadPoolExecutor
+
+    stdout = sys.stdout
+    sys.stdout = _AgentPrefixedStream(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(agent_dirs))),
+                                thread_name_prefix="agent") as pool:
+            return list(pool.map(run_one, agent_dirs))
+    finally:
+        sys.stdout.flush()
+        sys.stdout = stdout
+
+def _print_timings(rows: list[dict], wall_s: float):
+    print("\nAgent            Status   Seconds")
+    for r in rows:
+        print(f"{r['agent']:<16} {'ok' if r['ok'] else 'FAILED':<8} {r['elapsed_s']:7.1f}")
+    serial = sum(r["elapsed_s"] for r in rows)
+    print(f"Wall time {wall_s:.1f}s (sum of agents {serial:.1f}s)")
+
+def run_all(argv: list[str]):
+    """pipeline.py all [--agents a,b] [--max-parallel N] <command> [args...]"""
+    repo_root = Path(__file__).resolve().parent
+    ap = argparse.ArgumentParser(prog="pipeline.py all",
+                                 description="Run one command for every agent concurrently.")
+    ap.add_argument("--agents", default=os.getenv("PIPELINE_AGENTS", ""),
+                    help="Comma-separated agents (default: PIPELINE_AGENTS or every folder in agents/)")
+    ap.add_argument("--max-parallel", type=int, default=int(os.getenv("PIPELINE_MAX_PARALLEL", "4")),
+                    help="Agents running at once (default: PIPELINE_MAX_PARALLEL or 4)")
+    ap.add_argument("command", help="Core command, e.g. fetch, score, review-email")
+    ap.add_argument("args", nargs=argparse.REMAINDER, help="Arguments passed through to the command")
+    args = ap.parse_args(argv)
+
+    agent_dirs = _resolve_agents(repo_root, args.agents)
+    started = time.monotonic()
+    rows = run_agents_parallel(agent_dirs, [[args.command, *args.args]], args.max_parallel)
+    _print_timings(rows, time.monotonic() - started)
+    if not all(r["ok"] for r in rows):
+        sys.exit(1)
+
+def _resolve_agents(repo_root: Path, spec: str) -> list[Path]:
+    names = [a.strip() for a in spec.split(",") if a.strip()] or available_agents(repo_root)
+    agent_dirs = [repo_root / "agents" / n for n in names]
+    missing = [str(d) for d in agent_dirs if not d.exists()]
+    if missing:
+        print(f"Agent not found: {', '.join(missing)}")
+        sys.exit(1)
+    return agent_dirs
+
+def serve(argv: list[str]):
+    """
+    Long-running scheduler: one warm interpreter runs every agent's stages, so
+    imports, the feed HTTP session and OpenAI clients are set up once.
+    """
+    import schedule
+
+    repo_root = Path(__file__).resolve().parent
+    ap = argparse.ArgumentParser(prog="pipeline.py serve",
+                                 description="Run all agents' stages on a schedule in one process.")
+    ap.add_argument("--agents", default=os.getenv("SERVE_AGENTS", ""),
+                    help="Comma-separated agents (default: SERVE_AGENTS or every folder in agents/)")
+    ap.add_argument("--daily-at", default=os.getenv("SERVE_DAILY_AT", "06:30"),
+                    help="Local HH:MM for fetch → score → review-email (default: SERVE_DAILY_AT or 06:30)")
+    ap.add_argument("--poll-minutes", type=int, default=int(os.getenv("SERVE_POLL_MINUTES", "10")),
+                    help="Minutes between review-poll runs; 0 disables (default: SERVE_POLL_MINUTES or 10)")
+    ap.add_argument("--fetch-minutes", type=int, default=int(os.getenv("SERVE_FETCH_MINUTES", "0")),
+                    help="Extra intra-day fetch + incremental score every N minutes; 0 disables")
+    ap.add_argument("--run-now", action="store_true", help="Run the daily stages once at startup")
+    ap.add_argument("--watch-replies", action="store_true",
+                    default=os.getenv("SERVE_WATCH_REPLIES", "false").lower() in ("1", "true", "yes"),
+                    help="Watch each agent's mailbox with IMAP IDLE instead of polling every --poll-minutes")
+    ap.add_argument("--pipelined", action="store_true",
+                    default=os.getenv("SERVE_PIPELINED", "false").lower() in ("1", "true", "yes"),
+                    help="Daily run uses the overlapped `run` command instead of fetch, score, review-email")
+    args = ap.parse_args(argv)
+
+    agent_dirs = _resolve_agents(repo_root, args.agents)
+    names = [d.name for d in agent_dirs]
+    max_parallel = int(os.getenv("PIPELINE_MAX_PARALLEL", "4"))
+
+    def daily():
+        # Agents run side by side; within an agent a failed stage stops the later ones
+        started = time.monotonic()
+        steps = [["run"]] if args.pipelined else [["fetch"], ["score"], ["review-email"]]
+        rows = run_agents_parallel(agent_dirs, steps, max_parallel, tag="serve")
+        _print_timings(rows, time.monotonic() - started)
+
+    def intraday():
+        run_agents_parallel(agent_dirs, [["fetch"], ["score", "--incremental"]], max_parallel, tag="serve")
+
+    def poll():
+        run_agents_parallel(agent_dirs, [["review-poll"]], max_parallel, tag="serve")
+
+    schedule.every().day.at(args.daily_at).do(daily)
+    if args.fetch_minutes > 0:
+        schedule.every(args.fetch_minutes).minutes.do(intraday)
+    stop = threading.Event()
+    if args.watch_replies:
+        _start_reply_watchers(agent_dirs, stop)
+        args.poll_minutes = 0  # the watchers replace polling; they also check on every reconnect
+    if args.poll_minutes > 0:
+        schedule.every(args.poll_minutes).minutes.do(poll)
+
+    _log(f"serve: agents={','.join(names)} daily_at={args.daily_at} "
+         f"poll_every={args.poll_minutes or '-'}m fetch_every={args.fetch_minutes or '-'}m")
+    if args.run_now:
+        daily()
+    try:
+        while True:
+            schedule.run_pending()
+            idle = schedule.idle_seconds()
+            time.sleep(max(1.0, min(idle if idle is not None else 60.0, 60.0)))
+    except KeyboardInterrupt:
+        stop.set()
+        _log("serve: stopped")
+
+def _start_reply_watchers(agent_dirs: list[Path], stop: threading.Event):
+    """One IMAP IDLE watcher thread per agent; each new mail runs that agent's review-poll."""
+    from core.imap_watch import watch
+
+    for agent_dir in agent_dirs:
+        cfg = config.AgentConfig.from_dir(agent_dir)
+
+        def run(agent_dir=agent_dir, cfg=cfg):
+            with config.use(cfg):
+                watch(lambda: run_agent_command(agent_dir, ["review-poll"], tag="watch"), stop=stop)
+
+        threading.Thread(target=run, name=f"watch-{agent_dir.name}", daemon=True).start()
+        _log(f"serve: watching replies for {agent_dir.name}")
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        serve(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "all":
+        run_all(sys.argv[2:])
+        return
+
     # Detect if first arg is actually a command but no agent given
-    KNOWN_COMMANDS = {"list", "fetch", "score", "generate"}
+    KNOWN_COMMANDS = {"list", "fetch", "score", "generate", "run"}
     AGENTS_DIR = os.path.join(os.path.dirname(__file__), "agents")
     AVAILABLE_AGENTS = [
         name for name in os.listdir(AGENTS_DIR)
@@ -55,12 +233,17 @@ def main():
         agents_dir = Path("agents")
         found = [p.name for p in agents_dir.iterdir() if p.is_dir()]
         print("Usage: python pipeline.py <agent_name> <command> [args...]")
-        print("Commands: fetch | score | list | generate")
+        print("       python pipeline.py all [--max-parallel N] <command> [args...]")
+        print("       python pipeline.py serve [--agents a,b] [--daily-at HH:MM] [--poll-minutes N]")
+        print("Commands: fetch | score | list | generate | review-email | review-poll | review-watch | cache | run | search | mail-flush")
         print("\nExamples:")
         print("  python pipeline.py voice_act fetch")
         print("  python pipeline.py voice_act score --model-scoring gpt-4o-mini")
         print("  python pipeline.py voice_act generate 1,3 --angle \"Women in leadership lens\" --email")
         print("  python pipeline.py voice_act list")
+        print("  python pipeline.py voice_act run            # fetch → score → review-email, overlapped")
+        print("  python pipeline.py all --max-parallel 2 fetch")
+        print("  python pipeline.py serve --daily-at 06:30 --poll-minutes 10")
         print("\nAvailable agents:", ", ".join(found) if found else "(none)","\n")
         sys.exit(0)
 
@@ -72,11 +255,9 @@ def main():
         print(f"Agent not found: {agent_dir}")
         sys.exit(1)
 
-    load_agent_env(agent_dir)
-
-    # Shift args so core CLI sees <command> [args...]
-    sys.argv = [sys.argv[0]] + sys.argv[2:]
-    core_main()
+    # Core CLI sees <command> [args...] with this agent's config active
+    with config.use(config.AgentConfig.from_dir(agent_dir)):
+        core_main(sys.argv[2:])
 
 if __name__ == "__main__":
     main()
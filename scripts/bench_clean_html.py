@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: core.parsing.clean_html vs the previous BeautifulSoup/lxml cleaner.
+
+Checks that both produce identical text on a corpus of saved feed summaries, then
+times each over many iterations.
+
+    python scripts/bench_clean_html.py
+    python scripts/bench_clean_html.py --iterations 2000 my_snippets.json
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+from bs4 import BeautifulSoup  # noqa: E402
+from core.parsing import clean_html  # noqa: E402
+
+DEFAULT_CORPUS = REPO / "scripts" / "data" / "feed_snippets.json"
+
+def clean_html_bs4(html: str) -> str:
+    """The cleaner parse_feed used before the streaming extractor."""
+    if not html:
+        return ""
+    soup = BeautifulSoup(html, "lxml")
+    for tag in soup(["script", "style"]):
+        tag.decompose()
+    text = soup.get_text(" ", strip=True)
+    return " ".join(text.split())
+
+def load_corpus(paths: list[str]) -> list[str]:
+    snippets: list[str] = []
+    for path in paths or [str(DEFAULT_CORPUS)]:
+        snippets.extend(json.loads(Path(path).read_text(encoding="utf-8")))
+    return snippets
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("corpus", nargs="*", help="JSON files holding a list of raw summary strings")
+    ap.add_argument("--iterations", type=int, default=500, help="Passes over the corpus per timing run")
+    args = ap.parse_args()
+
+    snippets = load_corpus(args.corpus)
+    mismatches = 0
+    for s in snippets:
+        old, new = clean_html_bs4(s), clean_html(s)
+        if old != new:
+            mismatches += 1
+            print(f"MISMATCH\n  input: {s!r}\n  bs4:   {old!r}\n  new:   {new!r}")
+    print(f"Corpus: {len(snippets)} snippets, {mismatches} mismatches")
+
+    def run(fn):
+        for s in snippets:
+            fn(s)
+
+    results = {}
+    for name, fn in (("bs4+lxml", clean_html_bs4), ("streaming", clean_html)):
+        best = min(timeit.repeat(lambda: run(fn), number=args.iterations, repeat=3))
+        per_call_us = best / (args.iterations * max(len(snippets), 1)) * 1e6
+        results[name] = per_call_us
+        print(f"{name:>10}: {per_call_us:8.2f} µs/summary")
+    if results["streaming"]:
+        print(f"   speedup: {results['bs4+lxml'] / results['streaming']:.1f}x")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+"""
+End-to-end benchmark of the email review loop against the local mail stand-in:
+
+    review-email → SMTP → reviewer replies → review-poll (or review-watch) → generate
+
+Everything runs in this process: scripts/mail_standin.py provides SMTP and IMAP
+on localhost (INBOX pre-filled with --seed unrelated messages), the reviewer
+answers each review email after --reply-delay seconds, and generation uses
+LLM_BACKEND=synthetic with no latency, so the numbers are the pipeline's own
+mail cost. Each iteration reports the time to queue and to deliver the review
+email, the time from the reply landing to the processed marker being written,
+and the IMAP round-trips and bytes spent per poll. The first iteration has no IMAP state yet, so it is
+reported separately (it scans up to IMAP_MAX_SCAN messages).
+
+    python scripts/bench_review_loop.py
+    python scripts/bench_review_loop.py --seed 5000 --iterations 20 --mode watch
+    python scripts/bench_review_loop.py --json bench_review_loop.jsonl   # track over time
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+from mail_standin import MailStandin, seed_mailbox  # noqa: E402
+
+def seed_output(outdir: Path, items: int = 20):
+    run = outdir / "runs" / datetime.now().strftime("%Y-%m-%d")
+    run.mkdir(parents=True, exist_ok=True)
+    raw = [{"title": f"Item {i}", "link": f"https://example.org/{i}", "summary": "bench", "feed": "bench"}
+           for i in range(items)]
+    scored = [{**it, "why_relevant": "bench", "total": 10 + i} for i, it in enumerate(raw)]
+    (run / "raw_items.json").write_text(json.dumps(raw), encoding="utf-8")
+    (run / "scored_items.json").write_text(json.dumps(scored), encoding="utf-8")
+    return run
+
+def _pct(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)] if values else 0.0
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seed", type=int, default=2000, help="Unrelated messages already in the INBOX")
+    ap.add_argument("--iterations", type=int, default=10)
+    ap.add_argument("--mode", choices=("poll", "watch"), default="poll",
+                    help="poll: run review-poll every --poll-interval; watch: one IDLE connection (review-watch)")
+    ap.add_argument("--poll-interval", type=float, default=0.5, help="Seconds between polls in poll mode")
+    ap.add_argument("--reply-delay", type=float, default=0.2, help="Seconds before the reviewer's reply lands")
+    ap.add_argument("--noise", type=int, default=20, help="Unrelated messages arriving with each reply")
+    ap.add_argument("--timeout", type=float, default=30.0, help="Give up on an iteration after this many seconds")
+    ap.add_argument("--json", help="Append one JSON summary record to this file")
+    ap.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = ap.parse_args()
+
+    from core import config
+    from core.cli import cmd_review_email, cmd_review_poll
+
+    with tempfile.TemporaryDirectory() as tmp, MailStandin(auto_reply="1,3", reply_delay=args.reply_delay) as standin:
+        tmp_path = Path(tmp)
+        started = time.perf_counter()
+        seed_mailbox(standin.inbox, args.seed)
+        print(f"Seeded {len(standin.inbox)} messages in {time.perf_counter() - started:.1f}s "
+              f"(IMAP :{standin.imap_port}, SMTP :{standin.smtp_port})")
+        run = seed_output(tmp_path)
+        (tmp_path / "strategy.md").write_text("Benchmark strategy.\n", encoding="utf-8")
+        cfg = config.AgentConfig("bench", {
+            **standin.env(),
+            "AGENT_NAME": "bench",
+            "OUTPUT_DIR": str(tmp_path),
+            "STRATEGY_FILE": str(tmp_path / "strategy.md"),
+            "MARKDOWN_PREFIX": "bench_",
+            "USAGE_LEDGER_FILE": str(tmp_path / "usage.sqlite3"),
+            "LLM_BACKEND": "synthetic",
+            "LLM_SYNTH_LATENCY_S": "0",
+            "LLM_SYNTH_JITTER_S": "0",
+            "MIN_TOTAL": "0",
+        })
+        marker = run / "review_processed.json"
+        poll_args = argparse.Namespace(force=False, reset=False, angle=None, email_on_generate=False)
+        email_args = argparse.Namespace(max_items=None, min_total=None)
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+
+        records = []
+        stop = threading.Event()
+        watch_polls = [0]
+
+        def on_new_mail():
+            watch_polls[0] += 1
+            cmd_review_poll(poll_args)
+
+        with config.use(cfg), quiet:
+            if args.mode == "watch":
+                from core.imap_watch import watch
+                watcher = threading.Thread(target=config.bind(watch), args=(config.bind(on_new_mail), stop), daemon=True)
+                watcher.start()
+            for i in range(args.iterations):
+                marker.unlink(missing_ok=True)
+                standin.stats.clear()
+                standin.delivered.clear()
+                t0 = time.perf_counter()
+                cmd_review_email(email_args)  # returns once the email is queued
+                queued_ms = (time.perf_counter() - t0) * 1000
+                standin.delivered.wait(args.timeout)
+                sent_ms = (time.perf_counter() - t0) * 1000
+                smtp = dict(standin.stats)
+                seed_mailbox(standin.inbox, args.noise, seed=i + 2)  # other mail keeps arriving too
+                standin.stats.clear()
+                watch_polls[0] = 0
+
+                polls, deadline = 0, time.perf_counter() + args.timeout
+                while not marker.exists() and time.perf_counter() < deadline:
+                    if args.mode == "poll":
+                        cmd_review_poll(poll_args)
+                        polls += 1
+                        if not marker.exists():
+                            time.sleep(args.poll_interval)
+                    else:
+                        time.sleep(0.005)
+                done = time.perf_counter()
+                polls = polls or watch_polls[0]
+                if not marker.exists():
+                    print(f"iteration {i}: no reply processed within {args.timeout:.0f}s", file=sys.stderr)
+                    continue
+                reply_at = standin.inbox.messages[standin.replies[-1] - 1]["at"]  # UIDs start at 1, no expunge
+                stats = dict(standin.stats)
+                records.append({
+                    "queue_ms": queued_ms,
+                    "send_ms": sent_ms,
+                    "smtp_commands": smtp.get("smtp_commands", 0),
+                    "detect_ms": (done - reply_at) * 1000,
+                    "loop_ms": (done - t0) * 1000,
+                    "polls": polls,
+                    "imap_commands": stats.get("imap_commands", 0),
+                    "imap_kb": stats.get("imap_bytes_out", 0) / 1024,
+                    "imap_connections": stats.get("imap_connections", 0),
+                    "commands": {k: v for k, v in stats.items() if k.isupper()},
+                })
+            stop.set()
+
+        if not records:
+            print("No iteration completed.")
+            sys.exit(1)
+        print(f"{'iter':>4} {'queue ms':>8} {'send ms':>8} {'smtp cmds':>9} {'detect ms':>10} {'loop ms':>8} {'polls':>5} "
+              f"{'imap cmds':>9} {'imap KB':>8}  commands")
+        for i, r in enumerate(records):
+            print(f"{i:>4} {r['queue_ms']:8.1f} {r['send_ms']:8.1f} {r['smtp_commands']:9d} {r['detect_ms']:10.1f} {r['loop_ms']:8.1f} "
+                  f"{r['polls']:5d} {r['imap_commands']:9d} {r['imap_kb']:8.1f}  "
+                  + ", ".join(f"{k} {v}" for k, v in sorted(r["commands"].items())))
+
+        warm = records[1:] or records
+        summary = {
+            "ts": datetime.now().isoformat(timespec="seconds"), "mode": args.mode, "seed": args.seed,
+            "iterations": len(records), "python": sys.version.split()[0],
+            "first_detect_ms": round(records[0]["detect_ms"], 1),
+            "first_imap_kb": round(records[0]["imap_kb"], 1),
+            "queue_ms_p50": round(statistics.median(r["queue_ms"] for r in warm), 1),
+            "send_ms_p50": round(statistics.median(r["send_ms"] for r in warm), 1),
+            "detect_ms_p50": round(statistics.median(r["detect_ms"] for r in warm), 1),
+            "detect_ms_p95": round(_pct([r["detect_ms"] for r in warm], 0.95), 1),
+            "imap_commands_per_poll": round(sum(r["imap_commands"] for r in warm)
+                                            / max(sum(r["polls"] or 1 for r in warm), 1), 1),
+            "imap_kb_p50": round(statistics.median(r["imap_kb"] for r in warm), 1),
+        }
+        print("\n" + "  ".join(f"{k}={v}" for k, v in summary.items() if k not in ("ts", "python")))
+        if args.json:
+            with open(args.json, "a", encoding="utf-8") as f:
+                f.write(json.dumps(summary) + "\n")
+
+if __name__ == "__main__":
+    main()
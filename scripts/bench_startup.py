@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Startup benchmark: wall time and `-X importtime` cost of each CLI command.
+
+Each command runs in a fresh interpreter against a throwaway OUTPUT_DIR seeded
+with a small scored_items.json / index_map.json, so `list` and `review-poll` get
+past their file checks (review-poll then stops at the missing IMAP config, after
+its imports). Exit codes are ignored; only startup cost is measured.
+
+    python scripts/bench_startup.py
+    python scripts/bench_startup.py --repeat 5 --json bench_startup.jsonl
+    python scripts/bench_startup.py --budget-ms 80     # exit 1 if any command is slower
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+
+COMMANDS = [
+    ["list"],
+    ["review-poll"],
+    ["cache", "stats"],
+    ["fetch", "--help"],
+    ["score", "--help"],
+    ["generate", "--help"],
+]
+
+_LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def seed_output(outdir: Path):
+    run = outdir / "runs" / datetime.now().strftime("%Y-%m-%d")
+    run.mkdir(parents=True, exist_ok=True)
+    items = [{"title": f"Item {i}", "link": f"https://example.org/{i}", "why_relevant": "bench", "total": 10 + i}
+             for i in range(20)]
+    (run / "scored_items.json").write_text(json.dumps(items), encoding="utf-8")
+    (run / "index_map.json").write_text(json.dumps({"run_id": "bench0", "items": []}), encoding="utf-8")
+
+def parse_importtime(stderr: str) -> dict:
+    total_us = 0
+    modules = 0
+    top_level: list[tuple[int, str]] = []
+    for line in stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        self_us, cumulative_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        total_us += self_us
+        modules += 1
+        if len(indent) <= 1:
+            top_level.append((cumulative_us, name))
+    top_level.sort(reverse=True)
+    return {"import_ms": total_us / 1000, "modules": modules,
+            "heaviest": [f"{name} {us / 1000:.1f}ms" for us, name in top_level[:5]]}
+
+def run_command(agent: str, argv: list[str], env: dict) -> dict:
+    started = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", str(REPO / "pipeline.py"), agent, *argv],
+                          cwd=REPO, env=env, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - started) * 1000
+    return {"wall_ms": wall_ms, **parse_importtime(proc.stderr)}
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--agent", default="voice_act")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per command; the median is reported")
+    ap.add_argument("--json", help="Append one JSON record per command to this file (for tracking over time)")
+    ap.add_argument("--budget-ms", type=float, help="Fail if any command's median wall time exceeds this")
+    args = ap.parse_args()
+
+    over_budget = []
+    with tempfile.TemporaryDirectory() as tmp:
+        seed_output(Path(tmp))
+        env = {**os.environ, "OUTPUT_DIR": tmp, "PYTHONDONTWRITEBYTECODE": "1"}
+        for var in ("IMAP_HOST", "IMAP_USER", "IMAP_PASSWORD"):
+            env.pop(var, None)
+        run_command(args.agent, ["list"], env)  # warm the OS file cache / .pyc files
+
+        print(f"{'command':<18} {'wall ms':>8} {'import ms':>10} {'modules':>8}  heaviest imports")
+        for argv in COMMANDS:
+            runs = [run_command(args.agent, argv, env) for _ in range(max(args.repeat, 1))]
+            wall = statistics.median(r["wall_ms"] for r in runs)
+            imp = statistics.median(r["import_ms"] for r in runs)
+            label = " ".join(argv)
+            print(f"{label:<18} {wall:8.1f} {imp:10.1f} {runs[-1]['modules']:8d}  {', '.join(runs[-1]['heaviest'][:3])}")
+            if args.json:
+                rec = {"ts": datetime.now().isoformat(timespec="seconds"), "command": label,
+                       "wall_ms": round(wall, 1), "import_ms": round(imp, 1), "modules": runs[-1]["modules"],
+                       "python": sys.version.split()[0]}
+                with open(args.json, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(rec) + "\n")
+            if args.budget_ms is not None and wall > args.budget_ms:
+                over_budget.append(label)
+
+    if over_budget:
+        print(f"Over budget ({args.budget_ms:.0f} ms): {', '.join(over_budget)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,11 @@ PY="$REPO/.venv/bin/python"
 
 cd "$REPO"
 
+# Alternative to this script + a review-poll cron entry: one warm process for all agents
+#   $PY pipeline.py serve --daily-at 06:30 --poll-minutes 10
+# or, keeping cron, every agent at once:
+#   $PY pipeline.py all fetch && $PY pipeline.py all score && $PY pipeline.py all review-email
+
 echo "[$(date +'%F %T')] daily: fetch"
 $PY pipeline.py voice_act fetch
 
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Tiny offline stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions with canned but well-formed content, so
+scoring, generation and `generate --stream` can be exercised without a key or
+network access:
+
+    python scripts/fake_openai.py --port 8765 --latency 0.3 --token-delay 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake \\
+        python pipeline.py <agent> generate 1,2 --stream
+
+Scoring prompts (an "Items:" JSON list) get {"items": [...]} with stable
+pseudo-random scores; generation prompts ("Item (JSON):") get one Markdown
+section in the usual shape. These are the same replies as
+LLM_BACKEND=synthetic, which needs no server; this script also exercises the
+real SDK and HTTP path. With "stream": true the reply is sent as server-sent
+events word by word, followed by a usage chunk when
+stream_options.include_usage is set, then "data: [DONE]".
+"""
+import argparse
+import json
+import re
+import sys
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+from core.llm_backends import synthetic_reply as reply_for  # noqa: E402
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+class Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    token_delay = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass  # keep the console for the caller's output
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            req = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid JSON"}})
+            return
+
+        prompt = "\n".join(m.get("content") or "" for m in req.get("messages", []))
+        content = reply_for(prompt)
+        model = req.get("model", "gpt-4o-mini")
+        usage = {
+            "prompt_tokens": _estimate_tokens(prompt),
+            "completion_tokens": _estimate_tokens(content),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        time.sleep(self.latency)
+
+        if req.get("stream"):
+            self._stream(model, content, usage, (req.get("stream_options") or {}).get("include_usage"))
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    def _stream(self, model: str, content: str, usage: dict, include_usage: bool):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+
+        def event(choices: list, extra: dict | None = None):
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": choices, **(extra or {})}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for piece in re.findall(r"\S+\s*|\s+", content):
+            time.sleep(self.token_delay)
+            event([{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if include_usage:
+            event([], {"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency", type=float, default=0.2, help="Seconds before the first byte of each reply")
+    ap.add_argument("--token-delay", type=float, default=0.01, help="Seconds between streamed chunks")
+    args = ap.parse_args(argv)
+
+    Handler.latency = args.latency
+    Handler.token_delay = args.token_delay
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Fake OpenAI listening on http://{args.host}:{args.port}/v1 "
+          f"(set OPENAI_BASE_URL to this and OPENAI_API_KEY to anything)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
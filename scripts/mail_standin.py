@@ -0,0 +1,620 @@
+#!/usr/bin/env python
+"""
+Offline stand-in for the review mail servers: an SMTP sink plus a small IMAP
+server, both plain TCP on localhost, sharing one in-memory INBOX.
+
+    python scripts/mail_standin.py --seed 5000 --auto-reply 1,3
+    # then, with the printed settings in the agent's .env:
+    python pipeline.py <agent> review-email && python pipeline.py <agent> review-poll
+
+The SMTP side accepts EHLO, AUTH PLAIN/LOGIN (any credentials), MAIL, RCPT,
+DATA, RSET, NOOP and QUIT (no STARTTLS, so SMTP_TLS=false). Every delivery is
+kept in `sent`; with --auto-reply the reviewer answers it straight into the
+INBOX ("Re: <subject>", the selection line, then the quoted email).
+
+The IMAP side speaks the part of IMAP4rev1 the pipeline uses: CAPABILITY
+(with IDLE), LOGIN, SELECT/EXAMINE (UIDVALIDITY, UIDNEXT), STATUS, SEARCH and
+FETCH with or without UID (UID sets, FLAGS, BODYSTRUCTURE,
+BODY[.PEEK][HEADER | HEADER.FIELDS (..) | TEXT | n.n], RFC822), IDLE/DONE,
+NOOP, CLOSE and LOGOUT. Messages are never expunged, so sequence numbers are
+stable. Every command is counted in `stats`, which is what
+scripts/bench_review_loop.py reports as round-trips.
+"""
+import argparse
+import random
+import re
+import select
+import socketserver
+import threading
+import time
+from collections import Counter
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid, parseaddr
+
+REVIEWER = "reviewer@standin.local"
+PIPELINE = "pipeline@standin.local"
+_CRLF = policy.compat32.clone(linesep="\r\n")
+
+# ---------- mailbox ----------
+
+class Mailbox:
+    """Append-only message store; `changed` is notified on every append."""
+
+    def __init__(self):
+        self.uidvalidity = int(time.time())
+        self.uidnext = 1
+        self.messages: list[dict] = []  # {"uid", "raw", "flags", "at" (perf_counter)}
+        self.changed = threading.Condition()
+
+    def add(self, raw: bytes, flags: tuple[str, ...] = ()) -> int:
+        raw = re.sub(rb"\r?\n", b"\r\n", raw)
+        with self.changed:
+            uid = self.uidnext
+            self.uidnext += 1
+            self.messages.append({"uid": uid, "raw": raw, "flags": set(flags), "at": time.perf_counter()})
+            self.changed.notify_all()
+        return uid
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+def _filler(rng: random.Random, i: int) -> bytes:
+    """A newsletter-ish message; some multipart, some with an attachment, a few old reviewer replies."""
+    msg = EmailMessage()
+    kind = rng.random()
+    if kind < 0.05:
+        msg["From"] = REVIEWER
+        msg["Subject"] = f"Re: [content_pipeline] Review (run {rng.getrandbits(24):06x})"
+        msg.set_content(f"{rng.randint(1, 9)}\n\n> an older review email\n")
+    else:
+        msg["From"] = f"news{rng.randint(1, 40)}@example.org"
+        msg["Subject"] = f"Weekly update #{i}"
+        text = " ".join(rng.choice(("policy", "budget", "Canberra", "update", "leaders", "team")) for _ in range(120))
+        msg.set_content(text + "\n")
+        if kind < 0.75:
+            msg.add_alternative(f"<html><body><p>{text}</p></body></html>", subtype="html")
+        elif kind < 0.85:
+            msg.add_attachment(rng.randbytes(20_000), maintype="application", subtype="pdf", filename=f"report{i}.pdf")
+    msg["To"] = PIPELINE
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = make_msgid(domain="standin.local")
+    return msg.as_bytes()
+
+def seed_mailbox(box: Mailbox, count: int, seed: int = 1) -> None:
+    rng = random.Random(seed)
+    for i in range(count):
+        box.add(_filler(rng, i), flags=("\\Seen",) if rng.random() < 0.9 else ())
+
+def make_reply(raw: bytes, selection: str, sender: str = REVIEWER) -> bytes:
+    """The reviewer's answer to a review email: selection line first, original quoted below."""
+    orig = message_from_bytes(raw, policy=policy.default)
+    part = orig.get_body(preferencelist=("plain",))
+    quoted = "\n".join("> " + line for line in (part.get_content() if part else "").splitlines())
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = parseaddr(str(orig.get("From", "")))[1] or PIPELINE
+    msg["Subject"] = "Re: " + str(orig.get("Subject", ""))
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = make_msgid(domain="standin.local")
+    msg.set_content(f"{selection}\n\nOn {orig.get('Date', 'today')}, {orig.get('From', '')} wrote:\n{quoted}\n")
+    return msg.as_bytes()
+
+# ---------- message parts ----------
+
+def _split(raw: bytes) -> tuple[bytes, bytes]:
+    i = raw.find(b"\r\n\r\n")
+    return (raw, b"") if i < 0 else (raw[:i + 4], raw[i + 4:])
+
+def _header_blocks(header: bytes) -> list[tuple[str, bytes]]:
+    blocks: list[tuple[str, bytes]] = []
+    for line in header.split(b"\r\n"):
+        if not line:
+            continue
+        if line[:1] in (b" ", b"\t") and blocks:
+            name, text = blocks[-1]
+            blocks[-1] = (name, text + b"\r\n" + line)
+        else:
+            blocks.append((line.split(b":", 1)[0].decode("ascii", "replace").strip().lower(), line))
+    return blocks
+
+def _subpart(msg, path: list[int]):
+    for n in path:
+        if msg.is_multipart():
+            parts = msg.get_payload()
+            if not 0 < n <= len(parts):
+                return None
+            msg = parts[n - 1]
+        elif n != 1:
+            return None
+    return msg
+
+def _q(s: str) -> str:
+    return '"' + s.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def _structure(part) -> str:
+    if part.is_multipart():
+        return "(" + "".join(_structure(p) for p in part.get_payload()) + f" {_q(part.get_content_subtype().upper())})"
+    params = [(k, v) for k, v in (part.get_params() or [])[1:]]
+    fields = " ".join(f"{_q(k.upper())} {_q(str(v))}" for k, v in params)
+    body = _split(part.as_bytes(policy=_CRLF))[1]
+    enc = (part.get("Content-Transfer-Encoding") or "7bit").strip().upper()
+    out = (f"{_q(part.get_content_maintype().upper())} {_q(part.get_content_subtype().upper())} "
+           f"{'(' + fields + ')' if fields else 'NIL'} NIL NIL {_q(enc)} {len(body)}")
+    if part.get_content_maintype() == "text":
+        lines = body.count(b"\n")
+        out += f" {lines}"
+    disposition = part.get_content_disposition()
+    if disposition:
+        filename = part.get_filename()
+        out += f" NIL ({_q(disposition.upper())} {'(' + _q('FILENAME') + ' ' + _q(filename) + ')' if filename else 'NIL'})"
+    return "(" + out + ")"
+
+def section_bytes(raw: bytes, section: str) -> bytes:
+    """Content of BODY[<section>] for one message (section already upper-cased)."""
+    header, text = _split(raw)
+    if section == "":
+        return raw
+    if section == "HEADER":
+        return header
+    if section == "TEXT":
+        return text
+    m = re.fullmatch(r"HEADER\.FIELDS(\.NOT)?\s*\((.*)\)", section)
+    if m:
+        names = {n.lower() for n in m.group(2).split()}
+        keep = [block for name, block in _header_blocks(header) if (name in names) != bool(m.group(1))]
+        return b"".join(b + b"\r\n" for b in keep) + b"\r\n"
+    m = re.fullmatch(r"([\d.]+?)(?:\.(MIME|HEADER|TEXT))?", section)
+    if not m:
+        return b""
+    msg = message_from_bytes(raw, policy=policy.compat32)
+    part = _subpart(msg, [int(n) for n in m.group(1).split(".")])
+    if part is None:
+        return b""
+    sub_header, sub_body = _split(part.as_bytes(policy=_CRLF))
+    if m.group(2) in ("MIME", "HEADER"):
+        return sub_header
+    return text if part is msg else sub_body  # BODY[1] of a single-part message is its whole body
+
+# ---------- IMAP ----------
+
+def _tokens(s: str, i: int = 0) -> tuple[list, int]:
+    """Parse atoms, "quoted strings" and (lists); atoms may carry [sections with spaces]."""
+    out: list = []
+    while i < len(s):
+        c = s[i]
+        if c == " ":
+            i += 1
+        elif c == "(":
+            sub, i = _tokens(s, i + 1)
+            out.append(sub)
+        elif c == ")":
+            return out, i + 1
+        elif c == '"':
+            j, buf = i + 1, []
+            while j < len(s) and s[j] != '"':
+                if s[j] == "\\":
+                    j += 1
+                buf.append(s[j])
+                j += 1
+            out.append("".join(buf))
+            i = j + 1
+        else:
+            j, depth = i, 0
+            while j < len(s) and (depth or s[j] not in " ()"):
+                depth += {"[": 1, "]": -1}.get(s[j], 0)
+                j += 1
+            out.append(s[i:j])
+            i = j
+    return out, i
+
+def _in_set(spec: str, value: int, largest: int) -> bool:
+    for piece in spec.split(","):
+        lo, _, hi = piece.partition(":")
+        a = largest if lo == "*" else int(lo)
+        b = a if not hi else (largest if hi == "*" else int(hi))
+        if min(a, b) <= value <= max(a, b):
+            return True
+    return False
+
+class IMAPHandler(socketserver.StreamRequestHandler):
+    box: Mailbox
+    stats: Counter
+    lock: threading.Lock
+
+    def send(self, data: bytes | str):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.wfile.write(data)
+        with self.lock:
+            self.stats["imap_bytes_out"] += len(data)
+
+    def read_command(self) -> str | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        text = line.decode("utf-8", "replace").rstrip("\r\n")
+        # Inline literals ({n} / {n+}) as quoted strings
+        while (m := re.search(r"\{(\d+)(\+?)\}$", text)):
+            if not m.group(2):
+                self.send(b"+ go ahead\r\n")
+            data = self.rfile.read(int(m.group(1))).decode("utf-8", "replace")
+            text = text[:m.start()] + _q(data) + self.rfile.readline().decode("utf-8", "replace").rstrip("\r\n")
+        return text
+
+    def handle(self):
+        self.readonly = True
+        self.selected = False
+        self.reported = 0
+        with self.lock:
+            self.stats["imap_connections"] += 1
+        self.send(b"* OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] mail stand-in ready\r\n")
+        while True:
+            line = self.read_command()
+            if line is None:
+                return
+            parts, _ = _tokens(line)
+            if len(parts) < 2:
+                self.send(b"* BAD empty command\r\n")
+                continue
+            tag, cmd, args = parts[0], str(parts[1]).upper(), parts[2:]
+            use_uid = cmd == "UID" and bool(args)
+            if use_uid:
+                cmd, args = f"UID {str(args[0]).upper()}", args[1:]
+            with self.lock:
+                self.stats[cmd] += 1
+                self.stats["imap_commands"] += 1
+            method = getattr(self, "do_" + cmd.replace(" ", "_"), None)
+            if method is None:
+                self.send(f"{tag} BAD unknown command {cmd}\r\n")
+                continue
+            try:
+                if method(tag, args) == "logout":
+                    return
+            except (ValueError, IndexError) as e:
+                self.send(f"{tag} BAD {e}\r\n")
+
+    # --- session ---
+
+    def do_CAPABILITY(self, tag, args):
+        self.send(f"* CAPABILITY IMAP4rev1 IDLE UIDPLUS\r\n{tag} OK CAPABILITY completed\r\n")
+
+    def do_LOGIN(self, tag, args):
+        self.send(f"{tag} OK [CAPABILITY IMAP4rev1 IDLE UIDPLUS] LOGIN completed\r\n")
+
+    def do_LOGOUT(self, tag, args):
+        self.send(f"* BYE stand-in closing\r\n{tag} OK LOGOUT completed\r\n")
+        return "logout"
+
+    def do_NOOP(self, tag, args):
+        self._report_exists()
+        self.send(f"{tag} OK NOOP completed\r\n")
+
+    do_CHECK = do_NOOP
+
+    def do_CLOSE(self, tag, args):
+        self.selected = False
+        self.send(f"{tag} OK CLOSE completed\r\n")
+
+    do_UNSELECT = do_CLOSE
+
+    def do_SELECT(self, tag, args, readonly: bool = False):
+        self.selected, self.readonly = True, readonly
+        with self.box.changed:
+            self.reported = len(self.box)
+            unseen = [i for i, m in enumerate(self.box.messages, 1) if "\\Seen" not in m["flags"]]
+            lines = [
+                "* FLAGS (\\Answered \\Flagged \\Deleted \\Seen \\Draft)",
+                f"* {self.reported} EXISTS",
+                "* 0 RECENT",
+                f"* OK [UIDVALIDITY {self.box.uidvalidity}] UIDs valid",
+                f"* OK [UIDNEXT {self.box.uidnext}] Predicted next UID",
+            ]
+            if unseen:
+                lines.append(f"* OK [UNSEEN {unseen[0]}] First unseen")
+        mode = "READ-ONLY" if readonly else "READ-WRITE"
+        self.send("\r\n".join(lines) + f"\r\n{tag} OK [{mode}] {'EXAMINE' if readonly else 'SELECT'} completed\r\n")
+
+    def do_EXAMINE(self, tag, args):
+        self.do_SELECT(tag, args, readonly=True)
+
+    def do_STATUS(self, tag, args):
+        folder, wanted = args[0], [str(a).upper() for a in args[1]]
+        with self.box.changed:
+            values = {"MESSAGES": len(self.box), "UIDNEXT": self.box.uidnext, "UIDVALIDITY": self.box.uidvalidity,
+                      "RECENT": 0, "UNSEEN": sum("\\Seen" not in m["flags"] for m in self.box.messages)}
+        body = " ".join(f"{k} {values[k]}" for k in wanted if k in values)
+        self.send(f"* STATUS {_q(folder)} ({body})\r\n{tag} OK STATUS completed\r\n")
+
+    def do_IDLE(self, tag, args):
+        self.send(b"+ idling\r\n")
+        while True:
+            ready, _, _ = select.select([self.connection], [], [], 0.05)
+            if ready:
+                line = self.rfile.readline()
+                if not line or line.strip().upper() == b"DONE":
+                    break
+            self._report_exists()
+        self.send(f"{tag} OK IDLE terminated\r\n")
+
+    def _report_exists(self):
+        count = len(self.box)
+        if count != self.reported:
+            self.reported = count
+            self.send(f"* {count} EXISTS\r\n* 1 RECENT\r\n")
+
+    # --- search / fetch ---
+
+    def _matches(self, seq: int, msg: dict, criteria: list, largest_uid: int) -> bool:
+        it = iter(criteria)
+        for key in it:
+            if isinstance(key, list):
+                if not self._matches(seq, msg, key, largest_uid):
+                    return False
+                continue
+            k = str(key).upper()
+            if k == "ALL":
+                continue
+            if k == "CHARSET":
+                next(it)
+            elif k == "UID":
+                if not _in_set(str(next(it)), msg["uid"], largest_uid):
+                    return False
+            elif k in ("SEEN", "UNSEEN"):
+                if ("\\Seen" in msg["flags"]) != (k == "SEEN"):
+                    return False
+            elif k in ("FROM", "SUBJECT", "BODY", "TEXT"):
+                needle = str(next(it)).lower().encode("utf-8")
+                header, text = _split(msg["raw"])
+                if k in ("FROM", "SUBJECT"):
+                    hay = b"".join(b for name, b in _header_blocks(header) if name == k.lower())
+                else:
+                    hay = text if k == "BODY" else msg["raw"]
+                if needle not in hay.lower():
+                    return False
+            elif re.fullmatch(r"[\d:*,]+", k):
+                if not _in_set(k, seq, len(self.box)):
+                    return False
+            else:
+                raise ValueError(f"unsupported search key {k}")
+        return True
+
+    def _search(self, tag, args, use_uid: bool):
+        with self.box.changed:
+            messages = list(self.box.messages)
+        largest = messages[-1]["uid"] if messages else 0
+        hits = [(m["uid"] if use_uid else seq) for seq, m in enumerate(messages, 1)
+                if self._matches(seq, m, args, largest)]
+        self.send(f"* SEARCH{''.join(f' {h}' for h in hits)}\r\n{tag} OK SEARCH completed\r\n")
+
+    def do_SEARCH(self, tag, args):
+        self._search(tag, args, use_uid=False)
+
+    def do_UID_SEARCH(self, tag, args):
+        self._search(tag, args, use_uid=True)
+
+    def _fetch_item(self, msg: dict, item: str) -> tuple[str, bytes | str]:
+        u = item.upper()
+        if u == "UID":
+            return "UID", str(msg["uid"])
+        if u == "FLAGS":
+            return "FLAGS", "(" + " ".join(sorted(msg["flags"])) + ")"
+        if u == "RFC822.SIZE":
+            return "RFC822.SIZE", str(len(msg["raw"]))
+        if u == "INTERNALDATE":
+            return "INTERNALDATE", _q(time.strftime("%d-%b-%Y %H:%M:%S +0000", time.gmtime()))
+        if u in ("BODYSTRUCTURE", "BODY"):
+            return u, _structure(message_from_bytes(msg["raw"], policy=policy.compat32))
+        if u in ("RFC822", "RFC822.HEADER", "RFC822.TEXT"):
+            section = {"RFC822": "", "RFC822.HEADER": "HEADER", "RFC822.TEXT": "TEXT"}[u]
+            if u == "RFC822" and not self.readonly:
+                msg["flags"].add("\\Seen")
+            return u, section_bytes(msg["raw"], section)
+        m = re.fullmatch(r"BODY(\.PEEK)?\[(.*)\](?:<(\d+)\.(\d+)>)?", item, re.IGNORECASE | re.DOTALL)
+        if not m:
+            raise ValueError(f"unsupported fetch item {item}")
+        section = " ".join(m.group(2).upper().split())
+        data = section_bytes(msg["raw"], section)
+        name = f"BODY[{section}]"
+        if m.group(3):
+            start = int(m.group(3))
+            data = data[start:start + int(m.group(4))]
+            name += f"<{start}>"
+        if not m.group(1) and not self.readonly:
+            msg["flags"].add("\\Seen")
+        return name, data
+
+    def _fetch(self, tag, args, use_uid: bool):
+        spec, items = str(args[0]), args[1] if isinstance(args[1], list) else [args[1]]
+        items = [str(i) for i in items]
+        if use_uid and "UID" not in (i.upper() for i in items):
+            items.insert(0, "UID")
+        with self.box.changed:
+            messages = list(self.box.messages)
+        largest = (messages[-1]["uid"] if use_uid else len(messages)) if messages else 0
+        for seq, msg in enumerate(messages, 1):
+            if not _in_set(spec, msg["uid"] if use_uid else seq, largest):
+                continue
+            out = [f"* {seq} FETCH (".encode()]
+            for n, item in enumerate(items):
+                name, value = self._fetch_item(msg, item)
+                out.append(((" " if n else "") + name + " ").encode())
+                if isinstance(value, bytes):
+                    out.append(f"{{{len(value)}}}\r\n".encode() + value)
+                else:
+                    out.append(value.encode())
+            out.append(b")\r\n")
+            self.send(b"".join(out))
+        self.send(f"{tag} OK FETCH completed\r\n")
+
+    def do_FETCH(self, tag, args):
+        self._fetch(tag, args, use_uid=False)
+
+    def do_UID_FETCH(self, tag, args):
+        self._fetch(tag, args, use_uid=True)
+
+# ---------- SMTP ----------
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    stats: Counter
+    lock: threading.Lock
+    deliver = staticmethod(lambda mail_from, rcpts, data: None)
+
+    def reply(self, text: str):
+        self.wfile.write((text + "\r\n").encode("utf-8"))
+
+    def readline(self) -> str:
+        return self.rfile.readline().decode("utf-8", "replace").rstrip("\r\n")
+
+    def handle(self):
+        with self.lock:
+            self.stats["smtp_connections"] += 1
+        self.reply("220 stand-in ESMTP")
+        mail_from, rcpts = "", []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            text = line.decode("utf-8", "replace").rstrip("\r\n")
+            verb = text.split(" ", 1)[0].upper()
+            with self.lock:
+                self.stats["smtp_commands"] += 1
+            if verb == "EHLO":
+                self.reply("250-stand-in\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 stand-in")
+            elif verb == "AUTH":
+                words = text.split()
+                if len(words) > 1 and words[1].upper() == "LOGIN":
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.readline()
+                elif len(words) == 2:
+                    self.reply("334 ")
+                    self.readline()
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, rcpts = text.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpts.append(text.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw or raw in (b".\r\n", b".\n"):
+                        break
+                    lines.append(raw[1:] if raw.startswith(b"..") else raw)
+                with self.lock:
+                    self.stats["smtp_messages"] += 1
+                self.deliver(mail_from, rcpts, b"".join(lines))
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                if verb == "RSET":
+                    mail_from, rcpts = "", []
+                self.reply("250 OK")
+            elif verb == "STARTTLS":
+                self.reply("454 TLS not available (set SMTP_TLS=false)")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+# ---------- both ----------
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class MailStandin:
+    """
+    Both servers on 127.0.0.1 (port 0 = any free port). auto_reply="1,3" makes
+    the reviewer answer every delivered email after reply_delay seconds.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", imap_port: int = 0, smtp_port: int = 0,
+                 auto_reply: str | None = None, reply_delay: float = 0.0):
+        self.inbox = Mailbox()
+        self.sent: list[tuple[str, list[str], bytes]] = []
+        self.replies: list[int] = []  # UIDs of auto-replies, in order
+        self.stats: Counter = Counter()
+        self.auto_reply = auto_reply
+        self.reply_delay = reply_delay
+        self.delivered = threading.Event()  # set on every SMTP delivery (clear it yourself)
+        lock = threading.Lock()
+        imap = type("IMAP", (IMAPHandler,), {"box": self.inbox, "stats": self.stats, "lock": lock})
+        smtp = type("SMTP", (SMTPHandler,), {"stats": self.stats, "lock": lock,
+                                              "deliver": staticmethod(self._deliver)})
+        self._imap = _Server((host, imap_port), imap)
+        self._smtp = _Server((host, smtp_port), smtp)
+        self.host = host
+        self.imap_port = self._imap.server_address[1]
+        self.smtp_port = self._smtp.server_address[1]
+
+    def _deliver(self, mail_from: str, rcpts: list[str], data: bytes):
+        self.sent.append((mail_from, rcpts, data))
+        self.delivered.set()
+        if self.auto_reply:
+            def answer():
+                time.sleep(self.reply_delay)
+                self.replies.append(self.inbox.add(make_reply(data, self.auto_reply)))
+            threading.Thread(target=answer, daemon=True).start()
+
+    def env(self) -> dict[str, str]:
+        """Settings that point the pipeline at this stand-in."""
+        return {
+            "IMAP_HOST": self.host, "IMAP_PORT": str(self.imap_port), "IMAP_SSL": "false",
+            "IMAP_USER": "standin", "IMAP_PASSWORD": "standin", "IMAP_FOLDER": "INBOX",
+            "SMTP_HOST": self.host, "SMTP_PORT": str(self.smtp_port), "SMTP_TLS": "false", "SMTP_SSL": "false",
+            "SMTP_USER": "standin", "SMTP_PASSWORD": "standin",
+            "EMAIL_FROM": PIPELINE, "EMAIL_TO": REVIEWER, "REVIEW_ALLOWED_FROM": REVIEWER,
+        }
+
+    def start(self) -> "MailStandin":
+        for server in (self._imap, self._smtp):
+            threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.1}, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in (self._imap, self._smtp):
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def main(argv: list[str] | None = None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--imap-port", type=int, default=1143)
+    ap.add_argument("--smtp-port", type=int, default=2525)
+    ap.add_argument("--seed", type=int, default=0, help="Pre-fill the INBOX with this many unrelated messages")
+    ap.add_argument("--auto-reply", metavar="SELECTION", help="Answer every sent email with this selection, e.g. 1,3")
+    ap.add_argument("--reply-delay", type=float, default=1.0, help="Seconds before the auto-reply lands")
+    args = ap.parse_args(argv)
+
+    standin = MailStandin(args.host, args.imap_port, args.smtp_port, args.auto_reply, args.reply_delay)
+    seed_mailbox(standin.inbox, args.seed)
+    standin.start()
+    print(f"Mail stand-in: IMAP {args.host}:{standin.imap_port}, SMTP {args.host}:{standin.smtp_port}, "
+          f"{len(standin.inbox)} seeded messages. Settings for the agent's .env:")
+    for k, v in standin.env().items():
+        print(f"{k}={v}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        standin.stop()
+        print(f"Stats: {dict(standin.stats)}")
+
+if __name__ == "__main__":
+    main()